@@ -4,26 +4,8 @@ import sys
 import re
 import pandas as pd
 from typing import List, Dict, Any
-
-# --- Helper function (Unchanged) ---
-def parse_llm_response(raw_response: str) -> str:
-    """Cleans the raw LLM response to extract just the spatial direction string."""
-    if not isinstance(raw_response, str) or "Error:" in raw_response:
-        return "error"
-    response_lower = raw_response.lower().strip().replace('.', '').replace(',', '')
-    answer = "###Answer:"
-    answer = answer.lower()
-    if answer in response_lower:
-        answer_part = response_lower.split(answer)[1]
-        parsed_answer = answer_part.strip().replace('.', '').replace(',', '')
-        # Standardize format (e.g., 'in front left' -> 'in-front-left')
-        parsed_answer = parsed_answer.replace(' ', '-')
-        return parsed_answer if parsed_answer else "unparseable"
-    if "incorrect prompt" in response_lower:
-        return "incorrect prompt"
-    #response_lower = response_lower.replace('in front', 'in-front').replace('behind', 'behind-')
-    directions_found = re.findall(r'in-front-right|in-front-left|behind-right|behind-left|in-front|behind|left|right', response_lower)
-    return directions_found[0] if directions_found else "unparseable"
+from response_parsing import parse_llm_response
+from result_aggregation import aggregate_results, confusion_matrix
 
 def read_expected_answer_file(answers_filename):
     answers_filename = '/Users/divyanshu03/Desktop/University of Leeds/Modules/Msc_Project/spatial-reasoning-simulation/data_files/expected_answers/'+answers_filename
@@ -35,6 +17,111 @@ def read_expected_answer_file(answers_filename):
         return {}
     answers_map = {item['prompt_id']: item['expected_answer'].lower().replace(' ', '-') for item in ground_truth_list}
     return answers_map
+LEVEL_FILE_NUMBERS = {'low': 1, 'medium': 2, 'high': 3}
+
+def load_combined_results(root_results_dir: str = 'results', dataset_suffix: str = '2000_10',
+                          data_dir: str = 'data_files', pack_size: int = 1) -> pd.DataFrame:
+    """
+    Loads every results/<model>/<level>/evaluation_results_<suffix>.json into one frame
+    (evaluation_results_<suffix>_pack<K>.json for runs with pack_size K > 1).
+
+    Expected answers and template ids are joined from the matching
+    expected_answers/ and questions_dataset_final/ files of the same dataset.
+
+    Returns:
+        pd.DataFrame: One row per answered prompt with 'model', 'level', 'template',
+                      'prompt_id', 'expected_answer', 'predicted_answer', 'is_correct',
+                      'time_taken', 'tokens_used' and 'pack_size'. Empty if nothing was found.
+    """
+    results_filename = f'evaluation_results_{dataset_suffix}.json' if pack_size <= 1 else f'evaluation_results_{dataset_suffix}_pack{pack_size}.json'
+    frames = []
+    for subdir, dirs, files in os.walk(root_results_dir):
+        if results_filename not in files:
+            continue
+        level_name = os.path.basename(subdir)
+        level_number = LEVEL_FILE_NUMBERS.get(level_name)
+        if level_number is None:
+            print(f"Warning: Skipping '{subdir}', '{level_name}' is not a known complexity level.")
+            continue
+        try:
+            with open(os.path.join(subdir, results_filename), 'r') as f:
+                llm_results = json.load(f)
+            with open(os.path.join(data_dir, 'expected_answers', f'expected_answer_file_level_{level_number}_{dataset_suffix}.json'), 'r') as f:
+                expected_answers = json.load(f)
+            with open(os.path.join(data_dir, 'questions_dataset_final', f'generated_questions_level_{level_number}_{dataset_suffix}.json'), 'r') as f:
+                questions = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Warning: Could not load results for '{subdir}'. {e}")
+            continue
+        if not llm_results:
+            continue
+
+        results_df = pd.DataFrame(llm_results)
+        answers_map = {item['prompt_id']: item['expected_answer'].lower().replace(' ', '-') for item in expected_answers}
+        templates_map = {item['prompt_id']: item.get('template_id_source') for item in questions}
+        predicted = results_df['raw_response'].map(parse_llm_response)
+        expected = results_df['prompt_id'].map(answers_map).fillna('not_found')
+        frames.append(pd.DataFrame({
+            'model': os.path.basename(os.path.dirname(subdir)),
+            'level': level_name.title(),
+            'template': results_df['prompt_id'].map(templates_map).fillna('unknown'),
+            'prompt_id': results_df['prompt_id'],
+            'expected_answer': expected,
+            'predicted_answer': predicted,
+            'is_correct': (predicted == expected).astype(int),
+            'time_taken': pd.to_numeric(results_df.get('time_taken'), errors='coerce'),
+            'tokens_used': pd.to_numeric(results_df.get('tokens_used'), errors='coerce'),
+            'pack_size': max(pack_size, 1),
+        }))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def analyze_combined_results(root_results_dir: str = 'results', dataset_suffix: str = '2000_10', results_db: str = None):
+    """
+    Prints accuracy per model, level, template and direction for all models at once.
+    With results_db the results are read from that results_store database instead of the files.
+    """
+    if results_db:
+        from results_store import load_results_frame
+        combined_df = load_results_frame(results_db, dataset_suffix)
+    else:
+        combined_df = load_combined_results(root_results_dir, dataset_suffix)
+    if combined_df.empty:
+        print(f"No 'evaluation_results_{dataset_suffix}.json' files were found under '{root_results_dir}'.")
+        return {}
+    tables = aggregate_results(combined_df)
+    print(f"Overall Accuracy (All Models & Levels): {tables['overall']['accuracy'].iloc[0]:.2%} over {len(combined_df)} prompts")
+    for name in ('by_model', 'by_level', 'by_model_level', 'by_template', 'by_model_direction'):
+        print(f"\nAccuracy {name.replace('by_', 'by ').replace('_', ', ')}:")
+        print(tables[name].to_string(float_format="{:.2%}".format))
+    return tables
+
+def analyze_pack_sizes(pack_sizes=(1, 2, 5, 10), root_results_dir: str = 'results', dataset_suffix: str = '2000_10'):
+    """
+    Accuracy and tokens per question of the same dataset run with different pack sizes,
+    restricted to prompt_ids answered at every pack size found, so the packing effect
+    is not mixed up with which prompts were answered.
+
+    Returns:
+        pd.DataFrame: Indexed by (model, level, pack_size) with 'prompts', 'accuracy'
+                      and 'tokens_per_question'. Empty if fewer than two pack sizes were found.
+    """
+    frames = [load_combined_results(root_results_dir, dataset_suffix, pack_size=k) for k in pack_sizes]
+    frames = [frame for frame in frames if not frame.empty]
+    if len(frames) < 2:
+        print(f"Need results for at least two pack sizes of '{dataset_suffix}' to compare.")
+        return pd.DataFrame()
+    combined_df = pd.concat(frames, ignore_index=True)
+    keys = ['model', 'level', 'prompt_id']
+    answered_at = combined_df.groupby(keys)['pack_size'].transform('nunique')
+    sizes_per_cell = combined_df.groupby(['model', 'level'])['pack_size'].transform('nunique')
+    paired_df = combined_df[answered_at == sizes_per_cell]
+    summary = paired_df.groupby(['model', 'level', 'pack_size']).agg(
+        prompts=('is_correct', 'size'), accuracy=('is_correct', 'mean'), tokens_per_question=('tokens_used', 'mean'))
+    print(summary.to_string(float_format="{:.3f}".format))
+    return summary
+
 # --- MODIFIED Main Analysis Function ---
 def analyze_all_results(root_results_dir: str):
     """
@@ -75,37 +162,28 @@ def analyze_all_results(root_results_dir: str):
                 continue
 
             # Process this specific file
-            analysis_data = []
-            for result in llm_results:
-                prompt_id = result.get('prompt_id')
-                ground_truth = answers_map.get(prompt_id, 'not_found')
-                parsed_answer = parse_llm_response(result.get('raw_response', ''))
-                
-                analysis_data.append({
-                    'prompt_id': prompt_id,
-                    'model': result.get('model'),
-                    'expected_answer': ground_truth,
-                    'predicted_answer': parsed_answer,
-                    'is_correct': 1 if parsed_answer == ground_truth else 0,
-                    'complexity_level': result.get('complexity_level'),
-                    'time_taken': result.get('time_taken'),
-                    'tokens_used':result.get('tokens_used'),
-                    'temperature':result.get('temperature_setting'),
-                    'seed':result.get('seed_setting'),
-                    'grid_size': 10
-                })
+            results_df = pd.DataFrame(llm_results)
+            predicted = results_df.get('raw_response', pd.Series('', index=results_df.index)).map(parse_llm_response)
+            expected = results_df['prompt_id'].map(answers_map).fillna('not_found')
+            df = pd.DataFrame({
+                'prompt_id': results_df.get('prompt_id'),
+                'model': results_df.get('model'),
+                'expected_answer': expected,
+                'predicted_answer': predicted,
+                'is_correct': (predicted == expected).astype(int),
+                'complexity_level': results_df.get('complexity_level'),
+                'time_taken': results_df.get('time_taken'),
+                'tokens_used': results_df.get('tokens_used'),
+                'temperature': results_df.get('temperature_setting'),
+                'seed': results_df.get('seed_setting'),
+                'grid_size': 10
+            })
 
             # Create and print the report for this specific file
-            df = pd.DataFrame(analysis_data)
             print(f"Overall Accuracy for this run: {df['is_correct'].mean():.2%}")
             print("Confusion Matrix for this run:")
             all_answers = sorted(list(set(df['expected_answer']) | set(df['predicted_answer'])))
-            confusion_matrix = pd.crosstab(
-                pd.Categorical(df['expected_answer'], categories=all_answers, ordered=True),
-                pd.Categorical(df['predicted_answer'], categories=all_answers, ordered=True),
-                rownames=['Actual Answer'], colnames=['Predicted Answer'], dropna=False
-            )
-            print(confusion_matrix)
+            print(confusion_matrix(df['expected_answer'], df['predicted_answer'], labels=all_answers))
 
             # NEW: Save the analysis summary CSV in the SAME directory
             analysis_output_filepath = os.path.join(subdir, 'analysis_summary_new.csv')
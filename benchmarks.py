@@ -0,0 +1,165 @@
+import glob
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from analyze_results import load_combined_results
+from prompt_keys import SelectionKeyEncoder, make_key_store
+from prompt_templates import compile_template, render_template
+from results_store import connect, import_results_tree, load_results_frame
+
+TEMPLATES_GLOB = os.path.join('data_files', 'templates', 'templates_level_*.json')
+
+def _render_by_replace(template_string, placeholders, params):
+    """The per-placeholder str.replace loop generate_questions used before templates were compiled."""
+    text = template_string
+    for placeholder in placeholders:
+        if placeholder not in params:
+            return None
+        text = text.replace(placeholder, params[placeholder])
+    return text
+
+def benchmark_template_rendering(templates_glob: str = TEMPLATES_GLOB, prompts_per_template: int = 10000,
+                                 repeats: int = 5, seed: int = 0):
+    """
+    Times prompt rendering with str.replace per placeholder against the compiled
+    single-pass renderer, at the 10k-per-template pool size, and checks both agree.
+
+    Returns:
+        dict: {"<file>:<template id>": {'placeholders', 'replace_seconds', 'compiled_seconds'}}
+    """
+    rng = random.Random(seed)
+    summary = {}
+    for templates_filepath in sorted(glob.glob(templates_glob)):
+        with open(templates_filepath, 'r') as f:
+            templates_data = json.load(f)
+        for template_info in templates_data.get("prompt_templates", []):
+            template_string = template_info["template_string"]
+            placeholders = tuple(template_info.get("placeholders", []))
+            params_list = [{p: rng.choice(["Man3", "North", "7", "1. Move forward one step,2. Turn left"]) for p in placeholders}
+                           for _ in range(prompts_per_template)]
+            compiled = compile_template(template_string, placeholders)
+
+            replace_times, compiled_times = [], []
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                replaced = [_render_by_replace(template_string, set(placeholders), params) for params in params_list]
+                replace_times.append(time.perf_counter() - start_time)
+
+                start_time = time.perf_counter()
+                rendered = [render_template(compiled, params) for params in params_list]
+                compiled_times.append(time.perf_counter() - start_time)
+
+            assert rendered == replaced, f"Compiled template disagrees with str.replace for {templates_filepath}:{template_info['id']}"
+            key = f"{os.path.basename(templates_filepath)}:{template_info['id']}"
+            summary[key] = {
+                'placeholders': len(placeholders),
+                'replace_seconds': min(replace_times),
+                'compiled_seconds': min(compiled_times),
+            }
+            print(f"{key} ({len(placeholders)} placeholders, {prompts_per_template} prompts): "
+                  f"str.replace {summary[key]['replace_seconds']*1000:.1f} ms, compiled {summary[key]['compiled_seconds']*1000:.1f} ms")
+    return summary
+
+def _string_selection_key(agent_id, agent_orientation, target_id, action_ids):
+    """The tuple-of-strings Tier 3 key generate_questions used before keys were packed into integers."""
+    return tuple([agent_id, agent_orientation] + sorted([target_id] + action_ids))
+
+def benchmark_selection_keys(num_selections: int = 200000, num_objects: int = 60, num_actions: int = 20, seed: int = 0):
+    """
+    Time and memory (tracemalloc peak) of remembering Tier 3 selections as string
+    tuples in a set, against packed integer keys in a set and in a Bloom filter.
+    Checks that string and integer keys agree on which selections are duplicates.
+
+    Returns:
+        dict: {store: {'seconds', 'peak_bytes', 'unique'}}
+    """
+    rng = random.Random(seed)
+    orientations = ["North", "South", "East", "West"]
+    actions = [{'id': i + 1} for i in range(num_actions)]
+    selections = []
+    for _ in range(num_selections):
+        agent, target = rng.sample(range(num_objects), 2)
+        selections.append((agent, rng.choice(orientations), target,
+                           [rng.randrange(num_actions) for _ in range(rng.randint(2, 4))]))
+    encoder = SelectionKeyEncoder(num_objects, orientations, actions)
+
+    def remember(build_key, store):
+        unique = 0
+        for selection in selections:
+            key = build_key(*selection)
+            if key not in store:
+                store.add(key)
+                unique += 1
+        return unique
+
+    runs = {
+        'string_tuple_set': (lambda a, o, t, acts: _string_selection_key(f"Obj{a}", o, f"Obj{t}", [str(i + 1) for i in acts]), lambda: set()),
+        'packed_int_set': (encoder.action_sequence_key, lambda: make_key_store(encoder.bits['action_sequence'], num_selections, 'set')),
+        'packed_int_bloom': (encoder.action_sequence_key, lambda: make_key_store(encoder.bits['action_sequence'], num_selections, 'bloom')),
+    }
+    summary = {}
+    for name, (build_key, new_store) in runs.items():
+        start_time = time.perf_counter()
+        unique = remember(build_key, new_store())
+        elapsed = time.perf_counter() - start_time
+        # Separate pass for memory, as tracemalloc slows every allocation down
+        tracemalloc.start()
+        remember(build_key, new_store())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        summary[name] = {'seconds': elapsed, 'peak_bytes': peak, 'unique': unique}
+        print(f"{name}: {unique} unique of {num_selections} selections, {elapsed*1000:.0f} ms, peak {peak / 2**20:.1f} MB")
+
+    assert summary['packed_int_set']['unique'] == summary['string_tuple_set']['unique'], "Packed keys disagree with string keys."
+    return summary
+
+def benchmark_results_store(root_results_dir: str = 'results', dataset_suffix: str = '2000_10', repeats: int = 3):
+    """
+    Imports the stored results into a scratch SQLite results database, checks that
+    load_results_frame returns the rows load_combined_results builds from the files,
+    and times the two loaders.
+
+    Returns:
+        dict: Imported rows and best-of-`repeats` seconds of each loader.
+    """
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        db_path = os.path.join(scratch_dir, 'results.db')
+        start_time = time.perf_counter()
+        conn = connect(db_path)
+        counts = import_results_tree(conn, root_results_dir)
+        conn.close()
+        import_seconds = time.perf_counter() - start_time
+
+        walk_times, sql_times = [], []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            walked = load_combined_results(root_results_dir, dataset_suffix)
+            walk_times.append(time.perf_counter() - start_time)
+            start_time = time.perf_counter()
+            queried = load_results_frame(db_path, dataset_suffix)
+            sql_times.append(time.perf_counter() - start_time)
+
+    keys = ['model', 'level', 'prompt_id']
+    walked = walked.sort_values(keys).reset_index(drop=True)
+    queried = queried[walked.columns].sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(walked, queried, check_dtype=False)
+    summary = {
+        'rows': counts['rows'],
+        'import_seconds': import_seconds,
+        'directory_walk_seconds': min(walk_times),
+        'sql_seconds': min(sql_times),
+    }
+    print(f"results store: imported {summary['rows']} rows in {import_seconds:.2f} s; loading '{dataset_suffix}' "
+          f"{summary['directory_walk_seconds']*1000:.0f} ms from files, {summary['sql_seconds']*1000:.0f} ms from SQLite")
+    return summary
+
+if __name__ == '__main__':
+    benchmark_template_rendering()
+    benchmark_selection_keys()
+    benchmark_results_store()
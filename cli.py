@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import sys
+
+import profiling
+
+# Single entry point for the pipeline stages. Each subcommand imports only the
+# modules it runs, inside its handler, so e.g. `python cli.py evaluate` with an
+# Azure model never imports pandas or the Gemini / Ollama SDKs, and `--help` only
+# pays for argparse. `python cli.py importtime` measures that cold start.
+DEFAULT_HUMANS = ["Man", "Woman", "Child"] # object names used by create_dataset.py
+DEFAULT_ANIMALS = ["Dog", "Cat", "Horse", "Cow"]
+DEFAULT_VEHICLES = ["Car", "Bike", "Cycle", "Plane", "Ship", "Train"]
+DEFAULT_ORIENTATIONS = ['North', 'South', 'East', 'West']
+# Repo modules each subcommand imports (the "analyze" modes add report_builder / confidence_intervals)
+SUBCOMMAND_MODULES = {
+    'generate': ('grid_generation', 'question_generation'),
+    'solve': ('grid_model', 'question_answer_generation'),
+    'filter': ('question_answer_generation',),
+    'build-prompts': ('prompt_generation',),
+    'evaluate': ('llm_evaluation',),
+    'analyze': ('analyze_results',),
+    'import-results': ('results_store',),
+}
+# Every repo module reachable from a subcommand, kept out of the "heaviest packages" list
+REPO_MODULES = {
+    'analyze_results', 'confidence_intervals', 'grid_generation', 'grid_model', 'llm_evaluation', 'profiling',
+    'prompt_generation', 'prompt_keys', 'prompt_templates', 'question_answer_generation', 'question_generation',
+    'report_builder', 'response_parsing', 'result_aggregation', 'results_store', 'sequential_evaluation', 'telemetry',
+}
+IMPORTTIME_REPEATS = 3 # fresh interpreters per subcommand; the fastest run is reported
+IMPORTTIME_TOP_PACKAGES = 5 # heaviest imported packages listed per subcommand
+
+# --- Subcommands ---
+def cmd_generate(args):
+    """Generates a question pool for one level, on an existing grid or a new one."""
+    from question_generation import generate_questions
+    grid_details = args.grid_details
+    if grid_details is None:
+        from grid_generation import generate_sparse_grid
+        print(f"Generating a {args.grid_size}x{args.grid_size} grid with {args.fill*100}% fill ratio")
+        with profiling.stage("generate_grid"):
+            _, grid_details = generate_sparse_grid(args.grid_size, args.fill, DEFAULT_HUMANS, DEFAULT_ANIMALS, DEFAULT_VEHICLES)
+    with profiling.stage("generate_questions"):
+        generate_questions(grid_details, args.templates, args.actions, DEFAULT_ORIENTATIONS, args.output, args.count,
+                           args.grid_size, seed=args.seed, workers=args.workers, num_shards=args.shards,
+                           incorrect_prompt_ratio=args.incorrect_ratio, balance_t3_directions=args.balance_t3)
+
+def cmd_solve(args):
+    """Solves every question of a questions file against its grid."""
+    from grid_model import GridModel
+    from question_answer_generation import solve_questions_from_file
+    with profiling.stage("solve_questions"):
+        solve_questions_from_file(args.questions, args.output, GridModel.load(args.grid_details, args.grid_size), args.grid_size)
+
+def cmd_filter(args):
+    """Keeps a direction-balanced subset of a solved question pool."""
+    from question_answer_generation import filter_question_answer
+    with profiling.stage("filter_question_answer"):
+        filter_question_answer(args.questions, args.answers, args.count, args.output_questions, args.output_answers)
+
+def cmd_build_prompts(args):
+    """Turns a questions file into API-ready prompts with the grid system prompt."""
+    from prompt_generation import create_api_ready_prompts
+    with profiling.stage("create_api_ready_prompts"):
+        create_api_ready_prompts(args.questions, args.grid_details, args.output, args.grid_size)
+
+def cmd_evaluate(args):
+    """Runs run_llm_evaluation for every model and prompts file given, sending repeated prompts once per model."""
+    import llm_evaluation
+    if args.openai_base_url:
+        llm_evaluation.OPENAI_BASE_URL = args.openai_base_url
+    if args.ollama_host:
+        llm_evaluation.OLLAMA_HOST = args.ollama_host
+    if args.results_db:
+        llm_evaluation.RESULTS_DB = args.results_db
+    for model_name in args.model:
+        llm_evaluation.run_llm_evaluation_files(model_name, args.prompts, dedup=not args.no_dedup, pack_size=args.pack_size,
+                                                hedge_requests=args.hedge, adaptive_timeouts=args.adaptive_timeouts,
+                                                ollama_parallel=args.ollama_parallel, target_ci_width=args.target_ci_width,
+                                                min_prompts=args.min_prompts, ci_confidence=args.ci_confidence,
+                                                order_seed=args.order_seed)
+
+def cmd_analyze(args):
+    """Accuracy tables, per-file summaries, the HTML report or confidence intervals of saved results."""
+    if args.mode == 'summary':
+        from analyze_results import analyze_combined_results
+        analyze_combined_results(args.results_dir, args.dataset_suffix, args.results_db)
+    elif args.mode == 'per-file':
+        from analyze_results import analyze_all_results
+        analyze_all_results(args.results_dir)
+    elif args.mode == 'pack-sizes':
+        from analyze_results import analyze_pack_sizes
+        analyze_pack_sizes(root_results_dir=args.results_dir, dataset_suffix=args.dataset_suffix)
+    elif args.mode == 'report':
+        from report_builder import build_report
+        build_report(args.results_dir, args.dataset_suffix, args.output_html, workers=args.workers, force=args.force,
+                     results_db=args.results_db, figures_dir=args.figures_dir)
+    else:
+        from confidence_intervals import bootstrap_accuracy, paired_model_tests
+        if args.results_db:
+            from results_store import load_results_frame
+            combined_df = load_results_frame(args.results_db, args.dataset_suffix)
+        else:
+            from analyze_results import load_combined_results
+            combined_df = load_combined_results(args.results_dir, args.dataset_suffix)
+        if combined_df.empty:
+            print("No results found.")
+            return
+        print(bootstrap_accuracy(combined_df).to_string(float_format="{:.3f}".format))
+        print(paired_model_tests(combined_df).to_string(float_format="{:.4f}".format))
+
+def cmd_import_results(args):
+    """Imports the results/ files into the SQLite results database."""
+    from results_store import connect, import_results_tree
+    conn = connect(args.db)
+    try:
+        counts = import_results_tree(conn, args.results_dir, args.data_dir, include_summaries=not args.no_summaries)
+    finally:
+        conn.close()
+    print(f"Imported {counts['rows']} rows from {counts['files']} files into '{args.db}'.")
+
+def cmd_importtime(args):
+    """Prints (and optionally saves) the cold-start import time of each subcommand."""
+    report = {}
+    print(f"{'subcommand':<14} {'import ms':>10}  heaviest packages")
+    for command in args.commands or list(SUBCOMMAND_MODULES):
+        measurement = measure_import_time(SUBCOMMAND_MODULES[command], args.repeats)
+        report[command] = measurement
+        heaviest = ", ".join(f"{name} {us / 1000:.0f}" for name, us in measurement['heaviest'])
+        print(f"{command:<14} {measurement['import_us'] / 1000:>10.1f}  {heaviest}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"Import times saved to '{args.output}'.")
+    return report
+
+# --- Cold-start measurement ---
+def parse_importtime(stderr_text: str, modules) -> dict:
+    """
+    Reads `python -X importtime` output for an `import <modules>` statement.
+
+    importtime prints one "import time: self | cumulative | name" line per module,
+    children before their parent and indented by two spaces per nesting level.
+
+    Returns:
+        dict: 'import_us' (cumulative microseconds of the top-level `modules`) and
+              'heaviest' ([(package, cumulative us)], top-level packages imported
+              while loading them, heaviest first; nested packages are counted in
+              their parents too).
+    """
+    total_us, imported, pending = 0, {}, []
+    for line in stderr_text.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue # header line
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        name, cumulative_us = name.strip(), int(cumulative)
+        if depth > 0:
+            pending.append((name, cumulative_us))
+            continue
+        if name in modules:
+            total_us += cumulative_us
+            for package, package_us in pending:
+                if "." not in package and package not in REPO_MODULES:
+                    imported[package] = max(imported.get(package, 0), package_us)
+        pending = []
+    heaviest = sorted(imported.items(), key=lambda item: item[1], reverse=True)[:IMPORTTIME_TOP_PACKAGES]
+    return {'import_us': total_us, 'heaviest': heaviest}
+
+def measure_import_time(modules, repeats: int = IMPORTTIME_REPEATS) -> dict:
+    """
+    Imports `modules` in `repeats` fresh interpreters under `python -X importtime`.
+
+    Returns:
+        dict: parse_importtime of the fastest run, plus 'modules' and 'runs_us'
+              (the import time of every run).
+    """
+    import subprocess
+    runs = []
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"Error: importing {', '.join(modules)} failed:\n{completed.stderr.strip().splitlines()[-1]}")
+            return {'modules': list(modules), 'import_us': None, 'heaviest': [], 'runs_us': []}
+        runs.append(parse_importtime(completed.stderr, modules))
+    fastest = min(runs, key=lambda run: run['import_us'])
+    return {'modules': list(modules), 'import_us': fastest['import_us'], 'heaviest': fastest['heaviest'],
+            'runs_us': [run['import_us'] for run in runs]}
+
+# --- Argument parsing ---
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Spatial reasoning benchmark: dataset generation, LLM evaluation and analysis.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help="Generate a question pool for one level.")
+    generate.add_argument('--templates', required=True, help="Templates file, e.g. templates_level_1.json.")
+    generate.add_argument('--output', required=True, help="Questions file to write.")
+    generate.add_argument('--grid-details', default=None, help="Grid details file; a new grid is generated when omitted.")
+    generate.add_argument('--grid-size', type=int, default=10)
+    generate.add_argument('--fill', type=float, default=0.6, help="Fill ratio of a newly generated grid.")
+    generate.add_argument('--actions', default='actions.json')
+    generate.add_argument('--count', type=int, default=10000, help="Questions to generate.")
+    generate.add_argument('--seed', type=int, default=None)
+    generate.add_argument('--workers', type=int, default=None)
+    generate.add_argument('--shards', type=int, default=1)
+    generate.add_argument('--incorrect-ratio', type=float, default=0.0, help="Share of deliberately incorrect prompts.")
+    generate.add_argument('--balance-t3', action='store_true', help="Balance template 3 answers over the directions.")
+    generate.set_defaults(handler=cmd_generate)
+
+    solve = subparsers.add_parser('solve', help="Solve a questions file.")
+    solve.add_argument('--questions', required=True)
+    solve.add_argument('--grid-details', required=True)
+    solve.add_argument('--grid-size', type=int, default=10)
+    solve.add_argument('--output', required=True, help="Answers file to write.")
+    solve.set_defaults(handler=cmd_solve)
+
+    filter_parser = subparsers.add_parser('filter', help="Keep a direction-balanced subset of solved questions.")
+    filter_parser.add_argument('--questions', required=True)
+    filter_parser.add_argument('--answers', required=True)
+    filter_parser.add_argument('--count', type=int, required=True, help="Questions required (total_questions_required).")
+    filter_parser.add_argument('--output-questions', required=True)
+    filter_parser.add_argument('--output-answers', required=True)
+    filter_parser.set_defaults(handler=cmd_filter)
+
+    build_prompts = subparsers.add_parser('build-prompts', help="Build API-ready prompts from a questions file.")
+    build_prompts.add_argument('--questions', required=True)
+    build_prompts.add_argument('--grid-details', required=True)
+    build_prompts.add_argument('--grid-size', type=int, default=10)
+    build_prompts.add_argument('--output', required=True, help="Prompts file to write.")
+    build_prompts.set_defaults(handler=cmd_build_prompts)
+
+    evaluate = subparsers.add_parser('evaluate', help="Query models with API-ready prompts.")
+    evaluate.add_argument('--model', nargs='+', required=True)
+    evaluate.add_argument('--prompts', nargs='+', required=True, help="API prompts files.")
+    evaluate.add_argument('--pack-size', type=int, default=1)
+    evaluate.add_argument('--hedge', action='store_true', help="Hedge requests still running at the model's p95.")
+    evaluate.add_argument('--adaptive-timeouts', action='store_true')
+    evaluate.add_argument('--ollama-parallel', type=int, default=0, help="Concurrent chats for Ollama models (-1: server slots).")
+    evaluate.add_argument('--target-ci-width', type=float, default=None, help="Stop once the accuracy interval is this narrow.")
+    evaluate.add_argument('--min-prompts', type=int, default=100)
+    evaluate.add_argument('--ci-confidence', type=float, default=0.95)
+    evaluate.add_argument('--order-seed', type=int, default=0)
+    evaluate.add_argument('--openai-base-url', default=None, help="Replace the scheme and host of the Azure endpoints.")
+    evaluate.add_argument('--ollama-host', default=None)
+    evaluate.add_argument('--no-dedup', action='store_true', help="Send prompts repeated across the files every time.")
+    evaluate.add_argument('--results-db', default=None, help="Also save every run to this SQLite results database.")
+    evaluate.set_defaults(handler=cmd_evaluate)
+
+    analyze = subparsers.add_parser('analyze', help="Analyze saved evaluation results.")
+    analyze.add_argument('--mode', choices=['summary', 'per-file', 'pack-sizes', 'report', 'ci'], default='summary')
+    analyze.add_argument('--results-dir', default='results')
+    analyze.add_argument('--dataset-suffix', default='2000_10')
+    analyze.add_argument('--output-html', default=os.path.join('reports', 'result_analysis.html'),
+                         help="Report file (--mode report); result_analysis.html is the committed one.")
+    analyze.add_argument('--figures-dir', default='reports',
+                         help="Directory of the report figures (--mode report); results holds the committed ones.")
+    analyze.add_argument('--workers', type=int, default=None, help="Figure rendering processes (--mode report).")
+    analyze.add_argument('--force', action='store_true', help="Redraw every figure (--mode report).")
+    analyze.add_argument('--results-db', default=None, help="Read results from this SQLite database (summary, report, ci).")
+    analyze.set_defaults(handler=cmd_analyze)
+
+    import_results = subparsers.add_parser('import-results', help="Import the results/ files into the SQLite results database.")
+    import_results.add_argument('--db', default=os.path.join('results', 'results.db'))
+    import_results.add_argument('--results-dir', default='results')
+    import_results.add_argument('--data-dir', default='data_files')
+    import_results.add_argument('--no-summaries', action='store_true', help="Skip the analysis_summary*.csv files.")
+    import_results.set_defaults(handler=cmd_import_results)
+
+    importtime = subparsers.add_parser('importtime', help="Measure the cold-start import time of each subcommand.")
+    importtime.add_argument('--commands', nargs='+', choices=list(SUBCOMMAND_MODULES), default=None)
+    importtime.add_argument('--repeats', type=int, default=IMPORTTIME_REPEATS)
+    importtime.add_argument('--output', default=None, help="Also save the measurements as JSON.")
+    importtime.set_defaults(handler=cmd_importtime)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Opt-in profiling: PROFILE_TRACE=trace.json [PROFILE_CPROFILE=1] [PROFILE_TRACEMALLOC=1] python cli.py ...
+    profiling.enable_from_env(f"cli.{args.command}")
+    try:
+        args.handler(args)
+    finally:
+        profiling.finish()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import itertools
+import math
+import statistics
+
+import numpy as np
+import pandas as pd
+
+from analyze_results import load_combined_results
+
+DEFAULT_GROUPS = ('model', 'level', 'expected_answer')
+
+def wilson_interval(correct, n, confidence: float = 0.95):
+    """
+    Wilson score interval for a binomial proportion, vectorized over arrays of cells.
+
+    Args:
+        correct (array-like): Number of correct answers per cell.
+        n (array-like): Number of answers per cell.
+        confidence (float): Two-sided confidence level.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Lower and upper bounds (NaN where n == 0).
+    """
+    correct = np.asarray(correct, dtype=float)
+    n = np.asarray(n, dtype=float)
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = correct / n
+        denominator = 1 + z * z / n
+        centre = (p + z * z / (2 * n)) / denominator
+        half_width = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return centre - half_width, centre + half_width
+
+def bootstrap_accuracy(results_df: pd.DataFrame, by=DEFAULT_GROUPS, num_resamples: int = 10000,
+                       confidence: float = 0.95, seed: int = 0, chunk_size: int = 500) -> pd.DataFrame:
+    """
+    Percentile-bootstrap and Wilson intervals for accuracy in every cell of `by`.
+
+    Rows are sorted so each cell is a contiguous block; every resample draws one
+    index array over all rows at once (each row picks a row of its own cell) and
+    np.add.reduceat turns the gathered correctness values into per-cell means.
+
+    Args:
+        results_df (pd.DataFrame): Combined results with an 'is_correct' column.
+        by (tuple): Columns defining the cells.
+        num_resamples (int): Bootstrap resamples.
+        confidence (float): Two-sided confidence level.
+        seed (int): Seed for the resampling RNG.
+        chunk_size (int): Resamples drawn per vectorized batch (bounds memory).
+
+    Returns:
+        pd.DataFrame: Indexed by `by` with 'n', 'correct', 'accuracy', 'wilson_low',
+                      'wilson_high', 'bootstrap_low' and 'bootstrap_high'.
+    """
+    by = list(by)
+    ordered = results_df.sort_values(by, kind='stable')
+    group_sizes = ordered.groupby(by, sort=True, observed=True).size()
+    sizes = group_sizes.to_numpy()
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    is_correct = ordered['is_correct'].to_numpy(dtype=float)
+
+    row_starts = np.repeat(starts, sizes)
+    row_sizes = np.repeat(sizes, sizes)
+    rng = np.random.default_rng(seed)
+    means = np.empty((num_resamples, len(sizes)))
+    for chunk_start in range(0, num_resamples, chunk_size):
+        chunk = min(chunk_size, num_resamples - chunk_start)
+        resampled_rows = row_starts + (rng.random((chunk, len(is_correct))) * row_sizes).astype(np.int64)
+        means[chunk_start:chunk_start + chunk] = np.add.reduceat(is_correct[resampled_rows], starts, axis=1) / sizes
+
+    alpha = (1 - confidence) / 2
+    correct = np.add.reduceat(is_correct, starts)
+    wilson_low, wilson_high = wilson_interval(correct, sizes, confidence)
+    return pd.DataFrame({
+        'n': sizes,
+        'correct': correct.astype(int),
+        'accuracy': correct / sizes,
+        'wilson_low': wilson_low,
+        'wilson_high': wilson_high,
+        'bootstrap_low': np.quantile(means, alpha, axis=0),
+        'bootstrap_high': np.quantile(means, 1 - alpha, axis=0),
+    }, index=group_sizes.index)
+
+def mcnemar_exact_p(only_a_correct: int, only_b_correct: int) -> float:
+    """Two-sided exact McNemar p-value from the discordant pair counts."""
+    discordant = only_a_correct + only_b_correct
+    if discordant == 0:
+        return 1.0
+    tail = sum(math.comb(discordant, k) for k in range(min(only_a_correct, only_b_correct) + 1))
+    return min(1.0, 2 * tail / 2 ** discordant)
+
+def paired_model_tests(results_df: pd.DataFrame, by=('level',), num_resamples: int = 10000,
+                       confidence: float = 0.95, seed: int = 0, chunk_size: int = 500) -> pd.DataFrame:
+    """
+    Paired comparisons between every pair of models that answered the same prompt_ids.
+
+    For each cell of `by` and model pair, prompts are matched on prompt_id and the
+    accuracy difference gets an exact McNemar test and a paired bootstrap interval,
+    resampled `chunk_size` resamples at a time as in bootstrap_accuracy.
+
+    Returns:
+        pd.DataFrame: One row per (cell, model_a, model_b) with 'n_pairs', 'accuracy_a',
+                      'accuracy_b', 'difference', 'only_a_correct', 'only_b_correct',
+                      'mcnemar_p', 'difference_low' and 'difference_high'.
+    """
+    by = list(by)
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+    rows = []
+    for cell_key, cell_df in results_df.groupby(by, sort=True, observed=True):
+        correct_by_model = cell_df.pivot_table(index='prompt_id', columns='model', values='is_correct', aggfunc='first')
+        for model_a, model_b in itertools.combinations(sorted(correct_by_model.columns), 2):
+            pairs = correct_by_model[[model_a, model_b]].dropna().to_numpy(dtype=float)
+            if not len(pairs):
+                continue
+            differences = pairs[:, 0] - pairs[:, 1]
+            boot_differences = np.empty(num_resamples)
+            for chunk_start in range(0, num_resamples, chunk_size):
+                chunk = min(chunk_size, num_resamples - chunk_start)
+                resampled = rng.integers(0, len(differences), size=(chunk, len(differences)))
+                boot_differences[chunk_start:chunk_start + chunk] = differences[resampled].mean(axis=1)
+            only_a = int((differences > 0).sum())
+            only_b = int((differences < 0).sum())
+            rows.append(dict(zip(by, cell_key if isinstance(cell_key, tuple) else (cell_key,)), **{
+                'model_a': model_a,
+                'model_b': model_b,
+                'n_pairs': len(pairs),
+                'accuracy_a': pairs[:, 0].mean(),
+                'accuracy_b': pairs[:, 1].mean(),
+                'difference': differences.mean(),
+                'only_a_correct': only_a,
+                'only_b_correct': only_b,
+                'mcnemar_p': mcnemar_exact_p(only_a, only_b),
+                'difference_low': np.quantile(boot_differences, alpha),
+                'difference_high': np.quantile(boot_differences, 1 - alpha),
+            }))
+    return pd.DataFrame(rows)
+
+if __name__ == '__main__':
+    combined_df = load_combined_results()
+    if combined_df.empty:
+        print("No results found.")
+    else:
+        print(bootstrap_accuracy(combined_df).to_string(float_format="{:.3f}".format))
+        print(paired_model_tests(combined_df).to_string(float_format="{:.4f}".format))
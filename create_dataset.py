@@ -1,9 +1,12 @@
-from grid_generation import generate_populated_grid
-from question_generation import generate_questions
-from question_answer_generation import solve_questions_from_file,filter_question_answer
+import profiling
+from grid_generation import generate_sparse_grid
+from question_answer_generation import build_balanced_dataset
 from prompt_generation import create_api_ready_prompts
 
 if __name__ == '__main__':
+    # Opt-in profiling: PROFILE_TRACE=trace.json [PROFILE_CPROFILE=1] [PROFILE_TRACEMALLOC=1] python create_dataset.py
+    profiling.enable_from_env('create_dataset')
+
     # Example Usage:
     humans = ["Man", "Woman", "Child"]
     animals = ["Dog", "Cat", "Horse", "Cow"]
@@ -11,12 +14,10 @@ if __name__ == '__main__':
     orientations = ['North', 'South', 'East', 'West']
 
     generated_questions_filenames = ['generated_questions_level_1.json','generated_questions_level_2.json','generated_questions_level_3.json']
-    questions_pool_filenames = ['questions_pool_level_1.json','questions_pool_level_2.json','questions_pool_level_3.json']
 
     prompts_filenames = ['prompts_level_1.json','prompts_level_2.json','prompts_level_3.json']
 
     expected_answer_filenames = ['expected_answer_file_level_1.json','expected_answer_file_level_2.json','expected_answer_file_level_3.json']
-    answer_pool_filenames = ['answer_pool_level_1.json','answer_pool_level_2.json','answer_pool_level_3.json']
 
     templates_filenames = ['templates_level_1.json','templates_level_2.json','templates_level_3.json']
 
@@ -28,18 +29,22 @@ if __name__ == '__main__':
     fill = 0.6 
 
     print(f"Generating a {grid_size}x{grid_size} grid with {fill*100}% fill ratio\n")
-    populated_grid, grid_details_file_name = generate_populated_grid(grid_size, fill, humans, animals, vehicles)
+    with profiling.stage("generate_grid"):
+        populated_grid, grid_details_file_name = generate_sparse_grid(grid_size, fill, humans, animals, vehicles)
 
+    # Questions are solved as they are generated and each level stops once its direction buckets are full
     for i in range(0,3):
-        generate_questions(grid_details_file_name, templates_filenames[i],actions_filename, orientations, questions_pool_filenames[i],questions_pool_count)
-        solve_questions_from_file(questions_pool_filenames[i],answer_pool_filenames[i],populated_grid)
-        filter_question_answer(questions_pool_filenames[i],answer_pool_filenames[i],question_dataset_needed,generated_questions_filenames[i],expected_answer_filenames[i])
-    for row in populated_grid:
+        with profiling.stage(f"build_balanced_dataset_level_{i+1}"):
+            build_balanced_dataset(grid_details_file_name, templates_filenames[i], actions_filename, orientations, question_dataset_needed,
+                                   generated_questions_filenames[i], expected_answer_filenames[i], questions_pool_count, grid_size)
+    for row in populated_grid.to_dense():
         # Adjusted formatting for potentially shorter strings
         print(" ".join(f"{cell: <8}" for cell in row)) 
 
     for i in range(0,3):
-        create_api_ready_prompts(generated_questions_filenames[i], grid_details_file_name, prompts_filenames[i])
+        with profiling.stage(f"create_api_ready_prompts_level_{i+1}"):
+            create_api_ready_prompts(generated_questions_filenames[i], grid_details_file_name, prompts_filenames[i], grid_size)
+    profiling.finish()
     #print(f"\nGenerating a 10x10 grid with 30% fill ratio\n")
     # populated_grid_3x3 = generate_populated_grid(10, 0.3, humans, animals, vehicles)
     # for row in populated_grid_3x3:
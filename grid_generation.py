@@ -1,31 +1,13 @@
-import random, json
+import random, itertools
+import numpy as np
+from grid_model import GridModel
 
-def generate_populated_grid(N, fill_ratio, humans_list, animals_list, vehicles_list):
+def _choose_object_instances(num_cells_to_fill, humans_list, animals_list, vehicles_list, rng=random):
     """
-    Generates an NxN grid populated with unique object instances, ensuring at least
-    one from each available category if space permits. No orientation.
-
-    Args:
-        N (int): The size of the grid (NxN).
-        fill_ratio (float): The percentage of the grid to fill (e.g., 0.5 for 50%).
-        humans_list (list): A list of human types (e.g., ["Man", "Woman"]).
-        animals_list (list): A list of animal types (e.g., ["Dog", "Cat"]).
-        vehicles_list (list): A list of vehicle types (e.g., ["Car", "Bike"]).
-
-    Returns:
-        list[list[str]]: A 2D list representing the grid, where each cell
-                         contains either an object instance string (e.g., "Man1")
-                         or "." for an empty cell.
+    Picks `num_cells_to_fill` unique object instances as (type_name, instance)
+    pairs (e.g. ("Man", 1), ("Man", 2)), taking one from each non-empty category
+    first when space permits.
     """
-    if not (0 <= fill_ratio <= 1):
-        raise ValueError("fill_ratio must be between 0 and 1.")
-    if N <= 0:
-        raise ValueError("N (grid size) must be a positive integer.")
-
-    total_cells = N * N
-    num_cells_to_fill = int(total_cells * fill_ratio)
-    num_cells_to_fill = min(num_cells_to_fill, total_cells) # Cap at total_cells
-
     placed_instances = []
     type_counts = {} # To ensure unique IDs like Man1, Man2
 
@@ -39,15 +21,14 @@ def generate_populated_grid(N, fill_ratio, humans_list, animals_list, vehicles_l
     if vehicles_list:
         potential_categories.append(vehicles_list)
     
-    random.shuffle(potential_categories) # Shuffle to avoid bias in selection order
+    rng.shuffle(potential_categories) # Shuffle to avoid bias in selection order
 
     for category_list in potential_categories:
         if len(placed_instances) < num_cells_to_fill:
             # All lists in potential_categories are guaranteed to be non-empty here
-            chosen_type = random.choice(category_list)
+            chosen_type = rng.choice(category_list)
             type_counts[chosen_type] = type_counts.get(chosen_type, 0) + 1
-            unique_id = f"{chosen_type}{type_counts[chosen_type]}"
-            placed_instances.append(unique_id)
+            placed_instances.append((chosen_type, type_counts[chosen_type]))
         else:
             # Reached fill limit, no need to check other categories for guaranteed pick
             break 
@@ -61,33 +42,161 @@ def generate_populated_grid(N, fill_ratio, humans_list, animals_list, vehicles_l
             for _ in range(num_remaining_slots):
                 if len(placed_instances) >= num_cells_to_fill: # Defensive check
                     break
-                chosen_type = random.choice(all_object_types)
+                chosen_type = rng.choice(all_object_types)
                 type_counts[chosen_type] = type_counts.get(chosen_type, 0) + 1
-                unique_id = f"{chosen_type}{type_counts[chosen_type]}"
-                placed_instances.append(unique_id)
-                
+                placed_instances.append((chosen_type, type_counts[chosen_type]))
+    return placed_instances
+
+def generate_sparse_grid(N, fill_ratio, humans_list, animals_list, vehicles_list, save_to_file=True, rng=random):
+    """
+    Sparse counterpart of generate_populated_grid for large grids.
+
+    Occupied cells are sampled straight from range(N*N) (never materialising the
+    N*N coordinate list) and returned as a GridModel, so memory and time scale
+    with the number of objects rather than the grid area.
+    For the same random state it places exactly the objects generate_populated_grid would.
+
+    Args:
+        N (int): The size of the grid (NxN).
+        fill_ratio (float): The percentage of the grid to fill (e.g., 0.5 for 50%).
+        humans_list (list): A list of human types (e.g., ["Man", "Woman"]).
+        animals_list (list): A list of animal types (e.g., ["Dog", "Cat"]).
+        vehicles_list (list): A list of vehicle types (e.g., ["Car", "Bike"]).
+        save_to_file (bool): Write the usual grid_details_<N>_ratio_<fill>.json file.
+        rng: Source of randomness (a random.Random); defaults to the global random module.
+
+    Returns:
+        tuple[GridModel, str]: The placed objects (x grows east, y grows north), and
+                               the grid details filename ("" if not saved).
+    """
+    if not (0 <= fill_ratio <= 1):
+        raise ValueError("fill_ratio must be between 0 and 1.")
+    if N <= 0:
+        raise ValueError("N (grid size) must be a positive integer.")
+
+    total_cells = N * N
+    num_cells_to_fill = int(total_cells * fill_ratio)
+    num_cells_to_fill = min(num_cells_to_fill, total_cells) # Cap at total_cells
+
+    placed_instances = _choose_object_instances(num_cells_to_fill, humans_list, animals_list, vehicles_list, rng)
+
     # --- Step 3: Place on grid ---
-    grid = [['.' for _ in range(N)] for _ in range(N)]
-    all_coordinates = [(r, c) for r in range(N) for c in range(N)]
-    
-    num_objects_to_actually_place = len(placed_instances)
-    chosen_coordinates = random.sample(all_coordinates, num_objects_to_actually_place)
-
-    json_data_to_save = {} 
-    for i, (r, c) in enumerate(chosen_coordinates):
-        grid[r][c] = placed_instances[i]
-        x_coord = c
-        y_coord = N - 1 - r 
-        json_data_to_save[f"({x_coord},{y_coord})"] = grid[r][c]
-    
+    # Cell index i is row i // N (from the top), column i % N.
+    chosen_cells = rng.sample(range(total_cells), len(placed_instances))
+    rows, cols = np.divmod(np.fromiter(chosen_cells, dtype=np.int64, count=len(chosen_cells)), N)
+    type_codes = {}
+    codes = [type_codes.setdefault(type_name, len(type_codes)) for type_name, _ in placed_instances]
+    instances = [instance for _, instance in placed_instances]
+    grid = GridModel(N, list(type_codes), codes, instances, cols, N - 1 - rows)
+
     # --- Step 4: Write to JSON file ---
     output_filename = ""
-    try:
-        output_filename = 'grid_details_'+str(N)+'_'+'ratio_'+str(fill_ratio*100)+'.json'
-        with open(output_filename, 'w') as f:
-            json.dump(json_data_to_save, f, indent=4, sort_keys=True)
-        print(f"Grid data successfully saved to {output_filename}")
-    except IOError:
-        print(f"Error: Could not write to file {output_filename}")
-        
-    return grid, output_filename
\ No newline at end of file
+    if save_to_file:
+        try:
+            output_filename = 'grid_details_'+str(N)+'_'+'ratio_'+str(fill_ratio*100)+'.json'
+            grid.save(output_filename)
+            print(f"Grid data successfully saved to {output_filename}")
+        except IOError:
+            print(f"Error: Could not write to file {output_filename}")
+    return grid, output_filename
+
+def generate_populated_grid(N, fill_ratio, humans_list, animals_list, vehicles_list):
+    """
+    Generates an NxN grid populated with unique object instances, ensuring at least
+    one from each available category if space permits. No orientation.
+
+    Args:
+        N (int): The size of the grid (NxN).
+        fill_ratio (float): The percentage of the grid to fill (e.g., 0.5 for 50%).
+        humans_list (list): A list of human types (e.g., ["Man", "Woman"]).
+        animals_list (list): A list of animal types (e.g., ["Dog", "Cat"]).
+        vehicles_list (list): A list of vehicle types (e.g., ["Car", "Bike"]).
+
+    Returns:
+        list[list[str]]: A 2D list representing the grid, where each cell
+                         contains either an object instance string (e.g., "Man1")
+                         or "." for an empty cell.
+    """
+    grid, output_filename = generate_sparse_grid(N, fill_ratio, humans_list, animals_list, vehicles_list)
+    return grid.to_dense(), output_filename
+
+
+# --- Bulk generation ---
+def generate_grid_batch(sizes, fill_ratios, category_mixes, grids_per_config=1, seed=0, output_filename=None):
+    """
+    Generates many grids over a (size x fill_ratio x category mix) sweep.
+
+    Every grid draws from its own random.Random seeded from (seed, size, fill_ratio,
+    mix index, repeat), so a grid does not depend on which other configurations are
+    in the sweep or on the global random state. Grids are returned as flat arrays
+    (one slice per grid) instead of dicts, and are only written to disk when
+    `output_filename` is given, as a single .npz file.
+
+    Args:
+        sizes (list[int]): Grid side lengths N.
+        fill_ratios (list[float]): Fill ratios between 0 and 1.
+        category_mixes (list[tuple]): (humans_list, animals_list, vehicles_list) per mix.
+        grids_per_config (int): Grids generated for every combination.
+        seed (int): Base seed of the sweep.
+        output_filename (str, optional): Path of the bulk .npz file to write.
+
+    Returns:
+        dict: 'type_names' (list, indexed by 'type_code'), per-grid arrays 'grid_size',
+              'fill_ratio', 'mix_index', 'repeat' and 'offsets' (objects of grid i are
+              rows offsets[i]:offsets[i+1]), and per-object arrays 'x', 'y',
+              'type_code' and 'instance' (the number in "Man3").
+    """
+    type_names = sorted({type_name for mix in category_mixes for category in mix for type_name in category})
+    type_codes = {type_name: code for code, type_name in enumerate(type_names)}
+    coord_dtype = np.int16 if max(sizes) <= np.iinfo(np.int16).max else np.int32
+
+    grid_meta = {'grid_size': [], 'fill_ratio': [], 'mix_index': [], 'repeat': []}
+    xs, ys, codes, instances, offsets = [], [], [], [], [0]
+    num_objects = 0
+    for N, fill_ratio, mix_index, repeat in itertools.product(sizes, fill_ratios, range(len(category_mixes)), range(grids_per_config)):
+        rng = random.Random(f"{seed}:{N}:{fill_ratio}:{mix_index}:{repeat}")
+        humans_list, animals_list, vehicles_list = category_mixes[mix_index]
+        grid, _ = generate_sparse_grid(N, fill_ratio, humans_list, animals_list, vehicles_list, save_to_file=False, rng=rng)
+        # Re-code the grid's own type table into the batch-wide one
+        batch_codes = np.asarray([type_codes[type_name] for type_name in grid.type_names] or [0], dtype=np.int16)
+        codes.append(batch_codes[grid.type_code])
+        xs.append(grid.x)
+        ys.append(grid.y)
+        instances.append(grid.instance)
+        num_objects += len(grid)
+        offsets.append(num_objects)
+        for key, value in zip(('grid_size', 'fill_ratio', 'mix_index', 'repeat'), (N, fill_ratio, mix_index, repeat)):
+            grid_meta[key].append(value)
+
+    batch = {
+        'type_names': type_names,
+        'grid_size': np.asarray(grid_meta['grid_size'], dtype=np.int32),
+        'fill_ratio': np.asarray(grid_meta['fill_ratio'], dtype=np.float64),
+        'mix_index': np.asarray(grid_meta['mix_index'], dtype=np.int32),
+        'repeat': np.asarray(grid_meta['repeat'], dtype=np.int32),
+        'offsets': np.asarray(offsets, dtype=np.int64),
+        'x': np.concatenate(xs).astype(coord_dtype),
+        'y': np.concatenate(ys).astype(coord_dtype),
+        'type_code': np.concatenate(codes).astype(np.int16),
+        'instance': np.concatenate(instances).astype(np.int32),
+    }
+    if output_filename:
+        try:
+            np.savez_compressed(output_filename, **{key: np.asarray(value) for key, value in batch.items()})
+            print(f"{len(batch['grid_size'])} grids successfully saved to {output_filename}")
+        except IOError:
+            print(f"Error: Could not write to file {output_filename}")
+    return batch
+
+def load_grid_batch(batch_filename):
+    """Loads a batch written by generate_grid_batch back into the same dict form."""
+    with np.load(batch_filename) as data:
+        batch = {key: data[key] for key in data.files}
+    batch['type_names'] = batch['type_names'].tolist()
+    return batch
+
+def grid_from_batch(batch, grid_index):
+    """Returns one grid of a batch as a GridModel (array slices, no per-object strings)."""
+    start, end = batch['offsets'][grid_index], batch['offsets'][grid_index + 1]
+    return GridModel(batch['grid_size'][grid_index], batch['type_names'], batch['type_code'][start:end],
+                     batch['instance'][start:end], batch['x'][start:end], batch['y'][start:end])
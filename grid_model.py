@@ -0,0 +1,244 @@
+import json
+import numpy as np
+
+def parse_coordinates(coord_str):
+    """Converts a coordinate string like "(x,y)" to an (int(x), int(y)) tuple."""
+    try:
+        parts = coord_str.strip("()").split(',')
+        return int(parts[0]), int(parts[1])
+    except Exception as e: # More general exception for parsing
+        raise ValueError(f"Invalid coordinate string format: {coord_str} (Error: {e})")
+
+def split_object_id(obj_id):
+    """"Man12" -> ("Man", 12); an id without a trailing number gets instance -1."""
+    type_name = obj_id.rstrip('0123456789')
+    digits = obj_id[len(type_name):]
+    return type_name, int(digits) if digits else -1
+
+def _coordinate_dtype(N):
+    return np.int16 if N <= np.iinfo(np.int16).max else np.int32
+
+# --- Relative directions ---
+# Compass roses shared by the generator and the solvers; index i of one rose lines up with index i of the other.
+ABSOLUTE_DIRECTIONS = ["North", "North-East", "East", "South-East", "South", "South-West", "West", "North-West"]
+RELATIVE_DIRECTIONS = ["In-Front", "In-Front-Right", "Right", "Behind-Right", "Behind", "Behind-Left", "Left", "In-Front-Left"]
+ORIENTATION_INDEX = {name: i for i, name in enumerate(ABSOLUTE_DIRECTIONS)}
+SAME_CELL = 255
+# Above this many objects GridModel.relative_direction works from coordinates instead of
+# building the (objects, objects, 8) table (32 MB at the limit, 4.6 GB for 24000 objects)
+DIRECTION_TABLE_MAX_OBJECTS = 2048
+
+# Absolute direction index of a displacement, indexed by [sign(dx) + 1][sign(dy) + 1]
+_SIGN_TO_ABSOLUTE = np.full((3, 3), SAME_CELL, dtype=np.uint8)
+for _index, (_dx, _dy) in enumerate([(0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)]):
+    _SIGN_TO_ABSOLUTE[_dx + 1, _dy + 1] = _index
+# Relative direction index, indexed by [sign(dx) + 1, sign(dy) + 1, orientation index] (3 x 3 x 8, uint8)
+RELATIVE_LOOKUP = np.where(_SIGN_TO_ABSOLUTE[:, :, None] == SAME_CELL, SAME_CELL,
+                           (_SIGN_TO_ABSOLUTE[:, :, None].astype(np.int16) - np.arange(8)) % 8).astype(np.uint8)
+# Nested-list copies for scalar lookups (indexing numpy arrays one element at a time is slow)
+_ABSOLUTE_BY_SIGN = _SIGN_TO_ABSOLUTE.tolist()
+_RELATIVE_BY_SIGN = RELATIVE_LOOKUP.tolist()
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+def absolute_direction_index(dx, dy):
+    """Index into ABSOLUTE_DIRECTIONS of the displacement (dx, dy); SAME_CELL for (0, 0)."""
+    return _ABSOLUTE_BY_SIGN[_sign(dx) + 1][_sign(dy) + 1]
+
+def relative_direction_index(dx, dy, orientation_index):
+    """Index into RELATIVE_DIRECTIONS of (dx, dy) seen by an observer facing ABSOLUTE_DIRECTIONS[orientation_index]."""
+    return _RELATIVE_BY_SIGN[_sign(dx) + 1][_sign(dy) + 1][orientation_index]
+
+def relative_direction(agent_x, agent_y, agent_orientation, target_x, target_y):
+    """
+    Relative direction (8-way) of a target from an agent's perspective, by table lookup.
+    Returns the same strings, including the error strings, as determine_relative_direction.
+    """
+    dx = target_x - agent_x
+    dy = target_y - agent_y
+    if dx == 0 and dy == 0:
+        return "Error: Reference and Target are in the same cell."
+    orientation_index = ORIENTATION_INDEX.get(agent_orientation)
+    if orientation_index is None:
+        absolute_direction = ABSOLUTE_DIRECTIONS[absolute_direction_index(dx, dy)]
+        return f"Error: Invalid orientation '{agent_orientation}' or calculated direction '{absolute_direction}'."
+    return RELATIVE_DIRECTIONS[relative_direction_index(dx, dy, orientation_index)]
+
+class GridModel:
+    """
+    Compact, array-backed description of one populated NxN grid.
+
+    Object i sits at (x[i], y[i]) (x grows east, y grows north) and is named
+    type_names[type_code[i]] + str(instance[i]), e.g. "Man3". Coordinates are
+    int16 (int32 for N > 32767), so a grid costs a few bytes per object instead
+    of a string-keyed dict. Object names and the (x, y) -> object index are
+    built lazily and cached, so coordinate strings are parsed once at load time.
+    """
+    __slots__ = ('size', 'type_names', 'type_code', 'instance', 'x', 'y', '_names', '_id_index', '_cell_index', '_direction_table')
+
+    def __init__(self, size, type_names, type_code, instance, x, y):
+        coord_dtype = _coordinate_dtype(size)
+        self.size = int(size)
+        self.type_names = list(type_names)
+        self.type_code = np.asarray(type_code, dtype=np.int16)
+        self.instance = np.asarray(instance, dtype=np.int32)
+        self.x = np.asarray(x, dtype=coord_dtype)
+        self.y = np.asarray(y, dtype=coord_dtype)
+        self._names = None
+        self._id_index = None
+        self._cell_index = None
+        self._direction_table = None
+
+    # --- Construction ---
+    @classmethod
+    def from_objects(cls, size, objects):
+        """Builds a model from an iterable of (type_name, instance, x, y) in object order."""
+        type_codes = {}
+        codes, instances, xs, ys = [], [], [], []
+        for type_name, instance, x, y in objects:
+            codes.append(type_codes.setdefault(type_name, len(type_codes)))
+            instances.append(instance)
+            xs.append(x)
+            ys.append(y)
+        return cls(size, list(type_codes), codes, instances, xs, ys)
+
+    @classmethod
+    def from_occupied(cls, occupied, size):
+        """Builds a model from a {(x, y): object_id} index."""
+        return cls.from_objects(size, (split_object_id(obj_id) + (x, y) for (x, y), obj_id in occupied.items()))
+
+    @classmethod
+    def from_dense(cls, grid):
+        """Builds a model from the NxN list-of-rows form ('.' for empty), top row first."""
+        N = len(grid)
+        return cls.from_objects(N, (split_object_id(cell) + (c, N - 1 - r)
+                                    for r, row in enumerate(grid) for c, cell in enumerate(row) if cell != '.'))
+
+    @classmethod
+    def from_grid_details(cls, grid_data_raw, size=None):
+        """
+        Builds a model from the {"(x,y)": object_id} dict of a grid details file,
+        keeping the file's object order. Invalid coordinate strings are skipped
+        with a warning. When size is omitted it is inferred from the largest
+        occupied coordinate, which underestimates N on sparse grids.
+        """
+        objects = []
+        for coord_str, obj_id in grid_data_raw.items():
+            try:
+                x, y = parse_coordinates(coord_str)
+            except ValueError as e:
+                print(f"Warning: Skipping invalid coordinate string '{coord_str}' in grid data: {e}")
+                continue
+            objects.append(split_object_id(obj_id) + (x, y))
+        if size is None:
+            size = max((max(x, y) for _, _, x, y in objects), default=-1) + 1
+        return cls.from_objects(size, objects)
+
+    @classmethod
+    def load(cls, grid_details_filename, size=None):
+        """Loads a grid_details_*.json file (raises FileNotFoundError / json.JSONDecodeError)."""
+        with open(grid_details_filename, 'r') as f:
+            return cls.from_grid_details(json.load(f), size)
+
+    @classmethod
+    def coerce(cls, grid, size=None):
+        """Returns `grid` as a GridModel, accepting a model, a dense grid or a sparse {(x, y): id} index."""
+        if isinstance(grid, cls):
+            return grid
+        if isinstance(grid, dict):
+            if size is None:
+                raise ValueError("grid_size is required for a sparse grid.")
+            return cls.from_occupied(grid, size)
+        return cls.from_dense(grid)
+
+    # --- Lookups ---
+    def __len__(self):
+        return len(self.type_code)
+
+    @property
+    def names(self):
+        """Object names ("Man3", ...) indexed by object number."""
+        if self._names is None:
+            type_names = self.type_names
+            self._names = [type_names[code] if instance < 0 else f"{type_names[code]}{instance}"
+                           for code, instance in zip(self.type_code.tolist(), self.instance.tolist())]
+        return self._names
+
+    def index_of(self, obj_id):
+        """Object number of a name, or None if it is not on the grid."""
+        if self._id_index is None:
+            self._id_index = {name: i for i, name in enumerate(self.names)}
+        return self._id_index.get(obj_id)
+
+    def position(self, i):
+        """(x, y) of object i as Python ints."""
+        return int(self.x[i]), int(self.y[i])
+
+    def positions(self):
+        """[(x, y), ...] for every object, in object order."""
+        return list(zip(self.x.tolist(), self.y.tolist()))
+
+    def cell_index(self):
+        """{(x, y): object number} for every occupied cell."""
+        if self._cell_index is None:
+            self._cell_index = {pos: i for i, pos in enumerate(self.positions())}
+        return self._cell_index
+
+    def object_at(self, x, y):
+        """Name of the object at (x, y), or None for an empty cell."""
+        i = self.cell_index().get((x, y))
+        return None if i is None else self.names[i]
+
+    def occupied_cells(self, exclude_id=None):
+        """Set of occupied (x, y), leaving out the cell of the object named `exclude_id`."""
+        cells = set(self.cell_index())
+        excluded = self.index_of(exclude_id) if exclude_id is not None else None
+        if excluded is not None:
+            cells.discard(self.position(excluded))
+        return cells
+
+    def direction_table(self):
+        """
+        uint8 array of shape (objects, objects, 8): entry [i, j, o] is the index into
+        RELATIVE_DIRECTIONS of object j seen from object i facing ABSOLUTE_DIRECTIONS[o]
+        (SAME_CELL on the diagonal). Built once with vectorized ops and cached; it takes
+        8 * objects**2 bytes (29 KB for 60 objects), so it is meant for question-sized grids
+        (relative_direction only uses it up to DIRECTION_TABLE_MAX_OBJECTS objects).
+        """
+        if self._direction_table is None:
+            x = self.x.astype(np.int64)
+            y = self.y.astype(np.int64)
+            dx_sign = np.sign(x[None, :] - x[:, None]) + 1
+            dy_sign = np.sign(y[None, :] - y[:, None]) + 1
+            self._direction_table = RELATIVE_LOOKUP[dx_sign, dy_sign]
+        return self._direction_table
+
+    def relative_direction(self, observer, orientation, target):
+        """Name of the direction of object `target` from object `observer` facing `orientation` (O(1))."""
+        if len(self) > DIRECTION_TABLE_MAX_OBJECTS:
+            (observer_x, observer_y), (target_x, target_y) = self.position(observer), self.position(target)
+            return RELATIVE_DIRECTIONS[relative_direction_index(target_x - observer_x, target_y - observer_y, ORIENTATION_INDEX[orientation])]
+        return RELATIVE_DIRECTIONS[self.direction_table()[observer, target, ORIENTATION_INDEX[orientation]]]
+
+    # --- Export ---
+    def to_grid_details(self):
+        """{"(x,y)": object_id} as stored in grid details files."""
+        return {f"({x},{y})": name for (x, y), name in zip(self.positions(), self.names)}
+
+    def to_occupied(self):
+        """{(x, y): object_id} sparse index."""
+        return dict(zip(self.positions(), self.names))
+
+    def to_dense(self):
+        """NxN list of rows, top row first, with '.' for empty cells."""
+        N = self.size
+        grid = [['.' for _ in range(N)] for _ in range(N)]
+        for (x, y), name in zip(self.positions(), self.names):
+            grid[N - 1 - y][x] = name
+        return grid
+
+    def save(self, grid_details_filename):
+        """Writes the grid details JSON file."""
+        with open(grid_details_filename, 'w') as f:
+            json.dump(self.to_grid_details(), f, indent=4, sort_keys=True)
@@ -0,0 +1,121 @@
+import argparse
+import contextlib
+import io
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_evaluation
+from mock_llm_server import MockLLMServer, add_mock_config_arguments, mock_config_from_args
+from response_parsing import parse_llm_response
+from sequential_evaluation import load_prompt_labels
+from telemetry import percentile
+
+DEFAULT_CONCURRENCY_LEVELS = (1, 2, 4, 8, 16, 32)
+# Model names that route get_llm_response to each protocol
+PROTOCOL_MODELS = {'openai': 'gpt-4.1-mini', 'ollama': 'llama3'}
+
+def run_load_level(model_name: str, prompts: list, concurrency: int, num_requests: int, expected_answers: dict = None) -> dict:
+    """
+    Sends `num_requests` prompts (cycling through `prompts`) through
+    llm_evaluation.get_llm_response with `concurrency` requests in flight.
+
+    Returns:
+        dict: Throughput (all answers and successful ones per second), error rate,
+              retries, HTTP status counts, latency percentiles of successful requests
+              and, with `expected_answers`, the accuracy of the parsed answers.
+    """
+    batch = [prompts[i % len(prompts)] for i in range(num_requests)]
+    start_time = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()): # get_llm_response prints one line per request
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda prompt_object: llm_evaluation.get_llm_response(model_name, prompt_object["messages"]), batch))
+    wall_s = time.monotonic() - start_time
+
+    succeeded = [(prompt_object, result) for prompt_object, result in zip(batch, results) if not llm_evaluation._is_error(result)]
+    latencies = [result["telemetry"]["latency_s"] for _, result in succeeded]
+    level = {
+        'concurrency': concurrency,
+        'requests': num_requests,
+        'wall_s': wall_s,
+        'requests_per_s': num_requests / wall_s,
+        'successful_per_s': len(succeeded) / wall_s,
+        'errors': num_requests - len(succeeded),
+        'error_rate': (num_requests - len(succeeded)) / num_requests,
+        'retries': sum(result["telemetry"]["retries"] for result in results),
+        'http_status': dict(Counter(str(result["telemetry"]["http_status"]) for result in results)),
+        'latency_s': {'p50': percentile(latencies, 50), 'p95': percentile(latencies, 95), 'p99': percentile(latencies, 99)},
+        'completion_tokens': sum(result["telemetry"]["completion_tokens"] or 0 for _, result in succeeded),
+        'accuracy': None,
+    }
+    if expected_answers:
+        scored = [parse_llm_response(result["text"]) == expected_answers[prompt_object["id"]]
+                  for prompt_object, result in succeeded if prompt_object["id"] in expected_answers]
+        level['accuracy'] = sum(scored) / len(scored) if scored else None
+    return level
+
+def run_load_test(model_name: str, prompts: list, concurrency_levels=DEFAULT_CONCURRENCY_LEVELS,
+                  requests_per_level: int = 64, expected_answers: dict = None) -> list:
+    """Runs run_load_level at each concurrency in turn and prints one line per level."""
+    levels = []
+    print(f"{'conc':>5} {'req':>5} {'wall s':>8} {'req/s':>8} {'ok/s':>8} {'err %':>6} {'retry':>6} "
+          f"{'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'acc':>6}")
+    for concurrency in concurrency_levels:
+        level = run_load_level(model_name, prompts, concurrency, requests_per_level, expected_answers)
+        levels.append(level)
+        latency = level['latency_s']
+        print(f"{concurrency:>5} {level['requests']:>5} {level['wall_s']:>8.2f} {level['requests_per_s']:>8.2f} "
+              f"{level['successful_per_s']:>8.2f} {100 * level['error_rate']:>6.1f} {level['retries']:>6} "
+              f"{_fmt(latency['p50']):>7} {_fmt(latency['p95']):>7} {_fmt(latency['p99']):>7} {_fmt(level['accuracy']):>6}")
+    return levels
+
+def _fmt(value):
+    return "n/a" if value is None else f"{value:.2f}"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Drive llm_evaluation at rising concurrency against the mock LLM server.")
+    parser.add_argument('--prompts', default='data_files/api-prompts/prompts_level_1_800.json', help="API prompts file to send.")
+    parser.add_argument('--protocol', choices=sorted(PROTOCOL_MODELS), default='openai')
+    parser.add_argument('--model', default=None, help="Model name passed to get_llm_response (default: one for --protocol).")
+    parser.add_argument('--concurrency', default=",".join(map(str, DEFAULT_CONCURRENCY_LEVELS)), help="Comma-separated levels.")
+    parser.add_argument('--requests', type=int, default=64, help="Requests per concurrency level.")
+    parser.add_argument('--url', default=None, help="Use a server that is already running instead of starting the mock.")
+    parser.add_argument('--retry-backoff', type=float, default=llm_evaluation.RETRY_BACKOFF_SECONDS,
+                        help="Seconds of backoff per retry on 429/5xx (llm_evaluation.RETRY_BACKOFF_SECONDS).")
+    parser.add_argument('--output', default='load_test_results.json')
+    add_mock_config_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        with open(args.prompts, 'r') as f:
+            prompts = [p for p in json.load(f) if p.get("id") and p.get("messages")]
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"Error: Could not load prompts from '{args.prompts}'. {e}")
+        raise SystemExit(1)
+    labels = load_prompt_labels(args.prompts)
+    expected_answers = labels[0] if labels else None
+
+    model_name = args.model or PROTOCOL_MODELS[args.protocol]
+    mock_config = mock_config_from_args(args)
+    llm_evaluation.RETRY_BACKOFF_SECONDS = args.retry_backoff
+    server = None if args.url else MockLLMServer(mock_config).start()
+    base_url = args.url or server.url
+    if args.protocol == 'openai':
+        llm_evaluation.OPENAI_BASE_URL = base_url
+    else:
+        llm_evaluation.OLLAMA_HOST = base_url
+    print(f"Load test of {model_name} at {base_url} with {len(prompts)} prompts from {args.prompts}")
+
+    try:
+        levels = run_load_test(model_name, prompts, [int(c) for c in args.concurrency.split(',')], args.requests, expected_answers)
+    finally:
+        server_stats = server.stats() if server else None
+        if server:
+            server.stop()
+
+    report = {'model': model_name, 'protocol': args.protocol, 'base_url': base_url, 'prompts_file': args.prompts,
+              'mock_config': None if args.url else mock_config, 'server_stats': server_stats, 'levels': levels}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Load curve saved to '{args.output}'.")
@@ -0,0 +1,409 @@
+import argparse
+import functools
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from grid_model import RELATIVE_DIRECTIONS, GridModel, split_object_id
+from question_answer_generation import solve_question
+
+# Local stand-in for the chat APIs called by llm_evaluation.get_llm_response. It speaks
+# OpenAI chat completions (any path ending in /chat/completions, so the Azure deployment
+# URLs work unchanged) and the Ollama /api/chat and /api/generate endpoints, and answers
+# with the project's own solvers, so runs against it can be scored like real ones.
+DEFAULT_MOCK_CONFIG = {
+    'latency': 'lognormal', # 'fixed', 'lognormal' or 'exponential'
+    'median_latency_s': 0.5, # median of the latency distribution (the mean for 'exponential')
+    'latency_sigma': 0.5, # sigma of log(latency) for 'lognormal'
+    'tail_rate': 0.0, # share of requests that are stragglers...
+    'tail_factor': 10.0, # ...taking this many times longer
+    'rate_429': 0.0, # share of requests rejected with 429 Too Many Requests
+    'rate_5xx': 0.0, # share of requests failing with 500 / 503
+    'max_concurrency': 0, # requests served at once (0: unlimited); the rest wait for a slot
+    'max_queue': None, # requests waiting for a slot beyond this get a 429 (None: unbounded)
+    'accuracy': 1.0, # chance of answering a solvable question correctly
+    'reasoning_tokens': 0, # reported reasoning tokens per request
+    'load_s': 0.0, # Ollama: time to load a model on its first request
+    'seed': None,
+}
+LATENCY_DISTRIBUTIONS = ('fixed', 'lognormal', 'exponential')
+CHARS_PER_TOKEN = 4 # rough token count reported in usage
+# (complexity level, template id) pairs tried in turn; each solver rejects prompts of other templates
+SOLVER_TEMPLATES = (('low', '1'), ('medium', '1'), ('medium', '2'), ('high', '1'))
+ANSWER_CHOICES = RELATIVE_DIRECTIONS + ['incorrect prompt']
+
+_GRID_SIZE_PATTERN = re.compile(r"grid of size (\d+)x\d+")
+_GRID_OBJECT_PATTERN = re.compile(r"- Object '(\w+)' is at position \((\d+),(\d+)\)\.")
+_PACKED_QUESTION_PATTERN = re.compile(r"^Question (\d+):\n", re.MULTILINE)
+
+# --- Answers ---
+@functools.lru_cache(maxsize=32)
+def grid_from_system_prompt(system_prompt: str):
+    """The GridModel listed in a system prompt of prompt_generation.create_system_prompt, or None."""
+    size_match = _GRID_SIZE_PATTERN.search(system_prompt)
+    objects = [split_object_id(obj_id) + (int(x), int(y)) for obj_id, x, y in _GRID_OBJECT_PATTERN.findall(system_prompt)]
+    if not size_match or not objects:
+        return None
+    return GridModel.from_objects(int(size_match.group(1)), objects)
+
+def solve_prompt(prompt_text: str, grid: GridModel):
+    """The solver's answer to one question, or None if no template matches it."""
+    for complexity_level, template_id in SOLVER_TEMPLATES:
+        answer = solve_question(complexity_level, template_id, prompt_text, grid)
+        if not answer.startswith("Error:"):
+            return answer
+    return None
+
+def split_user_prompt(user_prompt: str) -> list:
+    """The questions of a user message: one, or several numbered "Question <n>:" ones (a packed request)."""
+    parts = _PACKED_QUESTION_PATTERN.split(user_prompt)
+    if len(parts) < 3:
+        return [user_prompt]
+    return [text.strip() for text in parts[2::2]]
+
+def mock_answer_text(messages: list, accuracy: float, rng: random.Random) -> str:
+    """
+    Response text for a chat request, in the answer format of the system prompt.
+
+    Each question gets the solver's answer with probability `accuracy` and otherwise
+    a different one; questions that cannot be solved get a random answer.
+    """
+    system_prompt = next((m.get('content', '') for m in messages if m.get('role') == 'system'), '')
+    user_prompt = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+    grid = grid_from_system_prompt(system_prompt)
+    questions = split_user_prompt(user_prompt)
+
+    answers = []
+    for question in questions:
+        expected = solve_prompt(question, grid) if grid is not None else None
+        if expected is not None and rng.random() < accuracy:
+            answers.append(expected)
+        else:
+            answers.append(rng.choice([choice for choice in ANSWER_CHOICES if choice != expected]))
+
+    reasoning = f"Working through {len(questions)} question(s) on the grid step by step."
+    if len(questions) == 1 and not _PACKED_QUESTION_PATTERN.search(user_prompt):
+        return f"{reasoning}\n###Answer: {answers[0]}"
+    return reasoning + "".join(f"\n###Answer {n}: {answer}" for n, answer in enumerate(answers, start=1))
+
+def count_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+# --- Server ---
+class MockBackend:
+    """Configuration, random state, slots and counters shared by the request handlers."""
+    def __init__(self, config: dict = None):
+        self.config = {**DEFAULT_MOCK_CONFIG, **(config or {})}
+        if self.config['latency'] not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{self.config['latency']}'. Expected one of {LATENCY_DISTRIBUTIONS}.")
+        max_concurrency = self.config['max_concurrency']
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._rng = random.Random(self.config['seed'])
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._loaded_models = set()
+        self.counters = {'requests': 0, 'in_flight': 0, 'max_in_flight': 0, 'rejected_429': 0, 'failed_5xx': 0,
+                         'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def _random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def sample_latency(self) -> float:
+        config = self.config
+        with self._lock:
+            if config['latency'] == 'fixed':
+                latency = config['median_latency_s']
+            elif config['latency'] == 'lognormal':
+                latency = config['median_latency_s'] * math.exp(self._rng.gauss(0, config['latency_sigma']))
+            else:
+                latency = self._rng.expovariate(1 / config['median_latency_s']) if config['median_latency_s'] else 0.0
+            if self._rng.random() < config['tail_rate']:
+                latency *= config['tail_factor']
+        return latency
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+
+    def acquire_slot(self) -> bool:
+        """Waits for a free slot; False if the queue is full (the request is rejected)."""
+        if self._slots is None:
+            return True
+        with self._lock:
+            if self._slots.acquire(blocking=False):
+                return True
+            if self.config['max_queue'] is not None and self._waiting >= self.config['max_queue']:
+                return False
+            self._waiting += 1
+        self._slots.acquire()
+        with self._lock:
+            self._waiting -= 1
+        return True
+
+    def release_slot(self):
+        if self._slots is not None:
+            self._slots.release()
+
+    def complete(self, messages: list, model_name: str = None):
+        """
+        Serves one chat request: injected failure, latency and answer.
+
+        Returns:
+            tuple: (HTTP status, response text or error message, timings dict with
+                   'load_s' and 'latency_s', usage dict with token counts)
+        """
+        self._count(requests=1)
+        roll = self._random()
+        if roll < self.config['rate_429']:
+            self._count(rejected_429=1)
+            return 429, "Rate limit exceeded (injected).", None, None
+        if roll < self.config['rate_429'] + self.config['rate_5xx']:
+            self._count(failed_5xx=1)
+            return (500 if self._random() < 0.5 else 503), "Internal server error (injected).", None, None
+        if not self.acquire_slot():
+            self._count(rejected_429=1)
+            return 429, "Too many requests queued.", None, None
+
+        try:
+            with self._lock:
+                self.counters['in_flight'] += 1
+                self.counters['max_in_flight'] = max(self.counters['max_in_flight'], self.counters['in_flight'])
+                needs_load = model_name is not None and model_name not in self._loaded_models
+                self._loaded_models.add(model_name)
+            load_s = self.config['load_s'] if needs_load else 0.0
+            latency_s = self.sample_latency()
+            with self._lock:
+                text = mock_answer_text(messages, self.config['accuracy'], self._rng)
+            time.sleep(load_s + latency_s)
+        finally:
+            self._count(in_flight=-1)
+            self.release_slot()
+
+        usage = {
+            'prompt_tokens': sum(count_tokens(m.get('content', '')) for m in messages),
+            'completion_tokens': count_tokens(text) + self.config['reasoning_tokens'],
+            'reasoning_tokens': self.config['reasoning_tokens'],
+        }
+        self._count(prompt_tokens=usage['prompt_tokens'], completion_tokens=usage['completion_tokens'])
+        return 200, text, {'load_s': load_s, 'latency_s': latency_s}, usage
+
+    def load_model(self, model_name: str) -> float:
+        """Ollama warm-up: loads the model if needed and returns the load time."""
+        with self._lock:
+            needs_load = model_name not in self._loaded_models
+            self._loaded_models.add(model_name)
+        load_s = self.config['load_s'] if needs_load else 0.0
+        time.sleep(load_s)
+        return load_s
+
+    def loaded_models(self) -> list:
+        with self._lock:
+            return sorted(name for name in self._loaded_models if name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+class MockLLMRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return None
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/stats':
+            self._send_json(200, self.server.backend.stats())
+        elif path == '/api/tags':
+            self._send_json(200, {'models': [{'name': name} for name in self.server.backend.loaded_models()]})
+        else:
+            self._send_json(404, {'error': f"Unknown path '{path}'."})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        request = self._read_json()
+        if request is None:
+            self._send_json(400, {'error': "Request body is not valid JSON."})
+        elif path.endswith('/chat/completions'):
+            self._openai_chat(request)
+        elif path == '/api/chat':
+            self._ollama_chat(request)
+        elif path == '/api/generate':
+            self._ollama_generate(request)
+        else:
+            self._send_json(404, {'error': f"Unknown path '{path}'."})
+
+    def _openai_chat(self, request: dict):
+        status, text, _, usage = self.server.backend.complete(request.get('messages') or [])
+        if status != 200:
+            headers = {'Retry-After': '1'} if status == 429 else None
+            self._send_json(status, {'error': {'code': str(status), 'message': text}}, headers)
+            return
+        self._send_json(200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model') or 'mock',
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {
+                'prompt_tokens': usage['prompt_tokens'],
+                'completion_tokens': usage['completion_tokens'],
+                'total_tokens': usage['prompt_tokens'] + usage['completion_tokens'],
+                'prompt_tokens_details': {'cached_tokens': 0},
+                'completion_tokens_details': {'reasoning_tokens': usage['reasoning_tokens']},
+            },
+        })
+
+    def _ollama_chat(self, request: dict):
+        model_name = request.get('model') or 'mock'
+        status, text, timings, usage = self.server.backend.complete(request.get('messages') or [], model_name)
+        if status != 200:
+            self._send_json(status, {'error': text})
+            return
+        # Durations are nanoseconds; the sampled latency is split between prompt evaluation and generation
+        inference_ns = int(timings['latency_s'] * 1e9)
+        load_ns = int(timings['load_s'] * 1e9)
+        self._send_json(200, {
+            'model': model_name,
+            'created_at': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            'message': {'role': 'assistant', 'content': text},
+            'done': True,
+            'done_reason': 'stop',
+            'total_duration': load_ns + inference_ns,
+            'load_duration': load_ns,
+            'prompt_eval_count': usage['prompt_tokens'],
+            'prompt_eval_duration': inference_ns // 4,
+            'eval_count': usage['completion_tokens'],
+            'eval_duration': inference_ns - inference_ns // 4,
+        })
+
+    def _ollama_generate(self, request: dict):
+        model_name = request.get('model') or 'mock'
+        load_ns = int(self.server.backend.load_model(model_name) * 1e9)
+        self._send_json(200, {
+            'model': model_name,
+            'created_at': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            'response': '',
+            'done': True,
+            'done_reason': 'load',
+            'total_duration': load_ns,
+            'load_duration': load_ns,
+        })
+
+class MockLLMServer:
+    """
+    The mock server on a background thread.
+
+    Usage:
+        with MockLLMServer({'median_latency_s': 0.2, 'rate_429': 0.05}) as server:
+            llm_evaluation.OPENAI_BASE_URL = server.url
+            ...
+
+    Args:
+        config (dict, optional): Overrides of DEFAULT_MOCK_CONFIG.
+        host (str): Interface to listen on.
+        port (int): Port; 0 picks a free one.
+        verbose (bool): Log every request to stderr.
+    """
+    def __init__(self, config: dict = None, host: str = '127.0.0.1', port: int = 0, verbose: bool = False):
+        self.backend = MockBackend(config)
+        self.httpd = ThreadingHTTPServer((host, port), MockLLMRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.backend = self.backend
+        self.httpd.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def add_mock_config_arguments(parser: argparse.ArgumentParser):
+    """Command-line options for the DEFAULT_MOCK_CONFIG keys (shared with load_test.py)."""
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default=DEFAULT_MOCK_CONFIG['latency'])
+    parser.add_argument('--median-latency', type=float, default=DEFAULT_MOCK_CONFIG['median_latency_s'], help="Median latency in seconds.")
+    parser.add_argument('--latency-sigma', type=float, default=DEFAULT_MOCK_CONFIG['latency_sigma'])
+    parser.add_argument('--tail-rate', type=float, default=DEFAULT_MOCK_CONFIG['tail_rate'])
+    parser.add_argument('--tail-factor', type=float, default=DEFAULT_MOCK_CONFIG['tail_factor'])
+    parser.add_argument('--rate-429', type=float, default=DEFAULT_MOCK_CONFIG['rate_429'])
+    parser.add_argument('--rate-5xx', type=float, default=DEFAULT_MOCK_CONFIG['rate_5xx'])
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MOCK_CONFIG['max_concurrency'])
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MOCK_CONFIG['max_queue'])
+    parser.add_argument('--accuracy', type=float, default=DEFAULT_MOCK_CONFIG['accuracy'])
+    parser.add_argument('--reasoning-tokens', type=int, default=DEFAULT_MOCK_CONFIG['reasoning_tokens'])
+    parser.add_argument('--load-time', type=float, default=DEFAULT_MOCK_CONFIG['load_s'], help="Ollama model load time in seconds.")
+    parser.add_argument('--seed', type=int, default=DEFAULT_MOCK_CONFIG['seed'])
+
+def mock_config_from_args(args) -> dict:
+    return {
+        'latency': args.latency, 'median_latency_s': args.median_latency, 'latency_sigma': args.latency_sigma,
+        'tail_rate': args.tail_rate, 'tail_factor': args.tail_factor, 'rate_429': args.rate_429, 'rate_5xx': args.rate_5xx,
+        'max_concurrency': args.max_concurrency, 'max_queue': args.max_queue, 'accuracy': args.accuracy,
+        'reasoning_tokens': args.reasoning_tokens, 'load_s': args.load_time, 'seed': args.seed,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mock OpenAI / Ollama chat server for testing llm_evaluation.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--verbose', action='store_true')
+    add_mock_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockLLMServer(mock_config_from_args(args), args.host, args.port, args.verbose)
+    print(f"Mock LLM server listening on {server.url}")
+    print(f"  OpenAI: {server.url}/chat/completions  (set LLM_EVAL_OPENAI_BASE_URL={server.url})")
+    print(f"  Ollama: {server.url}/api/chat  (set LLM_EVAL_OLLAMA_HOST={server.url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"Served: {json.dumps(server.stats())}")
@@ -0,0 +1,272 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from grid_generation import generate_populated_grid, generate_sparse_grid
+from grid_model import GridModel
+from prompt_generation import create_api_ready_prompts
+from question_answer_generation import build_balanced_dataset, filter_question_answer, solve_questions_from_file
+from question_generation import generate_questions
+
+# End-to-end benchmarks of the dataset pipeline over a matrix of grid sizes, fill ratios
+# and question pool sizes. Every run is appended to a JSON history and compared with a
+# stored baseline run; a stage that got slower or bigger than the tolerance is flagged.
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(REPO_DIR, 'data_files', 'templates')
+ACTIONS_FILE = os.path.join(REPO_DIR, 'data_files', 'grid_creation', 'actions.json')
+BENCHMARK_HISTORY_FILE = os.path.join(REPO_DIR, 'benchmark_history.json') # appended on every run; git-ignored
+BENCHMARK_BASELINE_FILE = os.path.join(REPO_DIR, 'benchmark_baseline.json')
+
+DEFAULT_GRID_SIZES = (5, 10, 50, 200)
+DEFAULT_FILL_RATIOS = (0.3, 0.6)
+DEFAULT_POOL_SIZES = (1000, 10000)
+LEVELS = (1, 2, 3)
+# Same object types and orientations as create_dataset.py
+HUMANS = ["Man", "Woman", "Child"]
+ANIMALS = ["Dog", "Cat", "Horse", "Cow"]
+VEHICLES = ["Car", "Bike", "Cycle", "Plane", "Ship", "Train"]
+ORIENTATIONS = ['North', 'South', 'East', 'West']
+
+STAGES = ('generate_grid', 'generate_questions', 'solve_questions', 'filter_question_answer', 'create_api_ready_prompts', 'create_dataset')
+REGRESSION_TOLERANCE = 0.25 # flag a stage 25% slower or bigger than the baseline...
+MIN_REGRESSION_SECONDS = 0.05 # ...when it is also at least this much slower
+MIN_REGRESSION_BYTES = 1 << 20 # ...or this much bigger
+
+def case_key(grid_size, fill_ratio, pool_size) -> str:
+    return f"N{grid_size}_fill{fill_ratio:g}_pool{pool_size}"
+
+def _measure(stage_fn, seed, measure_memory):
+    """
+    Runs stage_fn with the global random module seeded, silencing its output.
+
+    Returns:
+        tuple: (return value, seconds, tracemalloc peak in bytes or None). The peak
+               comes from a second, identically seeded run, as tracemalloc slows
+               every allocation down.
+    """
+    random.seed(seed)
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = stage_fn()
+    seconds = time.perf_counter() - start_time
+    peak = None
+    if measure_memory:
+        random.seed(seed)
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                stage_fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return value, seconds, peak
+
+def _count_items(filename) -> int:
+    try:
+        with open(filename, 'r') as f:
+            return len(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+
+def _stage_record(seconds, peak, questions=None) -> dict:
+    return {'seconds': seconds, 'peak_bytes': peak, 'questions': questions,
+            'questions_per_s': questions / seconds if questions and seconds else None}
+
+def benchmark_pipeline_case(grid_size: int, fill_ratio: float, pool_size: int, questions_per_direction: int = 50,
+                            seed: int = 0, measure_memory: bool = True) -> dict:
+    """
+    Times every stage of the dataset pipeline for one grid size, fill ratio and pool size.
+
+    The staged path runs generate_questions -> solve_questions_from_file ->
+    filter_question_answer -> create_api_ready_prompts for the three levels (seconds
+    and questions are summed over the levels, the memory peak is the largest level);
+    'create_dataset' is the fused flow of create_dataset.py (grid, build_balanced_dataset
+    and create_api_ready_prompts for each level). Files are written to a temporary
+    directory that is removed afterwards.
+
+    Returns:
+        dict: 'objects' on the grid and {'stages': {stage: {'seconds', 'peak_bytes',
+              'questions', 'questions_per_s'}}}
+    """
+    stages = {}
+    previous_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='pipeline_benchmark_')
+    try:
+        for level in LEVELS:
+            shutil.copy(os.path.join(TEMPLATES_DIR, f'templates_level_{level}.json'), work_dir)
+        shutil.copy(ACTIONS_FILE, work_dir)
+        os.chdir(work_dir)
+
+        (_, grid_file), seconds, peak = _measure(lambda: generate_populated_grid(grid_size, fill_ratio, HUMANS, ANIMALS, VEHICLES), seed, measure_memory)
+        stages['generate_grid'] = _stage_record(seconds, peak)
+        grid = GridModel.load(grid_file, grid_size)
+
+        staged = {stage: {'seconds': 0.0, 'peak_bytes': None, 'questions': 0} for stage in STAGES[1:5]}
+        def add(stage, seconds, peak, questions):
+            staged[stage]['seconds'] += seconds
+            staged[stage]['questions'] += questions
+            if peak is not None:
+                staged[stage]['peak_bytes'] = max(staged[stage]['peak_bytes'] or 0, peak)
+
+        for level in LEVELS:
+            templates_file = f'templates_level_{level}.json'
+            pool_file, answers_file = f'question_pool_level_{level}.json', f'answer_pool_level_{level}.json'
+            set_file, expected_file = f'generated_questions_level_{level}.json', f'expected_answer_file_level_{level}.json'
+            prompts_file = f'prompts_level_{level}.json'
+
+            _, seconds, peak = _measure(lambda: generate_questions(grid_file, templates_file, 'actions.json', ORIENTATIONS, pool_file,
+                                                                   pool_size, grid_size, seed=seed), seed, measure_memory)
+            add('generate_questions', seconds, peak, _count_items(pool_file))
+            _, seconds, peak = _measure(lambda: solve_questions_from_file(pool_file, answers_file, grid, grid_size), seed, measure_memory)
+            add('solve_questions', seconds, peak, _count_items(answers_file))
+            _, seconds, peak = _measure(lambda: filter_question_answer(pool_file, answers_file, questions_per_direction, set_file, expected_file),
+                                        seed, measure_memory)
+            add('filter_question_answer', seconds, peak, _count_items(set_file))
+            _, seconds, peak = _measure(lambda: create_api_ready_prompts(set_file, grid_file, prompts_file, grid_size), seed, measure_memory)
+            add('create_api_ready_prompts', seconds, peak, _count_items(prompts_file))
+        for stage, totals in staged.items():
+            stages[stage] = _stage_record(totals['seconds'], totals['peak_bytes'], totals['questions'])
+
+        def create_dataset_flow():
+            _, flow_grid_file = generate_sparse_grid(grid_size, fill_ratio, HUMANS, ANIMALS, VEHICLES)
+            for level in LEVELS:
+                build_balanced_dataset(flow_grid_file, f'templates_level_{level}.json', 'actions.json', ORIENTATIONS, questions_per_direction,
+                                       f'dataset_questions_level_{level}.json', f'dataset_answers_level_{level}.json', pool_size, grid_size, seed=seed)
+                create_api_ready_prompts(f'dataset_questions_level_{level}.json', flow_grid_file, f'dataset_prompts_level_{level}.json', grid_size)
+        _, seconds, peak = _measure(create_dataset_flow, seed, measure_memory)
+        stages['create_dataset'] = _stage_record(seconds, peak, sum(_count_items(f'dataset_prompts_level_{level}.json') for level in LEVELS))
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {'grid_size': grid_size, 'fill_ratio': fill_ratio, 'pool_size': pool_size, 'objects': len(grid), 'stages': stages}
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_pipeline_benchmarks(grid_sizes=DEFAULT_GRID_SIZES, fill_ratios=DEFAULT_FILL_RATIOS, pool_sizes=DEFAULT_POOL_SIZES,
+                            questions_per_direction: int = 50, seed: int = 0, measure_memory: bool = True) -> dict:
+    """
+    Runs benchmark_pipeline_case over the whole matrix and prints one line per stage.
+
+    Returns:
+        dict: The run record stored in the history: 'timestamp', 'commit', 'python',
+              'machine', 'cpus', 'seed', 'questions_per_direction' and 'cases' ({case_key: case}).
+    """
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'seed': seed,
+        'questions_per_direction': questions_per_direction,
+        'cases': {},
+    }
+    for grid_size in grid_sizes:
+        for fill_ratio in fill_ratios:
+            for pool_size in pool_sizes:
+                key = case_key(grid_size, fill_ratio, pool_size)
+                case = benchmark_pipeline_case(grid_size, fill_ratio, pool_size, questions_per_direction, seed, measure_memory)
+                run['cases'][key] = case
+                print(f"{key} ({case['objects']} objects)")
+                for stage, record in case['stages'].items():
+                    peak = "n/a" if record['peak_bytes'] is None else f"{record['peak_bytes'] / 2**20:.1f} MB"
+                    rate = "" if record['questions_per_s'] is None else f", {record['questions']} questions, {record['questions_per_s']:.0f} q/s"
+                    print(f"  {stage:<25} {record['seconds']:8.3f} s, peak {peak}{rate}")
+    return run
+
+def compare_to_baseline(run: dict, baseline: dict, tolerance: float = REGRESSION_TOLERANCE) -> list:
+    """
+    Stages of `run` that are slower or use more memory than in `baseline` by more
+    than `tolerance` (and by more than MIN_REGRESSION_SECONDS / MIN_REGRESSION_BYTES).
+    Cases or stages missing from either run are skipped.
+
+    Returns:
+        list: [{'case', 'stage', 'metric', 'baseline', 'current', 'ratio'}]
+    """
+    regressions = []
+    for key, case in run['cases'].items():
+        baseline_case = baseline.get('cases', {}).get(key)
+        if baseline_case is None:
+            continue
+        for stage, record in case['stages'].items():
+            baseline_record = baseline_case['stages'].get(stage)
+            if baseline_record is None:
+                continue
+            for metric, floor in (('seconds', MIN_REGRESSION_SECONDS), ('peak_bytes', MIN_REGRESSION_BYTES)):
+                current, previous = record.get(metric), baseline_record.get(metric)
+                if current is None or not previous:
+                    continue
+                if current > previous * (1 + tolerance) and current - previous > floor:
+                    regressions.append({'case': key, 'stage': stage, 'metric': metric, 'baseline': previous,
+                                        'current': current, 'ratio': current / previous})
+    return regressions
+
+def _load_json(filename, default):
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except json.JSONDecodeError:
+        print(f"Warning: Could not decode JSON from '{filename}'; ignoring it.")
+        return default
+
+def append_to_history(run: dict, history_filename: str = BENCHMARK_HISTORY_FILE):
+    history = _load_json(history_filename, [])
+    history.append(run)
+    with open(history_filename, 'w') as f:
+        json.dump(history, f, indent=2)
+    print(f"Run appended to '{history_filename}' ({len(history)} runs).")
+
+def _parse_list(text, cast):
+    return tuple(cast(value) for value in text.split(','))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the dataset pipeline over grid sizes, fill ratios and pool sizes.")
+    parser.add_argument('--sizes', default=",".join(map(str, DEFAULT_GRID_SIZES)))
+    parser.add_argument('--fills', default=",".join(map(str, DEFAULT_FILL_RATIOS)))
+    parser.add_argument('--pools', default=",".join(map(str, DEFAULT_POOL_SIZES)))
+    parser.add_argument('--per-direction', type=int, default=50, help="Questions per direction and template in the balanced sets.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass (halves the run time).")
+    parser.add_argument('--history', default=BENCHMARK_HISTORY_FILE)
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    run = run_pipeline_benchmarks(_parse_list(args.sizes, int), _parse_list(args.fills, float), _parse_list(args.pools, int),
+                                  args.per_direction, args.seed, not args.no_memory)
+    append_to_history(run, args.history)
+
+    regressions = []
+    baseline = _load_json(args.baseline, None)
+    if baseline is None:
+        print(f"No baseline at '{args.baseline}'; run with --save-baseline to store one.")
+    else:
+        regressions = compare_to_baseline(run, baseline, args.tolerance)
+        print(f"Compared with the baseline of {baseline.get('timestamp')} (commit {baseline.get('commit')}): "
+              f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}.")
+        for regression in regressions:
+            scale, unit = (1, 's') if regression['metric'] == 'seconds' else (2**20, 'MB')
+            print(f"  REGRESSION {regression['case']} {regression['stage']} {regression['metric']}: "
+                  f"{regression['baseline'] / scale:.3f} -> {regression['current'] / scale:.3f} {unit} (x{regression['ratio']:.2f})")
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"Baseline saved to '{args.baseline}'.")
+    raise SystemExit(1 if regressions else 0)
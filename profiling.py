@@ -0,0 +1,244 @@
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# Opt-in instrumentation for the pipeline entry points. Code marks stages with
+# `with profiling.stage("name"):` and bumps counters with profiling.count("name");
+# both are no-ops until a Profiler is enabled. Entry points call enable_from_env(),
+# so a run is traced by setting the environment variables below, e.g.
+#   PROFILE_TRACE=trace.json PROFILE_TRACEMALLOC=1 python create_dataset.py
+PROFILE_TRACE_ENV = "PROFILE_TRACE" # path of the JSON trace; profiling is off when unset
+PROFILE_CPROFILE_ENV = "PROFILE_CPROFILE" # "1": cProfile every top-level stage
+PROFILE_TRACEMALLOC_ENV = "PROFILE_TRACEMALLOC" # "1": peak traced memory of every stage
+PROFILE_TOP_FUNCTIONS = 15 # functions kept per cProfiled stage, by cumulative time
+# Counters named "<prefix>.attempts" and "<prefix>.accepted" also get a rate "<prefix>" = attempts / accepted
+ATTEMPTS_SUFFIX, ACCEPTED_SUFFIX = ".attempts", ".accepted"
+
+class Profiler:
+    """
+    Stage timers, counters and optional cProfile / tracemalloc capture for one run.
+
+    Stages nest: a stage entered inside another is recorded under the path
+    "outer/inner", and repeated entries of one path are aggregated (calls, total
+    and max seconds), so traces of two runs can be compared path by path. Stages
+    may be entered from several threads (each thread has its own nesting); cProfile
+    only covers top-level stages of the thread that created the profiler, and
+    tracemalloc peaks are process-wide, so they overlap for concurrent stages.
+    Counters bumped in worker processes are not collected.
+    """
+    def __init__(self, name: str, use_cprofile: bool = False, use_tracemalloc: bool = False):
+        self.name = name
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.counters = {}
+        self.stages = {}
+        self._profiles = {}
+        self._start_time = time.perf_counter()
+        self._owner_thread = threading.get_ident()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        stack = self._stack()
+        path = "/".join([frame['path'] for frame in stack[-1:]] + [name])
+        frame = {'path': path, 'peak': 0, 'current': 0}
+        if self.use_tracemalloc:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            frame['current'] = current
+            tracemalloc.reset_peak()
+        profile = None
+        if self.use_cprofile and not stack and threading.get_ident() == self._owner_thread:
+            with self._lock:
+                profile = self._profiles.setdefault(path, cProfile.Profile())
+            profile.enable()
+        stack.append(frame)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            stack.pop()
+            if profile is not None:
+                profile.disable()
+            peak_bytes = allocated_bytes = None
+            if self.use_tracemalloc:
+                current, peak = tracemalloc.get_traced_memory()
+                peak_bytes, allocated_bytes = max(frame['peak'], peak), current - frame['current']
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], peak_bytes)
+            with self._lock:
+                record = self.stages.setdefault(path, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                                       'peak_bytes': None, 'allocated_bytes': None})
+                record['calls'] += 1
+                record['seconds'] += seconds
+                record['max_seconds'] = max(record['max_seconds'], seconds)
+                if peak_bytes is not None:
+                    record['peak_bytes'] = max(record['peak_bytes'] or 0, peak_bytes)
+                    record['allocated_bytes'] = (record['allocated_bytes'] or 0) + allocated_bytes
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def rates(self) -> dict:
+        """attempts / accepted for every "<prefix>.attempts" counter with a matching "<prefix>.accepted"."""
+        rates = {}
+        for name, attempts in self.counters.items():
+            if name.endswith(ATTEMPTS_SUFFIX):
+                prefix = name[:-len(ATTEMPTS_SUFFIX)]
+                accepted = self.counters.get(prefix + ACCEPTED_SUFFIX)
+                if accepted:
+                    rates[prefix] = attempts / accepted
+        return rates
+
+    def _top_functions(self, profile) -> list:
+        import pstats # only needed when a cProfiled trace is written
+        stats = pstats.Stats(profile)
+        rows = []
+        for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({'function': f"{os.path.basename(filename)}:{line}({function})", 'calls': calls,
+                         'tottime': tottime, 'cumtime': cumtime})
+        rows.sort(key=lambda row: row['cumtime'], reverse=True)
+        return rows[:PROFILE_TOP_FUNCTIONS]
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = {path: dict(record) for path, record in self.stages.items()}
+            counters = dict(self.counters)
+            profiles = dict(self._profiles)
+        for path, profile in profiles.items():
+            stages[path]['profile'] = self._top_functions(profile)
+        return {
+            'name': self.name,
+            'started_at': self.started_at,
+            'wall_s': time.perf_counter() - self._start_time,
+            'python': platform.python_version(),
+            'argv': sys.argv,
+            'options': {'cprofile': self.use_cprofile, 'tracemalloc': self.use_tracemalloc},
+            'stages': stages,
+            'counters': counters,
+            'rates': self.rates(),
+        }
+
+    def write(self, trace_filename: str) -> dict:
+        """Saves the trace as JSON and, with cProfile, one <trace>.<stage>.prof file per profiled stage."""
+        trace = self.to_dict()
+        try:
+            with open(trace_filename, 'w') as f:
+                json.dump(trace, f, indent=2)
+            for path, profile in self._profiles.items():
+                profile.dump_stats(f"{os.path.splitext(trace_filename)[0]}.{path.replace('/', '.')}.prof")
+            print(f"Profiling trace saved to '{trace_filename}'.")
+        except IOError as e:
+            print(f"Error saving profiling trace: {e}")
+        return trace
+
+# --- Module-level hooks ---
+_active = None
+_trace_filename = None
+_NO_STAGE = contextlib.nullcontext()
+
+def enable(name: str, use_cprofile: bool = False, use_tracemalloc: bool = False, trace_filename: str = None) -> Profiler:
+    """Makes a new Profiler the active one; finish() writes it to `trace_filename`."""
+    global _active, _trace_filename
+    _active = Profiler(name, use_cprofile, use_tracemalloc)
+    _trace_filename = trace_filename
+    return _active
+
+def enable_from_env(name: str):
+    """enable() with the PROFILE_* environment variables; None (nothing enabled) if PROFILE_TRACE is unset."""
+    trace_filename = os.environ.get(PROFILE_TRACE_ENV)
+    if not trace_filename:
+        return None
+    return enable(name, os.environ.get(PROFILE_CPROFILE_ENV) == "1", os.environ.get(PROFILE_TRACEMALLOC_ENV) == "1", trace_filename)
+
+def finish():
+    """Writes the active profiler's trace (if it has a trace file) and disables profiling."""
+    global _active, _trace_filename
+    profiler, trace_filename = _active, _trace_filename
+    _active, _trace_filename = None, None
+    if profiler is None:
+        return None
+    if profiler.use_tracemalloc and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return profiler.write(trace_filename) if trace_filename else profiler.to_dict()
+
+def active():
+    return _active
+
+def stage(name: str):
+    """Context manager timing a stage of the active profiler (does nothing when profiling is off)."""
+    return _active.stage(name) if _active is not None else _NO_STAGE
+
+def count(name: str, value: int = 1):
+    if _active is not None:
+        _active.count(name, value)
+
+# --- Comparing traces ---
+def compare_traces(old_trace: dict, new_trace: dict) -> dict:
+    """
+    Stage seconds and counters of two traces side by side.
+
+    Returns:
+        dict: {'stages': {path: {'old_s', 'new_s', 'ratio'}}, 'counters': {name: {'old', 'new'}},
+               'rates': {prefix: {'old', 'new'}}}; a side missing from one trace is None.
+    """
+    stages = {}
+    for path in sorted(set(old_trace.get('stages', {})) | set(new_trace.get('stages', {}))):
+        old_s = old_trace.get('stages', {}).get(path, {}).get('seconds')
+        new_s = new_trace.get('stages', {}).get(path, {}).get('seconds')
+        stages[path] = {'old_s': old_s, 'new_s': new_s, 'ratio': new_s / old_s if old_s and new_s is not None else None}
+    comparison = {'stages': stages}
+    for section in ('counters', 'rates'):
+        names = sorted(set(old_trace.get(section, {})) | set(new_trace.get(section, {})))
+        comparison[section] = {name: {'old': old_trace.get(section, {}).get(name), 'new': new_trace.get(section, {}).get(name)}
+                               for name in names}
+    return comparison
+
+def _fmt(value):
+    return "n/a" if value is None else f"{value:.3f}" if isinstance(value, float) else str(value)
+
+if __name__ == '__main__':
+    # python profiling.py trace.json            -> summary of one trace
+    # python profiling.py old.json new.json     -> comparison of two runs
+    traces = []
+    for trace_filename in sys.argv[1:3]:
+        with open(trace_filename, 'r') as f:
+            traces.append(json.load(f))
+    if len(traces) == 1:
+        trace = traces[0]
+        print(f"{trace['name']} ({trace['started_at']}, {trace['wall_s']:.2f} s)")
+        for path, record in sorted(trace['stages'].items()):
+            peak = "" if record['peak_bytes'] is None else f", peak {record['peak_bytes'] / 2**20:.1f} MB"
+            print(f"  {path:<50} {record['calls']:>6} calls {record['seconds']:9.3f} s{peak}")
+        for section in ('counters', 'rates'):
+            for name, value in trace[section].items():
+                print(f"  {section[:-1]} {name}: {_fmt(value)}")
+    elif len(traces) == 2:
+        comparison = compare_traces(*traces)
+        for path, row in comparison['stages'].items():
+            print(f"  {path:<50} {_fmt(row['old_s']):>9} -> {_fmt(row['new_s']):>9} s  (x{_fmt(row['ratio'])})")
+        for section in ('counters', 'rates'):
+            for name, row in comparison[section].items():
+                if row['old'] != row['new']:
+                    print(f"  {section[:-1]} {name}: {_fmt(row['old'])} -> {_fmt(row['new'])}")
+    else:
+        print("Usage: python profiling.py TRACE.json [NEW_TRACE.json]")
@@ -1,18 +1,25 @@
 import json
+import re
 
-def create_system_prompt(grid_data_raw: dict) -> str:
+OUTPUT_FORMAT_HEADER = "--- OUTPUT FORMAT ---\n"
+# "###Answer 3: Behind-Left" -- last occurrence per question number wins
+PACKED_ANSWER_PATTERN = re.compile(r"###\s*answer\s*(\d+)\s*:[ \t]*([^\n]*)", re.IGNORECASE)
+
+def create_system_prompt(grid_data_raw, grid_size: int = 10) -> str:
     """
     Creates a single, comprehensive system prompt containing all rules
     and the complete grid state.
+
+    grid_data_raw is a GridModel or the {"(x,y)": object_id} dict of a grid details file.
     """
+    from grid_model import GridModel # numpy; imported here so packing prompts for llm_evaluation does not need it
     # Format the grid data into a readable list
     grid_items = []
     # Sort by coordinates for a consistent order in every prompt
     try:
-        sorted_coords = sorted(grid_data_raw.keys(), key=lambda c: list(map(int, c.strip("()").split(','))))
-        for coord_str in sorted_coords:
-            obj_id = grid_data_raw[coord_str]
-            grid_items.append(f"- Object '{obj_id}' is at position {coord_str}.")
+        grid = grid_data_raw if isinstance(grid_data_raw, GridModel) else GridModel.from_grid_details(grid_data_raw, grid_size)
+        for (x, y), obj_id in sorted(zip(grid.positions(), grid.names)):
+            grid_items.append(f"- Object '{obj_id}' is at position ({x},{y}).")
         grid_context_string = "\n".join(grid_items)
     except Exception:
         grid_context_string = "Error: Could not format grid data."
@@ -21,7 +28,7 @@ def create_system_prompt(grid_data_raw: dict) -> str:
     # Combine all instructions into one system prompt
     system_prompt = (
         "You are a helpful assistant and a spatial reasoning expert. Your task is to solve a question by simulating movement on a grid based on the rules provided. Movement should only be done if it is requested in the prompt.\n"
-        "First, here is the complete state of all objects on the grid of size 10x10 (0 based indexing) with coordinates on x-axis increases in east direction and coordinates on y-axis increases in north direction:\n"
+        f"First, here is the complete state of all objects on the grid of size {grid_size}x{grid_size} (0 based indexing) with coordinates on x-axis increases in east direction and coordinates on y-axis increases in north direction:\n"
         f"{grid_context_string}\n\n"
         "--- MOVEMENT RULES ---\n"
         "1. Movement should not cross the grid boundaries. It must always remain inside the grid.\n"
@@ -34,7 +41,7 @@ def create_system_prompt(grid_data_raw: dict) -> str:
     )
     return system_prompt
 
-def create_api_ready_prompts(generated_questions_filename: str, grid_details_filename: str, output_filename: str):
+def create_api_ready_prompts(generated_questions_filename: str, grid_details_filename: str, output_filename: str, grid_size: int = 10):
     """
     Loads generated questions and grid data, then creates a final JSON file
     formatted for chat-based LLM API calls.
@@ -43,12 +50,13 @@ def create_api_ready_prompts(generated_questions_filename: str, grid_details_fil
         generated_questions_filename (str): Path to the input JSON file containing generated questions.
         grid_details_filename (str): Path to the JSON file with grid object positions.
         output_filename (str): Path for the new JSON file to be created.
+        grid_size (int): Side length N stated in the system prompt.
     """
+    from grid_model import GridModel
     try:
         with open(generated_questions_filename, 'r') as f:
             source_questions = json.load(f)
-        with open(grid_details_filename, 'r') as f:
-            grid_data = json.load(f)
+        grid_data = GridModel.load(grid_details_filename, grid_size)
     except FileNotFoundError as e:
         print(f"Error: Could not find a required input file. {e}")
         return
@@ -57,7 +65,7 @@ def create_api_ready_prompts(generated_questions_filename: str, grid_details_fil
         return
 
     # Create the comprehensive system prompt once
-    system_prompt_content = create_system_prompt(grid_data)
+    system_prompt_content = create_system_prompt(grid_data, grid_size)
 
     api_ready_questions = []
     for prompt_obj in source_questions:
@@ -91,3 +99,71 @@ def create_api_ready_prompts(generated_questions_filename: str, grid_details_fil
         print(f"Successfully created {len(api_ready_questions)} API-ready questions in '{output_filename}'.")
     except IOError as e:
         print(f"Error: Could not write to file '{output_filename}'. Details: {e}")
+
+# --- Packed prompts (several questions per request) ---
+def create_packed_system_prompt(system_prompt: str, num_questions: int) -> str:
+    """
+    Rewrites the output format of a system prompt for `num_questions` numbered
+    questions answered in one response, each with its own "###Answer <n>:" line.
+    """
+    grid_and_rules = system_prompt.split(OUTPUT_FORMAT_HEADER)[0]
+    return (
+        grid_and_rules + OUTPUT_FORMAT_HEADER +
+        f"You will be given {num_questions} numbered questions about this grid. Solve each one on its own, starting from the grid state above; "
+        "movements in one question do not carry over to another. When rule 3 applies to a question, its answer is the exact phrase: incorrect prompt\n"
+        "Otherwise each answer must be only one of the 8 primary directions: "
+        "Left, Right, Behind, In-Front, Behind-Left, In-Front-Left, Behind-Right, or In-Front-Right. "
+        "End your response with one line per question, in question order, in the form “###Answer <n>: <answer>” (for example “###Answer 1: Left”)."
+    )
+
+def pack_api_prompts(api_ready_questions: list, pack_size: int) -> list:
+    """
+    Groups API-ready prompts into requests of up to `pack_size` questions that share
+    one system prompt (only consecutive prompts with identical system prompts are packed).
+
+    Returns:
+        list: Packed prompt objects with "id", "prompt_ids", "pack_size" and "messages";
+              the user message numbers the questions "Question 1:", "Question 2:", ...
+    """
+    packs = []
+    current_system, current = None, []
+
+    def flush():
+        if not current:
+            return
+        user_content = "\n\n".join(f"Question {n}:\n{text}" for n, (_, text) in enumerate(current, start=1))
+        packs.append({
+            "id": f"pack-{current[0][0]}",
+            "prompt_ids": [prompt_id for prompt_id, _ in current],
+            "pack_size": len(current),
+            "messages": [
+                {"role": "system", "content": create_packed_system_prompt(current_system, len(current))},
+                {"role": "user", "content": user_content}
+            ]
+        })
+
+    for prompt_object in api_ready_questions:
+        messages = prompt_object.get("messages") or []
+        system_content = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        user_content = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+        if system_content != current_system or len(current) >= pack_size:
+            flush()
+            current_system, current = system_content, []
+        current.append((prompt_object.get("id"), user_content))
+    flush()
+    return packs
+
+def split_packed_response(response_text: str, num_questions: int) -> list:
+    """
+    Demultiplexes a packed response into one raw response per question.
+
+    Each question gets "###Answer: <answer>" so parse_llm_response reads it like a
+    single-question response; a question without an answer line gets "" (unparseable),
+    and an API error ("Error: ...") is passed on to every question.
+    """
+    if not isinstance(response_text, str) or "Error:" in response_text:
+        return [response_text] * num_questions
+    answers = {}
+    for match in PACKED_ANSWER_PATTERN.finditer(response_text):
+        answers[int(match.group(1))] = match.group(2).strip()
+    return [f"###Answer: {answers[n]}" if n in answers else "" for n in range(1, num_questions + 1)]
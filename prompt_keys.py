@@ -0,0 +1,183 @@
+import math
+
+# Stores built by make_key_store: 'auto' picks a bitset for narrow keys and a set otherwise
+KEY_STORE_MODES = ('auto', 'set', 'bitset', 'bloom')
+BITSET_MAX_BITS = 27 # 16 MB of bits at most
+SET_BYTES_PER_KEY = 64 # rough cost of one small int in a Python set
+
+def _field_bits(num_values):
+    """Bits needed for a field holding 0 .. num_values - 1 (at least 1)."""
+    return max(1, (num_values - 1).bit_length())
+
+class SelectionKeyEncoder:
+    """
+    Packs the parameter choices behind a prompt into one integer with fixed-width fields.
+
+    Objects are coded by their index on the grid, orientations by their position
+    in the orientations list and actions by their "id" (first occurrence wins), so
+    two selections get the same key exactly when their string keys used to be
+    equal. Each key shape has a fixed width, listed in `bits`.
+    """
+    __slots__ = ('object_bits', 'orientation_bits', 'orientation_code', 'action_shift', 'histogram_bits', 'bits')
+
+    def __init__(self, num_objects, orientations, actions=()):
+        self.object_bits = _field_bits(num_objects)
+        self.orientation_code = {}
+        for orientation in orientations:
+            self.orientation_code.setdefault(orientation, len(self.orientation_code))
+        self.orientation_bits = _field_bits(len(self.orientation_code))
+
+        # Action histogram: one count field per distinct action id, wide enough for a
+        # sequence that repeats one action len(actions) times
+        action_code = {}
+        codes = [action_code.setdefault(str(action_obj['id']), len(action_code)) for action_obj in actions]
+        count_bits = _field_bits(len(actions) + 1)
+        self.action_shift = [code * count_bits for code in codes]
+        self.histogram_bits = len(action_code) * count_bits
+
+        agent_bits = self.object_bits + self.orientation_bits
+        self.bits = {
+            'agent': agent_bits,
+            'agent_target': 2 * agent_bits,
+            'object_pair': agent_bits + 2 * self.object_bits + 2 * self.orientation_bits,
+            'reorientation': agent_bits + 2 * self.object_bits,
+            'action_sequence': agent_bits + self.object_bits + self.histogram_bits,
+        }
+
+    def agent_key(self, agent, agent_orientation):
+        """(agent, orientation) -- the prefix of every key."""
+        return (agent << self.orientation_bits) | self.orientation_code[agent_orientation]
+
+    def agent_target_key(self, agent, agent_orientation, target, target_orientation):
+        """Tier 1: agent and target, each with its orientation."""
+        key = self.agent_key(agent, agent_orientation)
+        key = (key << self.object_bits) | target
+        return (key << self.orientation_bits) | self.orientation_code[target_orientation]
+
+    def object_pair_key(self, agent, agent_orientation, obj_a, orientation_a, obj_b, orientation_b):
+        """Tier 2 T1: the two objects and their two orientations, each as an unordered pair."""
+        code_a, code_b = self.orientation_code[orientation_a], self.orientation_code[orientation_b]
+        key = self.agent_key(agent, agent_orientation)
+        key = (key << self.object_bits) | min(obj_a, obj_b)
+        key = (key << self.object_bits) | max(obj_a, obj_b)
+        key = (key << self.orientation_bits) | min(code_a, code_b)
+        return (key << self.orientation_bits) | max(code_a, code_b)
+
+    def reorientation_key(self, agent, agent_orientation, obj_b, obj_c):
+        """Tier 2 hypothetical reorientation: the two other objects as an unordered pair."""
+        key = self.agent_key(agent, agent_orientation)
+        key = (key << self.object_bits) | min(obj_b, obj_c)
+        return (key << self.object_bits) | max(obj_b, obj_c)
+
+    def action_sequence_key(self, agent, agent_orientation, target, action_indices):
+        """Tier 3: the target and how often each action occurs (order is ignored)."""
+        histogram = 0
+        action_shift = self.action_shift
+        for i in action_indices:
+            histogram += 1 << action_shift[i]
+        key = self.agent_key(agent, agent_orientation)
+        key = (key << self.object_bits) | target
+        return (key << self.histogram_bits) | histogram
+
+class KeyBitset:
+    """Exact membership for keys below 2**key_bits, one bit per possible key."""
+    __slots__ = ('_bits',)
+
+    def __init__(self, key_bits):
+        self._bits = bytearray(((1 << key_bits) + 7) // 8)
+
+    def __contains__(self, key):
+        return self._bits[key >> 3] >> (key & 7) & 1 == 1
+
+    def add(self, key):
+        self._bits[key >> 3] |= 1 << (key & 7)
+
+_MASK64 = (1 << 64) - 1
+
+def _mix64(value):
+    """splitmix64 finalizer: a well-spread 64-bit hash of a 64-bit integer."""
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+class BloomFilter:
+    """
+    Approximate membership for integer keys of any width.
+
+    Never reports an added key as new; an unseen key is reported as seen with
+    probability about `error_rate` once `capacity` keys are in. For
+    deduplication that means a few genuinely new selections get skipped, never
+    that a duplicate gets through.
+    """
+    __slots__ = ('num_bits', 'num_hashes', '_bits', '_last_key', '_last_positions')
+
+    def __init__(self, capacity, error_rate=1e-6):
+        capacity = max(1, capacity)
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._last_key, self._last_positions = None, None
+
+    def _positions(self, key):
+        # Double hashing (Kirsch-Mitzenmacher) on a splitmix64-style hash chained over the key's 64-bit words.
+        # The last key's positions are kept, as a lookup is usually followed by adding the same key.
+        if key == self._last_key:
+            return self._last_positions
+        h1, rest = 0, key
+        while True:
+            h1 = _mix64(h1 ^ (rest & _MASK64))
+            rest >>= 64
+            if not rest:
+                break
+        num_bits = self.num_bits
+        position = h1 % num_bits
+        step = (_mix64(h1 ^ 0x9E3779B97F4A7C15) | 1) % num_bits
+        positions = []
+        for _ in range(self.num_hashes):
+            positions.append(position)
+            position += step
+            if position >= num_bits:
+                position -= num_bits
+        self._last_key, self._last_positions = key, positions
+        return positions
+
+    def __contains__(self, key):
+        bits = self._bits
+        for p in self._positions(key):
+            if not bits[p >> 3] >> (p & 7) & 1:
+                return False
+        return True
+
+    def add(self, key):
+        bits = self._bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+
+def make_key_store(key_bits, capacity, mode='auto', error_rate=1e-6):
+    """
+    Returns an empty store with `in` and `add` for keys of `key_bits` bits.
+
+    Args:
+        key_bits (int): Width of the keys (SelectionKeyEncoder.bits).
+        capacity (int): Most keys that will be added (the prompt quota).
+        mode (str): 'set', 'bitset' (exact, 2**key_bits bits), 'bloom' (approximate,
+                    about 29 bits per key at error_rate=1e-6) or 'auto', which takes
+                    the bitset when it is no larger than a set of `capacity` keys.
+        error_rate (float): False-positive rate of the Bloom filter at capacity.
+
+    Returns:
+        set | KeyBitset | BloomFilter
+    """
+    if mode not in KEY_STORE_MODES:
+        raise ValueError(f"Unknown key store mode '{mode}'. Expected one of {KEY_STORE_MODES}.")
+    if mode == 'auto':
+        bitset_fits = key_bits <= BITSET_MAX_BITS and (1 << key_bits) // 8 <= SET_BYTES_PER_KEY * capacity
+        mode = 'bitset' if bitset_fits else 'set'
+    if mode == 'bitset':
+        if key_bits > BITSET_MAX_BITS:
+            print(f"Warning: {key_bits}-bit keys are too wide for a bitset (max {BITSET_MAX_BITS}); using a set.")
+            return set()
+        return KeyBitset(key_bits)
+    if mode == 'bloom':
+        return BloomFilter(capacity, error_rate)
+    return set()
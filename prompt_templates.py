@@ -0,0 +1,79 @@
+import functools
+import re
+from typing import NamedTuple, Tuple
+
+# Anything that looks like a placeholder token in a template string
+_PLACEHOLDER_TOKEN = re.compile(r"\[[A-Z0-9_]+\]")
+
+class CompiledTemplate(NamedTuple):
+    """
+    A template string split once into literal text and placeholder slots.
+
+    segments alternates literal text (even positions) and placeholder names
+    (odd positions), e.g. ("Consider ", "[AGENT_ID]", " at (", "[AGENT_X]", ...).
+    required holds every placeholder listed for the template; a prompt is only
+    rendered when all of them have a value.
+    """
+    segments: Tuple[str, ...]
+    required: frozenset
+    problems: Tuple[str, ...]
+
+@functools.lru_cache(maxsize=None)
+def compile_template(template_string: str, placeholders: Tuple[str, ...]) -> CompiledTemplate:
+    """
+    Compiles a template once (cached per template string and placeholder list).
+
+    Only the listed placeholders are substituted; bracketed tokens that are not
+    listed stay in the text verbatim, as with per-placeholder str.replace.
+
+    Args:
+        template_string (str): The "template_string" of a templates_level_*.json entry.
+        placeholders (tuple): Its "placeholders" list.
+
+    Returns:
+        CompiledTemplate: Segments, required placeholders and any load-time problems
+                          (listed placeholders missing from the text, unlisted tokens).
+    """
+    problems = []
+    for placeholder in placeholders:
+        if placeholder not in template_string:
+            problems.append(f"placeholder {placeholder} does not occur in the template text")
+    for token in sorted(set(_PLACEHOLDER_TOKEN.findall(template_string)) - set(placeholders)):
+        problems.append(f"token {token} is not listed in placeholders and will be left as is")
+
+    if placeholders:
+        # Longest first so a placeholder never matches inside a longer one
+        pattern = re.compile("(" + "|".join(re.escape(p) for p in sorted(set(placeholders), key=len, reverse=True)) + ")")
+        segments = tuple(pattern.split(template_string))
+    else:
+        segments = (template_string,)
+    return CompiledTemplate(segments, frozenset(placeholders), tuple(problems))
+
+def render_template(compiled: CompiledTemplate, params: dict):
+    """
+    Fills a compiled template in one pass.
+
+    Returns:
+        str | None: The prompt text, or None if a required placeholder has no value in `params`.
+    """
+    if not compiled.required.issubset(params):
+        return None
+    segments = compiled.segments
+    parts = list(segments)
+    parts[1::2] = [params[name] for name in segments[1::2]]
+    return "".join(parts)
+
+def compile_templates(templates_data: dict, templates_filename: str = "") -> dict:
+    """
+    Compiles every template of a loaded templates file and prints its load-time problems.
+
+    Returns:
+        dict: {template id: CompiledTemplate}
+    """
+    compiled_templates = {}
+    for template_info in templates_data.get("prompt_templates", []):
+        compiled = compile_template(template_info["template_string"], tuple(template_info.get("placeholders", [])))
+        for problem in compiled.problems:
+            print(f"Warning: Template '{template_info['id']}' in {templates_filename or 'templates file'}: {problem}.")
+        compiled_templates[template_info["id"]] = compiled
+    return compiled_templates
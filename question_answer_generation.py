@@ -1,7 +1,12 @@
-import json, re
+import json, random, re
 from typing import List, Dict, Tuple, Any
 from collections import defaultdict
 
+import profiling
+
+from grid_model import ABSOLUTE_DIRECTIONS, ORIENTATION_INDEX, RELATIVE_DIRECTIONS, SAME_CELL, GridModel, absolute_direction_index, relative_direction
+from question_generation import MAX_ATTEMPTS_PER_UNIQUE_PROMPT, iter_template_prompts, load_generation_inputs, template_stream_seed
+
 def filter_question_answer(question_pool_file, answer_pool_file, total_questions_required, question_set_file, answer_set_file):
     """
     Filters questions based on template_id and answer type, creates a balanced 
@@ -119,8 +124,142 @@ def filter_question_answer(question_pool_file, answer_pool_file, total_questions
     }
 
 
+def build_balanced_dataset(grid_details_filename, templates_filename, actions_filename, orientations_list,
+                           total_questions_required, question_set_file, answer_set_file,
+                           max_pool_size=10000, grid_size=None, seed=None, balance_t3_directions=False,
+                           key_store='auto'):
+    """
+    Fused generate -> solve -> balance pipeline for one level.
+
+    Each generated question is solved as soon as it is produced and routed into a
+    per-template, per-direction bucket; a template stops generating as soon as all
+    8 of its buckets hold `total_questions_required` questions (or after
+    `max_pool_size` questions). Nothing is written until the balanced set is ready.
+
+    With the same seed this writes exactly the files that generate_questions
+    (prompts_count=max_pool_size) -> solve_questions_from_file -> filter_question_answer
+    would write, because it consumes the same per-template prompt streams in the
+    same order and applies the same selection (first questions of each bucket,
+    balanced to the smallest bucket over all templates). Like filter_question_answer,
+    it drops 'incorrect prompt' answers and fails when a template has any other answer
+    outside the 8 directions. One difference remains: a template stops generating once
+    its buckets are full, so an odd answer the full pool would only reach later lets
+    this build succeed where the staged pipeline fails.
 
-def solve_questions_from_file(input_questions_filename: str, output_answers_filename: str,populated_grid):
+    Args:
+        grid_details_filename (str): Path to the grid details JSON file.
+        templates_filename (str): Path to the templates JSON file of the level.
+        actions_filename (str): Path to the actions JSON file.
+        orientations_list (list): Orientations to draw from.
+        total_questions_required (int): The desired number of questions per direction, per template.
+        question_set_file (str): The filename to save the balanced question set.
+        answer_set_file (str): The filename to save the balanced answer set.
+        max_pool_size (int): Upper bound on generated questions per template.
+        grid_size (int, optional): Side length N of the grid.
+        seed (optional): Base seed of the prompt streams (see generate_questions).
+        balance_t3_directions (bool): Draw Tier 3 answers uniformly over the 8 directions
+                                      instead of relying on the pool to cover them.
+        key_store (str): How used selections are remembered ('auto', 'set', 'bitset' or
+                         'bloom'; see prompt_keys.make_key_store).
+
+    Returns:
+        dict: The filter_question_answer analysis plus 'questions_generated' per
+              template, or an empty dict if validation fails.
+    """
+    generation_inputs = load_generation_inputs(grid_details_filename, templates_filename, actions_filename, grid_size)
+    if generation_inputs is None:
+        return {}
+    grid, templates_data, compiled_templates, all_actions, complexity_level = generation_inputs
+    if seed is None:
+        seed = random.getrandbits(64) # Follows the caller's random.seed(...)
+
+    # template_id -> direction -> prompt texts, both in order of first appearance
+    buckets = {}
+    questions_generated = {}
+    odd_answers = defaultdict(set) # template_id -> solver answers outside the 8 directions
+    for template_info in templates_data.get("prompt_templates", []):
+        template_id_source = template_info["id"]
+        template_buckets = buckets.setdefault(template_id_source, {})
+        prompt_stream = iter_template_prompts(template_id_source, compiled_templates[template_id_source], complexity_level,
+                                              grid, range(len(grid)), max_pool_size, orientations_list, all_actions,
+                                              template_stream_seed(seed, complexity_level, template_id_source),
+                                              balance_t3_directions=balance_t3_directions, key_store=key_store)
+        generated_count = 0
+        full_buckets = 0
+        with profiling.stage(f"generate_and_solve_t{template_id_source}"):
+            for prompt_text in prompt_stream:
+                generated_count += 1
+                answer = solve_question(complexity_level, template_id_source, prompt_text, grid)
+                if answer not in RELATIVE_DIRECTIONS:
+                    if answer != 'incorrect prompt':
+                        odd_answers[template_id_source].add(answer)
+                    continue
+                bucket = template_buckets.setdefault(answer, [])
+                bucket.append(prompt_text)
+                if len(bucket) == total_questions_required:
+                    full_buckets += 1
+                    if full_buckets == len(RELATIVE_DIRECTIONS):
+                        break
+        questions_generated[template_id_source] = generated_count
+        profiling.count(f"build_balanced_dataset.{complexity_level}.t{template_id_source}.solved", generated_count)
+        if generated_count < 3:
+            print(f"Warning: Could only generate {generated_count} unique prompts for template ID '{template_id_source}' after {MAX_ATTEMPTS_PER_UNIQUE_PROMPT * max_pool_size} attempts for template file {templates_filename}")
+
+    # --- VALIDATION AND ANALYSIS PER TEMPLATE ---
+    template_analysis = {}
+    for template_id, answer_groups in buckets.items():
+        answer_types = len(answer_groups) + len(odd_answers[template_id]) # odd answers form groups of their own in filter_question_answer
+        if answer_types != 8 or odd_answers[template_id]:
+            print(f"Error: Template ID '{template_id}' must have questions for exactly 8 unique answer types, but found {answer_types}.")
+            if odd_answers[template_id]:
+                print(f"  Solver answers outside the 8 directions: {sorted(odd_answers[template_id])}")
+            return {}
+        answer_counts = {key: len(value) for key, value in answer_groups.items()}
+        template_analysis[template_id] = {
+            'distribution': answer_counts,
+            'min_count': min(answer_counts.values())
+        }
+    if not template_analysis:
+        print("Error: No questions could be grouped by template_id and answer.")
+        return {}
+
+    global_min_count = min(info['min_count'] for info in template_analysis.values())
+    final_questions_per_type = min(global_min_count, total_questions_required)
+
+    final_question_set = []
+    final_answer_set = []
+    for template_id, answer_groups in buckets.items():
+        for answer_type, prompt_texts in answer_groups.items():
+            for prompt_text in prompt_texts[:final_questions_per_type]:
+                new_prompt_id = str(len(final_question_set) + 1)
+                final_question_set.append({
+                    "complexity_level": complexity_level,
+                    "prompt_id": new_prompt_id,
+                    "template_id_source": template_id,
+                    "generated_prompt_text": prompt_text
+                })
+                final_answer_set.append({'prompt_id': new_prompt_id, 'expected_answer': answer_type})
+
+    try:
+        with open(question_set_file, 'w') as f:
+            json.dump(final_question_set, f, indent=4)
+        print(f"\nSuccessfully created '{question_set_file}' with {len(final_question_set)} total questions.")
+
+        with open(answer_set_file, 'w') as f:
+            json.dump(final_answer_set, f, indent=4)
+        print(f"Successfully created '{answer_set_file}' with {len(final_answer_set)} total answers.")
+    except IOError as e:
+        print(f"Error: Could not write to output files. {e}")
+        return {}
+
+    return {
+        'template_analysis': template_analysis,
+        'overall_minimum_count': global_min_count,
+        'final_questions_per_type_per_template': final_questions_per_type,
+        'questions_generated': questions_generated
+    }
+
+def solve_questions_from_file(input_questions_filename: str, output_answers_filename: str,populated_grid, grid_size=None):
     """
     Loads questions from a JSON file, solves them using the appropriate solver,
     and saves the answers to another JSON file.
@@ -129,9 +268,10 @@ def solve_questions_from_file(input_questions_filename: str, output_answers_file
         input_questions_filename (str): Path to the JSON file containing questions.
                                       Each prompt object should have "prompt_id", 
                                       "template_id_source", and "generated_prompt_text".
-        grid_details_json_filename (str): Path to the JSON file with grid object positions
-                                          in format {"(x,y)": "ObjectID"}.
         output_answers_filename (str): Path to save the JSON file with answers.
+        populated_grid: A GridModel, the dense NxN grid from generate_populated_grid,
+                        or a sparse {(x, y): object_id} index.
+        grid_size (int, optional): N; required with a sparse index.
     """
     try:
         with open(input_questions_filename, 'r') as f:
@@ -180,6 +320,9 @@ def solve_questions_from_file(input_questions_filename: str, output_answers_file
     #     # else: print(f"Warning: Coordinate ({x},{y}) for {obj_id} is out of inferred grid bounds (N={N}).")
 
 
+    # Convert the grid once rather than per Tier 3 prompt
+    populated_grid = GridModel.coerce(populated_grid, grid_size)
+
     answers_list = []
     for prompt_entry in questions_to_solve:
         complexity_level = (prompt_entry.get("complexity_level")).lower()
@@ -191,14 +334,7 @@ def solve_questions_from_file(input_questions_filename: str, output_answers_file
             print(f"Warning: Skipping invalid prompt entry: {prompt_entry}")
             continue
 
-        answer = "Error: Unsupported template ID or prompt structure."
-        # This function currently only supports solving questions from template ID "1"
-        if template_id_source in ("1","2") and complexity_level == "low":
-            answer = solve_template1_prompt(prompt_text)
-        elif template_id_source in ("1","2") and complexity_level == "medium":
-            answer = solve_template2_prompt(prompt_text,template_id_source)
-        elif template_id_source in ("1") and complexity_level == "high":
-            answer = solve_template3_prompt(prompt_text,populated_grid)
+        answer = solve_question(complexity_level, template_id_source, prompt_text, populated_grid)
         
         answers_list.append({
             "prompt_id": prompt_id,
@@ -212,6 +348,17 @@ def solve_questions_from_file(input_questions_filename: str, output_answers_file
     except IOError:
         print(f"Error: Could not write answers to file '{output_answers_filename}'.")
 
+def solve_question(complexity_level: str, template_id_source: str, prompt_text: str, populated_grid: GridModel) -> str:
+    """Dispatches one generated question to the solver of its level and template."""
+    answer = "Error: Unsupported template ID or prompt structure."
+    if template_id_source in ("1","2") and complexity_level == "low":
+        answer = solve_template1_prompt(prompt_text, populated_grid)
+    elif template_id_source in ("1","2") and complexity_level == "medium":
+        answer = solve_template2_prompt(prompt_text,template_id_source, populated_grid)
+    elif template_id_source in ("1") and complexity_level == "high":
+        answer = solve_template3_prompt(prompt_text,populated_grid)
+    return answer
+
 def determine_relative_direction(agent_x, agent_y, agent_orientation, target_x, target_y):
     # """
     # Determines the primary relative direction of a target from an agent's perspective.
@@ -265,65 +412,29 @@ def determine_relative_direction(agent_x, agent_y, agent_orientation, target_x,
     Determines the relative direction (8-way) of a target from an agent's perspective.
     Returns one of 8 relative directions (e.g., "In-Front", "In-Front-Right", "Right", etc.)
     """
-    dx = target_x - agent_x
-    dy = target_y - agent_y
-
-    if dx == 0 and dy == 0:
-        return "Error: Reference and Target are in the same cell."
-
-    # Step 1: Determine the absolute grid direction from agent to target
-    # This simplified logic uses quadrants. Any non-axial vector is considered diagonal.
-    dx_sign = 1 if dx > 0 else -1 if dx < 0 else 0
-    dy_sign = 1 if dy > 0 else -1 if dy < 0 else 0
-    
-    absolute_direction = ""
-    if   (dx_sign, dy_sign) == (0, 1):   absolute_direction = "North"
-    elif (dx_sign, dy_sign) == (1, 1):   absolute_direction = "North-East"
-    elif (dx_sign, dy_sign) == (1, 0):   absolute_direction = "East"
-    elif (dx_sign, dy_sign) == (1, -1):  absolute_direction = "South-East"
-    elif (dx_sign, dy_sign) == (0, -1):  absolute_direction = "South"
-    elif (dx_sign, dy_sign) == (-1, -1): absolute_direction = "South-West"
-    elif (dx_sign, dy_sign) == (-1, 0):  absolute_direction = "West"
-    elif (dx_sign, dy_sign) == (-1, 1):  absolute_direction = "North-West"
-    
-    if not absolute_direction:
-        return "Error: Could not determine absolute direction." # Should not happen
-
-    # Step 2: Translate absolute direction to relative direction
-    # Define compass roses for absolute and relative directions
-    absolute_rose = ["North", "North-East", "East", "South-East", "South", "South-West", "West", "North-West"]
-    relative_rose = ["In-Front", "In-Front-Right", "Right", "Behind-Right", "Behind", "Behind-Left", "Left", "In-Front-Left"]
-
-    try:
-        # Find the index of the agent's orientation and the target's absolute direction
-        agent_dir_index = absolute_rose.index(agent_orientation)
-        target_abs_dir_index = absolute_rose.index(absolute_direction)
-
-        # The relative direction is found by the difference in indices on the compass rose
-        # We use modulo arithmetic to wrap around the compass
-        relative_index = (target_abs_dir_index - agent_dir_index) % 8
-        return relative_rose[relative_index]
-        
-    except ValueError:
-        return f"Error: Invalid orientation '{agent_orientation}' or calculated direction '{absolute_direction}'."
+    # Sign-of-displacement lookup table shared with the solvers (see grid_model.RELATIVE_LOOKUP)
+    return relative_direction(agent_x, agent_y, agent_orientation, target_x, target_y)
 def get_absolute_direction(from_x: int, from_y: int, to_x: int, to_y: int) -> str | None:
     """
     Calculates the absolute cardinal/intercardinal direction of a vector.
     Returns "North", "North-East", etc., or None if points are the same.
     """
-    dx = to_x - from_x
-    dy = to_y - from_y
-    if dx == 0 and dy == 0:
-        return None
+    direction_index = absolute_direction_index(to_x - from_x, to_y - from_y)
+    return None if direction_index == SAME_CELL else ABSOLUTE_DIRECTIONS[direction_index]
 
-    dx_sign = 1 if dx > 0 else -1 if dx < 0 else 0
-    dy_sign = 1 if dy > 0 else -1 if dy < 0 else 0
-    
-    direction_map = {
-        (0, 1): "North", (1, 1): "North-East", (1, 0): "East", (1, -1): "South-East",
-        (0, -1): "South", (-1, -1): "South-West", (-1, 0): "West", (-1, 1): "North-West"
-    }
-    return direction_map.get((dx_sign, dy_sign))
+def grid_relative_direction(grid, observer_pos, orientation, target_pos):
+    """
+    Looks a relative direction up in the grid's precomputed direction table when both
+    positions hold objects of `grid`; returns None (caller computes it) otherwise.
+    """
+    if grid is None or orientation not in ORIENTATION_INDEX:
+        return None
+    cell_index = grid.cell_index()
+    observer = cell_index.get(observer_pos)
+    target = cell_index.get(target_pos)
+    if observer is None or target is None or observer == target:
+        return None
+    return grid.relative_direction(observer, orientation, target)
 def get_new_orientation(current_orientation: str, turn_text: str) -> str:
     """Calculates the new orientation after a turn."""
     rose = ["North", "East", "South", "West"]
@@ -355,10 +466,11 @@ def is_move_valid(new_pos: tuple, N: int, occupied_positions: set):
         return False # Occupied by another object
     return True
 # --- Solver function for level 1 ---
-def solve_template1_prompt(prompt_text: str):
+def solve_template1_prompt(prompt_text: str, grid: GridModel = None):
     """
     Solves prompts based on the narrative structure used for both
     Template ID "1" and "2" from your prompts_level_1.json file.
+    With `grid`, the answer is read from its precomputed direction table.
     """
     # This flexible regex first captures the two main entities (A and B),
     # then separately captures who is the observer and who is the observed in the question.
@@ -375,6 +487,7 @@ def solve_template1_prompt(prompt_text: str):
     match = re.fullmatch(pattern_str, prompt_text.strip())
 
     if not match:
+        profiling.count("solver.template1.regex_failures")
         return "Error: Prompt text does not match the expected structure."
 
     try:
@@ -412,17 +525,19 @@ def solve_template1_prompt(prompt_text: str):
         return "Error: Could not parse all required components from the prompt."
 
     # Perform the calculation with the correctly assigned roles
-    calculated_direction = determine_relative_direction(
-        agent_pos[0], agent_pos[1], 
-        agent_orientation, 
-        target_pos[0], target_pos[1]
-    )
+    calculated_direction = grid_relative_direction(grid, agent_pos, agent_orientation, target_pos)
+    if calculated_direction is None:
+        calculated_direction = determine_relative_direction(
+            agent_pos[0], agent_pos[1], 
+            agent_orientation, 
+            target_pos[0], target_pos[1]
+        )
     return calculated_direction
 
 # --- Solver function for level 2 ---
-def solve_template2_prompt(prompt_text: str,template_id):
+def solve_template2_prompt(prompt_text: str,template_id, grid: GridModel = None):
    
-    if(template_id == '2'): return solve_template_hypothetical_reorientation(prompt_text)
+    if(template_id == '2'): return solve_template_hypothetical_reorientation(prompt_text, grid)
 
     all_8_relative_directions = "In-Front-Right|In-Front-Left|Behind-Right|Behind-Left|In-Front|Behind|Left|Right"
 
@@ -437,6 +552,7 @@ def solve_template2_prompt(prompt_text: str,template_id):
     match = re.fullmatch(pattern_str, prompt_text.strip())
 
     if not match:
+        profiling.count("solver.template2.regex_failures")
         return "Error: Prompt text does not match the expected Tier 2 template structure."
 
     try:
@@ -473,12 +589,14 @@ def solve_template2_prompt(prompt_text: str,template_id):
     # Interpret this displacement vector (delta_x_grid, delta_y_grid) from the AGENT's original orientation.
     # We can use determine_relative_direction by treating the AGENT's orientation as the frame of reference,
     # and the (delta_x_grid, delta_y_grid) as the coordinates of a target relative to an origin (0,0).
-    calculated_direction = determine_relative_direction(0, 0, agent_orientation, delta_x_grid, delta_y_grid)
+    calculated_direction = grid_relative_direction(grid, (object_a_x, object_a_y), agent_orientation, (object_b_x, object_b_y))
+    if calculated_direction is None:
+        calculated_direction = determine_relative_direction(0, 0, agent_orientation, delta_x_grid, delta_y_grid)
     
     return calculated_direction
 
 
-def solve_template_hypothetical_reorientation(prompt_text: str) -> str:
+def solve_template_hypothetical_reorientation(prompt_text: str, grid: GridModel = None) -> str:
     """Solves the Tier 2 template involving a hypothetical turn."""
     pattern_str = re.compile(
         r"Consider (\w+) at \((\d+),(\d+)\), who is initially looking towards the (\w+)\.\s*"  # Changed to \.\s*
@@ -489,6 +607,7 @@ def solve_template_hypothetical_reorientation(prompt_text: str) -> str:
     )
     match = re.fullmatch(pattern_str, prompt_text.strip())
     if not match:
+        profiling.count("solver.hypothetical_reorientation.regex_failures")
         return "Error: Prompt does not match the Hypothetical Reorientation template structure."
 
     try:
@@ -506,15 +625,28 @@ def solve_template_hypothetical_reorientation(prompt_text: str) -> str:
         return "Error: Could not determine new hypothetical orientation (agent and obj_b might be in same cell)."
 
     # Step 2: Use this new valid orientation to find the relative direction to Object C
-    final_direction = determine_relative_direction(agent_x, agent_y, new_orientation, obj_c_x, obj_c_y)
+    final_direction = grid_relative_direction(grid, (agent_x, agent_y), new_orientation, (obj_c_x, obj_c_y))
+    if final_direction is None:
+        final_direction = determine_relative_direction(agent_x, agent_y, new_orientation, obj_c_x, obj_c_y)
 
     return final_direction
 
 
-def solve_template3_prompt(prompt_text: str, grid_details_2d_array: list) -> str:
+def get_occupied_positions(grid, exclude_id=None, grid_size=None):
+    """
+    Returns (N, set of occupied (x, y)) for a GridModel, a dense 2D grid or a
+    sparse {(x, y): object_id} index, leaving out the cell of `exclude_id`.
+    """
+    grid = GridModel.coerce(grid, grid_size)
+    return grid.size, grid.occupied_cells(exclude_id)
+
+def solve_template3_prompt(prompt_text: str, grid_details_2d_array, grid_size=None) -> str:
     """
     Solves a prompt from the dynamic Tier 3 template with step-by-step validation.
     If any step is invalid, it returns 'incorrect prompt'.
+
+    The grid may be a GridModel, the dense 2D array or a sparse {(x, y): object_id}
+    index (then grid_size must be given).
     """
     try:
         # Regex to parse the prompt
@@ -527,6 +659,7 @@ def solve_template3_prompt(prompt_text: str, grid_details_2d_array: list) -> str
     )
         match = re.fullmatch(pattern_t3_narrative, prompt_text.strip())
         if not match:
+            profiling.count("solver.template3.regex_failures")
             return "Error: Prompt text does not match the Tier 3 template structure."
 
         # Extract initial states
@@ -535,15 +668,9 @@ def solve_template3_prompt(prompt_text: str, grid_details_2d_array: list) -> str
         current_ori = match.group(4)
         target_pos = (int(match.group(6)), int(match.group(7)))
         
-        # Build the set of obstacle positions from the grid array
-        N = len(grid_details_2d_array)
-        occupied_positions = set()
-        for r_idx, row in enumerate(grid_details_2d_array):
-            for c_idx, cell_content in enumerate(row):
-                # The agent's own starting cell is NOT an obstacle for its first move
-                if cell_content != '.' and agent_id not in cell_content:
-                    x, y = c_idx, N - 1 - r_idx
-                    occupied_positions.add((x, y))
+        # Build the set of obstacle positions from the grid
+        # The agent's own starting cell is NOT an obstacle for its first move
+        N, occupied_positions = get_occupied_positions(grid_details_2d_array, agent_id, grid_size)
 
         # Parse and simulate the action sequence
         actions_block = match.group(9)
@@ -566,7 +693,8 @@ def solve_template3_prompt(prompt_text: str, grid_details_2d_array: list) -> str
                 
                 current_pos = next_pos
         
-        # If the loop completes successfully, all moves were valid.
+        # If the loop completes successfully, all moves were valid (the agent usually ends on
+        # a cell of its own, so this uses the sign lookup rather than the per-grid table).
         return determine_relative_direction(
             current_pos[0], current_pos[1], 
             current_ori, 
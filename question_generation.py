@@ -1,214 +1,325 @@
 import json
 import random
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Tuple, Any
 
+import numpy as np
+
+import profiling
+from grid_model import ORIENTATION_INDEX, RELATIVE_DIRECTIONS, RELATIVE_LOOKUP, GridModel, parse_coordinates, relative_direction
+from prompt_keys import SelectionKeyEncoder, make_key_store
+from prompt_templates import compile_templates, render_template
+
+MAX_ATTEMPTS_PER_UNIQUE_PROMPT = 100 # Try up to 100 times to find a unique set of params
+
 def generate_questions(grid_details_filename, templates_filename, actions_filename,
-                                           orientations_list, output_prompts_filename, prompts_count):
+                                           orientations_list, output_prompts_filename, prompts_count, grid_size=None,
+                                           seed=None, num_shards=1, workers=None, incorrect_prompt_ratio=0.0,
+                                           balance_t3_directions=False, key_store='auto'):
     """
     Generates prompts from Tier 1 templates (with all object orientations stated)
     using grid data and saves them to a JSON file.
+
+    grid_size is the side length N of the grid; when omitted it is inferred from
+    the largest occupied coordinate, which underestimates N on sparse grids.
+
+    Every template (and every shard of it) draws from its own random.Random stream
+    derived from `seed`, so the output is identical whatever `workers` is and
+    whatever order templates and levels are generated in. With seed=None the seed
+    is drawn from the global random module. Shards split the agents between them
+    (see _shard_agents); the output depends on num_shards but not on workers.
+    Prompt ids are assigned after the shards are merged in (template, shard) order.
+    incorrect_prompt_ratio is the share of Tier 3 prompts built to be invalid on purpose;
+    balance_t3_directions draws Tier 3 answers uniformly over the 8 directions.
+    key_store picks how used selections are remembered (see prompt_keys.make_key_store);
+    'bloom' keeps memory small for very large pools at the cost of a few skipped selections.
+    """
+    generation_inputs = load_generation_inputs(grid_details_filename, templates_filename, actions_filename, grid_size)
+    if generation_inputs is None:
+        return
+    grid, templates_data, compiled_templates, all_actions, complexity_level = generation_inputs
+    if seed is None:
+        seed = random.getrandbits(64) # Follows the caller's random.seed(...)
+
+    # One task per (template, shard); each has its own RNG stream named after the seed, level, template and shard
+    tasks = []
+    for template_info in templates_data.get("prompt_templates", []):
+        template_id_source = template_info["id"]
+        for shard, (shard_agents, quota) in enumerate(_shard_agents(len(grid), prompts_count, num_shards)):
+            stream_seed = template_stream_seed(seed, complexity_level, template_id_source, shard, num_shards)
+            tasks.append((template_id_source, compiled_templates[template_id_source], complexity_level, grid,
+                          shard_agents, quota, orientations_list, all_actions, stream_seed, incorrect_prompt_ratio,
+                          balance_t3_directions, key_store))
+
+    if workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shard_results = list(executor.map(_generate_template_shard, *zip(*tasks)))
+    else:
+        shard_results = [_generate_template_shard(*task) for task in tasks]
+
+    # Merge in task order and number the prompts afterwards, so the output does not depend on `workers`
+    all_generated_prompts = []
+    generated_by_template = {}
+    for task, shard_prompts in zip(tasks, shard_results):
+        template_id_source = task[0]
+        generated_by_template[template_id_source] = generated_by_template.get(template_id_source, 0) + len(shard_prompts)
+        for current_prompt_text in shard_prompts:
+            all_generated_prompts.append({
+                "complexity_level":complexity_level,
+                "prompt_id": f"{len(all_generated_prompts) + 1}",
+                "template_id_source": template_id_source,
+                "generated_prompt_text": current_prompt_text
+            })
+
+    for template_id_source, generated_count_for_template in generated_by_template.items():
+        if generated_count_for_template < 3:
+            print(f"Warning: Could only generate {generated_count_for_template} unique prompts for template ID '{template_id_source}' after {MAX_ATTEMPTS_PER_UNIQUE_PROMPT * prompts_count} attempts for template file {templates_filename}")
+
+
+    try:
+        with open(output_prompts_filename, 'w') as f:
+            json.dump(all_generated_prompts, f, indent=4)
+        print(f"\nSuccessfully generated {len(all_generated_prompts)} prompts and saved to '{output_prompts_filename}'.")
+    except IOError:
+        print(f"Error: Could not write prompts to file '{output_prompts_filename}'.")
+
+def load_generation_inputs(grid_details_filename, templates_filename, actions_filename, grid_size=None):
+    """
+    Loads and prepares everything question generation needs from its input files.
+
+    Returns:
+        tuple | None: (grid, templates_data, compiled_templates, all_actions, complexity_level),
+                      or None (after printing the error) if an input is missing or invalid.
     """
     try:
         with open(grid_details_filename, 'r') as f:
             grid_data_raw = json.load(f)
     except FileNotFoundError:
         print(f"Error: Grid details file '{grid_details_filename}' not found.")
-        return
+        return None
     except json.JSONDecodeError:
         print(f"Error: Could not decode JSON from '{grid_details_filename}'.")
-        return
+        return None
 
     try:
         with open(templates_filename, 'r') as f:
             templates_data = json.load(f)
     except FileNotFoundError:
         print(f"Error: Templates file '{templates_filename}' not found.")
-        return
+        return None
     except json.JSONDecodeError:
         print(f"Error: Could not decode JSON from '{templates_filename}'.")
-        return
+        return None
     
     try:
         with open(actions_filename, 'r') as f: actions_data = json.load(f)
     except FileNotFoundError:
         print(f"Error: Action file '{actions_filename}' not found.")
-        return
+        return None
     except json.JSONDecodeError:
         print(f"Error: Could not decode JSON from '{actions_filename}'.")
-        return
+        return None
 
     if not grid_data_raw:
         print("Error: Grid data from file is empty.")
-        return
+        return None
         
-    object_positions = {} 
-    all_object_ids_on_grid = list(grid_data_raw.values()) # Get all object IDs present on the grid
-
-    for coord_str, obj_id in grid_data_raw.items():
-        try:
-            x, y = parse_coordinates(coord_str)
-            object_positions[obj_id] = (x, y) 
-        except ValueError as e:
-            print(f"Warning: Skipping invalid coordinate string '{coord_str}' in grid data: {e}")
-            continue # Skip this entry
-    
-    if not object_positions: # No valid objects were parsed from grid_data_raw
+    # Coordinates are parsed once here; objects are referred to by their index in the grid model
+    grid = GridModel.from_grid_details(grid_data_raw, grid_size)
+    if not len(grid): # No valid objects were parsed from grid_data_raw
         print("Error: No valid objects could be parsed from the grid data.")
-        return
-    
-    # Ensure all_object_ids_on_grid only contains objects that were successfully parsed
-    all_object_ids_on_grid = [obj_id for obj_id in all_object_ids_on_grid if obj_id in object_positions]
-    if not all_object_ids_on_grid:
-        print("Error: No objects available after parsing grid positions.")
-        return
+        return None
 
-    max_coord = max(c for pos in object_positions.values() for c in pos) if object_positions else -1
-    N = max_coord + 1
+    # Templates are split into literal/placeholder segments once and checked here, not per prompt
+    compiled_templates = compile_templates(templates_data, templates_filename)
     all_actions = actions_data.get("performable_actions", [])
-
-    all_generated_prompts = []
-    global_prompt_id_counter = 1
-    
     complexity_level = (templates_data.get("complexity_level")).lower()
+    return grid, templates_data, compiled_templates, all_actions, complexity_level
 
-    for template_info in templates_data.get("prompt_templates", []):
-        template_id_source = template_info["id"]
-        template_string = template_info["template_string"]
-        placeholders_in_template = set(template_info.get("placeholders", [])) # For checking substitutions
-        
-        generated_count_for_template = 0
-        used_prompt_params_keys = set() 
-        max_attempts_per_unique_prompt = 100 # Try up to 100 times to find a unique set of params
-
-        for attempt_num in range(max_attempts_per_unique_prompt * prompts_count):
-            if generated_count_for_template >= prompts_count:
-                break
-
-            prompt_params = {}
-            current_selection_key_parts = [] # To build a key for uniqueness check
-
-            # Select Agent
-            if not all_object_ids_on_grid: continue
-            agent_id = random.choice(all_object_ids_on_grid)
-            agent_x, agent_y = object_positions[agent_id]
-            agent_orientation = random.choice(orientations_list)
-            
-            prompt_params["[AGENT_ID]"] = agent_id
-            prompt_params["[AGENT_X]"] = str(agent_x)
-            prompt_params["[AGENT_Y]"] = str(agent_y)
-            prompt_params["[AGENT_ORIENTATION]"] = agent_orientation
-            current_selection_key_parts.extend([agent_id, agent_orientation])
-
-            if template_id_source in ("1","2") and complexity_level == "low": # reading templates from level 1 file
-                available_targets = [oid for oid in all_object_ids_on_grid if oid != agent_id]
-                if not available_targets: continue
-                
-                target_object_id = random.choice(available_targets)
-                target_x, target_y = object_positions[target_object_id]
-                target_object_orientation = random.choice(orientations_list) # New
-
-                prompt_params["[TARGET_OBJECT_ID]"] = target_object_id
-                prompt_params["[TARGET_OBJECT_X]"] = str(target_x)
-                prompt_params["[TARGET_OBJECT_Y]"] = str(target_y)
-                prompt_params["[TARGET_OBJECT_ORIENTATION]"] = target_object_orientation # New
-                current_selection_key_parts.extend([target_object_id, target_object_orientation])
-
-            elif template_id_source == "1" and complexity_level == "medium": # Template T1.C equivalent
-                potential_obj_for_a_b = [oid for oid in all_object_ids_on_grid if oid != agent_id]
-                if len(potential_obj_for_a_b) < 2: continue
-                
-                obj_a_id, obj_b_id = random.sample(potential_obj_for_a_b, 2)
-                obj_a_x, obj_a_y = object_positions[obj_a_id]
-                obj_b_x, obj_b_y = object_positions[obj_b_id]
-                
-                obj_a_orientation = random.choice(orientations_list) # New
-                obj_b_orientation = random.choice(orientations_list) # New
-
-                rel_dir_a = determine_relative_direction(agent_x, agent_y, agent_orientation, obj_a_x, obj_a_y)
-                rel_dir_b = determine_relative_direction(agent_x, agent_y, agent_orientation, obj_b_x, obj_b_y)
-
-                if not rel_dir_a or not rel_dir_b or rel_dir_a == "In the same cell as" or rel_dir_b == "In the same cell as":
-                    continue
+def _shard_agents(num_objects, prompts_count, num_shards):
+    """
+    Splits the objects into `num_shards` agent partitions (object i goes to shard
+    i % num_shards) and divides `prompts_count` between them in proportion to their
+    size (largest remainder, ties to the lower shard). Every selection key starts
+    with the agent id, so shards can never produce the same prompt.
 
-                prompt_params["[OBJECT_A_ID]"] = obj_a_id
-                prompt_params["[OBJECT_A_X]"] = str(obj_a_x)
-                prompt_params["[OBJECT_A_Y]"] = str(obj_a_y)
-                prompt_params["[OBJECT_A_ORIENTATION]"] = obj_a_orientation # New
-                prompt_params["[RELATIVE_DIR_A_FROM_AGENT]"] = rel_dir_a
-                
-                prompt_params["[OBJECT_B_ID]"] = obj_b_id
-                prompt_params["[OBJECT_B_X]"] = str(obj_b_x)
-                prompt_params["[OBJECT_B_Y]"] = str(obj_b_y)
-                prompt_params["[OBJECT_B_ORIENTATION]"] = obj_b_orientation # New
-                prompt_params["[RELATIVE_DIR_B_FROM_AGENT]"] = rel_dir_b
-                current_selection_key_parts.extend(sorted([obj_a_id, obj_a_orientation, obj_b_id, obj_b_orientation]))
+    Returns:
+        list[tuple[range, int]]: (agent object indices, prompt quota) per shard.
+    """
+    partitions = [range(shard, num_objects, num_shards) for shard in range(num_shards)]
+    exact = [prompts_count * len(agents) / num_objects for agents in partitions]
+    quotas = [int(share) for share in exact]
+    by_remainder = sorted(range(num_shards), key=lambda shard: (quotas[shard] - exact[shard], shard))
+    for shard in by_remainder[:prompts_count - sum(quotas)]:
+        quotas[shard] += 1
+    return list(zip(partitions, quotas))
+
+def template_stream_seed(seed, complexity_level, template_id_source, shard=0, num_shards=1):
+    """Seed of the random.Random stream of one (level, template, shard) task."""
+    return f"{seed}:{complexity_level}:{template_id_source}:{shard}/{num_shards}"
+
+def _generate_template_shard(*task):
+    """Runs iter_template_prompts to completion (picklable entry point for worker processes)."""
+    return list(iter_template_prompts(*task))
+
+def iter_template_prompts(template_id_source, compiled_template, complexity_level, grid, shard_agents, quota,
+                          orientations_list, all_actions, stream_seed, incorrect_prompt_ratio=0.0, balance_t3_directions=False,
+                          key_store='auto'):
+    """
+    Yields up to `quota` unique prompts for one template, with agents drawn
+    from `shard_agents` only. All draws come from random.Random(stream_seed), so
+    the sequence depends on nothing but the arguments; a consumer may stop early.
+    For Tier 3, about `incorrect_prompt_ratio` of the action sequences are made
+    invalid on purpose (expected answer "incorrect prompt"), and with
+    balance_t3_directions each valid prompt first draws its answer direction
+    uniformly and then a sequence ending in it (T3ActionSampler.sample_sequence_for_direction).
+    Used selections are packed into integers (prompt_keys.SelectionKeyEncoder) and
+    remembered in a store of kind `key_store`. Attempts, accepted prompts and
+    duplicate selections are counted per template for profiling.
+
+    Yields:
+        str: Generated prompt texts, in generation order.
+    """
+    rng = random.Random(stream_seed)
+    object_names = grid.names
+    object_positions = grid.positions()
+    all_objects_on_grid = range(len(grid))
+    N = grid.size
+    t3_sampler = T3ActionSampler(grid, all_actions) if complexity_level == "high" else None
+    key_encoder = SelectionKeyEncoder(len(grid), orientations_list, all_actions)
+
+    generated_count_for_template = 0
+    key_shape = _selection_key_shape(template_id_source, complexity_level)
+    used_prompt_params_keys = make_key_store(key_encoder.bits[key_shape], quota, key_store)
+    if not shard_agents:
+        return
+    # Counted locally and flushed at each yield, as the consumer may stop early
+    counter_prefix = f"generate_questions.{complexity_level}.t{template_id_source}"
+    pending_attempts = pending_duplicates = 0
+
+    for attempt_num in range(MAX_ATTEMPTS_PER_UNIQUE_PROMPT * quota):
+        if generated_count_for_template >= quota:
+            break
+        pending_attempts += 1
+
+        prompt_params = {}
+
+        # Select Agent
+        agent = rng.choice(shard_agents)
+        agent_id = object_names[agent]
+        agent_x, agent_y = object_positions[agent]
+        agent_orientation = rng.choice(orientations_list)
+        
+        prompt_params["[AGENT_ID]"] = agent_id
+        prompt_params["[AGENT_X]"] = str(agent_x)
+        prompt_params["[AGENT_Y]"] = str(agent_y)
+        prompt_params["[AGENT_ORIENTATION]"] = agent_orientation
+        selection_key = key_encoder.agent_key(agent, agent_orientation) # To build a key for uniqueness check
+
+        if template_id_source in ("1","2") and complexity_level == "low": # reading templates from level 1 file
+            available_targets = [obj for obj in all_objects_on_grid if obj != agent]
+            if not available_targets: continue
             
-            elif template_id_source == "2" and complexity_level == "medium": # Hypothetical Reorientation Template
-                specific_params, specific_key_parts = generate_params_for_t2_hypothetical(
-                    agent_id, object_positions, all_object_ids_on_grid, orientations_list)
-                if specific_params and specific_key_parts:
-                    prompt_params.update(specific_params)
-                    current_selection_key_parts.extend(specific_key_parts)
-                else: continue
-
-            elif template_id_source == "1" and complexity_level == "high":
-                if len(all_actions) < 2:
-                    print(f"Warning: Cannot generate multi-step prompt for template '{template_id_source}'. Need at least 2 performable actions, but found {len(all_actions)}.")
-                    continue
-                num_actions = random.randint(2, len(all_actions)) # Generate a sequence of 2 to N actions
-                specific_params, specific_key_parts = _generate_params_for_dynamic_t3(agent_id, num_actions, object_positions, all_object_ids_on_grid, N, orientations_list, all_actions)
-                if specific_params and specific_key_parts:
-                    prompt_params.update(specific_params)
-                    current_selection_key_parts.extend(specific_key_parts)
-                else:
-                    continue
-
-            selection_key = tuple(current_selection_key_parts)
-            if selection_key in used_prompt_params_keys:
-                continue
+            target_object = rng.choice(available_targets)
+            target_object_id = object_names[target_object]
+            target_x, target_y = object_positions[target_object]
+            target_object_orientation = rng.choice(orientations_list) # New
+
+            prompt_params["[TARGET_OBJECT_ID]"] = target_object_id
+            prompt_params["[TARGET_OBJECT_X]"] = str(target_x)
+            prompt_params["[TARGET_OBJECT_Y]"] = str(target_y)
+            prompt_params["[TARGET_OBJECT_ORIENTATION]"] = target_object_orientation # New
+            selection_key = key_encoder.agent_target_key(agent, agent_orientation, target_object, target_object_orientation)
+
+        elif template_id_source == "1" and complexity_level == "medium": # Template T1.C equivalent
+            potential_obj_for_a_b = [obj for obj in all_objects_on_grid if obj != agent]
+            if len(potential_obj_for_a_b) < 2: continue
             
-            current_prompt_text = template_string
-            all_placeholders_successfully_replaced = True
-            for placeholder_name in placeholders_in_template:
-                if placeholder_name in prompt_params:
-                    current_prompt_text = current_prompt_text.replace(placeholder_name, prompt_params[placeholder_name])
-                else:
-                    # This means a required placeholder for this template was not assigned a value
-                    # print(f"Warning: Placeholder {placeholder_name} for template {template_id_source} was not in prompt_params.")
-                    all_placeholders_successfully_replaced = False
-                    break 
+            obj_a, obj_b = rng.sample(potential_obj_for_a_b, 2)
+            obj_a_id, obj_b_id = object_names[obj_a], object_names[obj_b]
+            obj_a_x, obj_a_y = object_positions[obj_a]
+            obj_b_x, obj_b_y = object_positions[obj_b]
             
-            if all_placeholders_successfully_replaced:
-                all_generated_prompts.append({
-                    "complexity_level":complexity_level,
-                    "prompt_id": f"{global_prompt_id_counter}",
-                    "template_id_source": template_id_source,
-                    "generated_prompt_text": current_prompt_text
-                })
-                used_prompt_params_keys.add(selection_key)
-                generated_count_for_template += 1
-                global_prompt_id_counter += 1
+            obj_a_orientation = rng.choice(orientations_list) # New
+            obj_b_orientation = rng.choice(orientations_list) # New
 
-        if generated_count_for_template < 3:
-            print(f"Warning: Could only generate {generated_count_for_template} unique prompts for template ID '{template_id_source}' after {max_attempts_per_unique_prompt * prompts_count} attempts for template file {templates_filename}")
+            rel_dir_a = grid.relative_direction(agent, agent_orientation, obj_a)
+            rel_dir_b = grid.relative_direction(agent, agent_orientation, obj_b)
 
+            if not rel_dir_a or not rel_dir_b or rel_dir_a == "In the same cell as" or rel_dir_b == "In the same cell as":
+                continue
 
-    try:
-        with open(output_prompts_filename, 'w') as f:
-            json.dump(all_generated_prompts, f, indent=4)
-        print(f"\nSuccessfully generated {len(all_generated_prompts)} prompts and saved to '{output_prompts_filename}'.")
-    except IOError:
-        print(f"Error: Could not write prompts to file '{output_prompts_filename}'.")
-def parse_coordinates(coord_str):
-    """Converts a coordinate string like "(x,y)" to an (int(x), int(y)) tuple."""
-    try:
-        parts = coord_str.strip("()").split(',')
-        return int(parts[0]), int(parts[1])
-    except Exception as e: # More general exception for parsing
-        raise ValueError(f"Invalid coordinate string format: {coord_str} (Error: {e})")
+            prompt_params["[OBJECT_A_ID]"] = obj_a_id
+            prompt_params["[OBJECT_A_X]"] = str(obj_a_x)
+            prompt_params["[OBJECT_A_Y]"] = str(obj_a_y)
+            prompt_params["[OBJECT_A_ORIENTATION]"] = obj_a_orientation # New
+            prompt_params["[RELATIVE_DIR_A_FROM_AGENT]"] = rel_dir_a
+            
+            prompt_params["[OBJECT_B_ID]"] = obj_b_id
+            prompt_params["[OBJECT_B_X]"] = str(obj_b_x)
+            prompt_params["[OBJECT_B_Y]"] = str(obj_b_y)
+            prompt_params["[OBJECT_B_ORIENTATION]"] = obj_b_orientation # New
+            prompt_params["[RELATIVE_DIR_B_FROM_AGENT]"] = rel_dir_b
+            selection_key = key_encoder.object_pair_key(agent, agent_orientation, obj_a, obj_a_orientation, obj_b, obj_b_orientation)
+        
+        elif template_id_source == "2" and complexity_level == "medium": # Hypothetical Reorientation Template
+            specific_params, specific_key_parts = generate_params_for_t2_hypothetical(
+                agent, grid, orientations_list, rng)
+            if specific_params and specific_key_parts:
+                prompt_params.update(specific_params)
+                selection_key = key_encoder.reorientation_key(agent, agent_orientation, *specific_key_parts)
+            else: continue
+
+        elif template_id_source == "1" and complexity_level == "high":
+            if len(all_actions) < 2:
+                print(f"Warning: Cannot generate multi-step prompt for template '{template_id_source}'. Need at least 2 performable actions, but found {len(all_actions)}.")
+                continue
+            num_actions = rng.randint(2, len(all_actions)) # Generate a sequence of 2 to N actions
+            invalid = incorrect_prompt_ratio > 0 and rng.random() < incorrect_prompt_ratio
+            direction_index = rng.randrange(len(RELATIVE_DIRECTIONS)) if balance_t3_directions and not invalid else None
+            specific_params, specific_key_parts = _generate_params_for_dynamic_t3(agent, num_actions, grid, orientations_list, all_actions, rng,
+                                                                                  t3_sampler, invalid, direction_index)
+            if specific_params and specific_key_parts:
+                prompt_params.update(specific_params)
+                selection_key = key_encoder.action_sequence_key(agent, agent_orientation, *specific_key_parts)
+            else:
+                continue
+
+        if selection_key in used_prompt_params_keys:
+            pending_duplicates += 1
+            continue
+        
+        # None means a required placeholder for this template was not assigned a value
+        current_prompt_text = render_template(compiled_template, prompt_params)
+        
+        if current_prompt_text is not None:
+            used_prompt_params_keys.add(selection_key)
+            generated_count_for_template += 1
+            profiling.count(counter_prefix + ".attempts", pending_attempts)
+            profiling.count(counter_prefix + ".duplicates", pending_duplicates)
+            profiling.count(counter_prefix + ".accepted")
+            pending_attempts = pending_duplicates = 0
+            yield current_prompt_text
+    profiling.count(counter_prefix + ".attempts", pending_attempts)
+    profiling.count(counter_prefix + ".duplicates", pending_duplicates)
+
+def _selection_key_shape(template_id_source, complexity_level):
+    """Which SelectionKeyEncoder key iter_template_prompts builds for a template."""
+    if template_id_source in ("1", "2") and complexity_level == "low":
+        return 'agent_target'
+    if template_id_source == "1" and complexity_level == "medium":
+        return 'object_pair'
+    if template_id_source == "2" and complexity_level == "medium":
+        return 'reorientation'
+    if template_id_source == "1" and complexity_level == "high":
+        return 'action_sequence'
+    return 'agent'
 
 def get_object_at_coord(grid_data, x, y): # Not directly used in generate_prompts but good helper
-    """Gets the object ID at a given (x,y) in the grid_data dictionary."""
+    """Gets the object ID at a given (x,y) in a GridModel or the grid_data dictionary."""
+    if isinstance(grid_data, GridModel):
+        return grid_data.object_at(x, y)
     return grid_data.get(f"({x},{y})")
 
 def determine_relative_direction(agent_x, agent_y, agent_orientation, target_x, target_y):
@@ -255,79 +366,43 @@ def determine_relative_direction(agent_x, agent_y, agent_orientation, target_x,
     Determines the relative direction (8-way) of a target from an agent's perspective.
     Returns one of 8 relative directions (e.g., "In-Front", "In-Front-Right", "Right", etc.)
     """
-    dx = target_x - agent_x
-    dy = target_y - agent_y
-
-    if dx == 0 and dy == 0:
-        return "Error: Reference and Target are in the same cell."
+    # Sign-of-displacement lookup table shared with the solvers (see grid_model.RELATIVE_LOOKUP)
+    return relative_direction(agent_x, agent_y, agent_orientation, target_x, target_y)
 
-    # Step 1: Determine the absolute grid direction from agent to target
-    # This simplified logic uses quadrants. Any non-axial vector is considered diagonal.
-    dx_sign = 1 if dx > 0 else -1 if dx < 0 else 0
-    dy_sign = 1 if dy > 0 else -1 if dy < 0 else 0
-    
-    absolute_direction = ""
-    if   (dx_sign, dy_sign) == (0, 1):   absolute_direction = "North"
-    elif (dx_sign, dy_sign) == (1, 1):   absolute_direction = "North-East"
-    elif (dx_sign, dy_sign) == (1, 0):   absolute_direction = "East"
-    elif (dx_sign, dy_sign) == (1, -1):  absolute_direction = "South-East"
-    elif (dx_sign, dy_sign) == (0, -1):  absolute_direction = "South"
-    elif (dx_sign, dy_sign) == (-1, -1): absolute_direction = "South-West"
-    elif (dx_sign, dy_sign) == (-1, 0):  absolute_direction = "West"
-    elif (dx_sign, dy_sign) == (-1, 1):  absolute_direction = "North-West"
-    
-    if not absolute_direction:
-        return "Error: Could not determine absolute direction." # Should not happen
-
-    # Step 2: Translate absolute direction to relative direction
-    # Define compass roses for absolute and relative directions
-    absolute_rose = ["North", "North-East", "East", "South-East", "South", "South-West", "West", "North-West"]
-    relative_rose = ["In-Front", "In-Front-Right", "Right", "Behind-Right", "Behind", "Behind-Left", "Left", "In-Front-Left"]
-
-    try:
-        # Find the index of the agent's orientation and the target's absolute direction
-        agent_dir_index = absolute_rose.index(agent_orientation)
-        target_abs_dir_index = absolute_rose.index(absolute_direction)
-
-        # The relative direction is found by the difference in indices on the compass rose
-        # We use modulo arithmetic to wrap around the compass
-        relative_index = (target_abs_dir_index - agent_dir_index) % 8
-        return relative_rose[relative_index]
-        
-    except ValueError:
-        return f"Error: Invalid orientation '{agent_orientation}' or calculated direction '{absolute_direction}'."
-
-def generate_params_for_t2_hypothetical(agent_id, object_positions, all_object_ids, orientations):
-    """Finds two other distinct objects for Template T2.4."""
-    potential_targets = [oid for oid in all_object_ids if oid != agent_id]
+def generate_params_for_t2_hypothetical(agent, grid: GridModel, orientations, rng=random):
+    """Finds two other distinct objects for Template T2.4 (`agent` is an object index of `grid`)."""
+    potential_targets = [obj for obj in range(len(grid)) if obj != agent]
     if len(potential_targets) < 2: return None, None
     
-    obj_b_id, obj_c_id = random.sample(potential_targets, 2)
-    obj_b_pos = object_positions[obj_b_id]
-    obj_c_pos = object_positions[obj_c_id]
+    obj_b, obj_c = rng.sample(potential_targets, 2)
+    obj_b_id, obj_c_id = grid.names[obj_b], grid.names[obj_c]
+    obj_b_pos = grid.position(obj_b)
+    obj_c_pos = grid.position(obj_c)
     
     params = {
         "[OBJECT_B_TO_FACE_ID]": obj_b_id, "[OBJECT_B_TO_FACE_X]": str(obj_b_pos[0]), "[OBJECT_B_TO_FACE_Y]": str(obj_b_pos[1]),
-        "[OBJECT_B_ORIENTATION]": random.choice(orientations),
+        "[OBJECT_B_ORIENTATION]": rng.choice(orientations),
         "[OBJECT_C_TO_LOCATE_ID]": obj_c_id, "[OBJECT_C_TO_LOCATE_X]": str(obj_c_pos[0]), "[OBJECT_C_TO_LOCATE_Y]": str(obj_c_pos[1]),
-        "[OBJECT_C_ORIENTATION]": random.choice(orientations)
+        "[OBJECT_C_ORIENTATION]": rng.choice(orientations)
     }
-    key_parts = sorted([obj_b_id, obj_c_id])
+    key_parts = (obj_b, obj_c) # Unordered pair; see SelectionKeyEncoder.reorientation_key
     return params, key_parts
 
 # These functions are assumed to be defined as in our previous discussions.
-def is_move_valid(new_pos: Tuple[int,int], N: int, object_positions: Dict[str, Tuple[int,int]]):
+def is_move_valid(new_pos: Tuple[int,int], N: int, occupied_positions: set):
     x, y = new_pos
     if not (0 <= x < N and 0 <= y < N): return False
-    if new_pos in object_positions: return False
+    if new_pos in occupied_positions: return False
     return True
 
 def get_new_orientation(current_orientation: str, turn_text: str) -> str:
+    # Case-insensitive like the solver's, so "Make a 90-degree left turn." turns here too
     rose = ["North", "East", "South", "West"]
     current_index = rose.index(current_orientation)
-    if "Left" in turn_text: return rose[(current_index - 1) % 4]
-    if "Right" in turn_text: return rose[(current_index + 1) % 4]
-    if "around" in turn_text or "Reverse" in turn_text: return rose[(current_index + 2) % 4]
+    turn_text = turn_text.lower()
+    if "left" in turn_text: return rose[(current_index - 1) % 4]
+    if "right" in turn_text: return rose[(current_index + 1) % 4]
+    if "around" in turn_text or "reverse" in turn_text: return rose[(current_index + 2) % 4]
     return current_orientation
 
 def get_new_position(current_pos: Tuple[int,int], current_orientation: str, move_text: str) -> Tuple[int,int]:
@@ -364,43 +439,348 @@ def get_new_position(current_pos: Tuple[int,int], current_orientation: str, move
     return (x + dx * num_steps, y + dy * num_steps)
 
 # --- NEW: Helper for generating parameters for the DYNAMIC T3 template ---
-def _generate_params_for_dynamic_t3(agent_id, num_actions, object_positions, all_object_ids, N, orientations, all_actions):
-    """Finds a valid scenario for the dynamic Tier 3 template."""
-    if len(all_object_ids) < 2: return None, None
-    target_id = random.choice([oid for oid in all_object_ids if oid != agent_id])
-    
-    temp_obstacles = {pos for id, pos in object_positions.items() if id != agent_id}
-    current_pos, current_ori = object_positions[agent_id], random.choice(orientations)
-    initial_pos, initial_ori = current_pos, current_ori
-    
-    action_sequence, action_text_list = [], []
-    for i in range(num_actions):
-        found_valid_action, attempts = False, 0
-        while not found_valid_action and attempts < 50:
-            attempts += 1
-            action_obj = random.choice(all_actions)
-            next_pos, next_ori = current_pos, current_ori
+# --- Tier 3 action sampling ---
+class T3ActionSampler:
+    """
+    Draws Tier 3 action sequences from the actions that are feasible at each step.
+
+    Every action's effect is worked out once (orientation change, or displacement
+    per orientation), and the actions that are valid from a (cell, orientation) --
+    inside the grid and not onto another object -- are cached on first use. The
+    agent may move back onto its own starting cell, as the solver allows. One
+    sampler serves every agent of a grid.
+
+    For direction-balanced generation it also runs a dynamic program over
+    (cell, orientation, step): state s = (y * N + x) * 4 + orientation, and
+    F_k[s] counts the valid k-action sequences of an agent that end in s. The
+    counts do not depend on the target, so one table per (agent, start
+    orientation) serves every target and answer direction. Counts are float64
+    (exact up to 2**53, relative error ~1e-16 beyond) and each table holds
+    N*N*4 values per step, so it is meant for question-sized grids.
+    """
+    __slots__ = ('grid', 'actions', '_turns', '_moves', '_move_indices', '_valid_cache', '_edge_cache', '_count_cache')
+
+    ROSE = ["North", "East", "South", "West"]
+    COUNT_CACHE_SIZE = 64 # (agent, start orientation) DP tables kept
+
+    def __init__(self, grid: GridModel, all_actions):
+        self.grid = grid
+        self.actions = all_actions
+        self._turns = {}  # action index -> orientation change on ROSE (quarter turns)
+        self._moves = {}  # action index -> {orientation: (dx, dy)}
+        for i, action_obj in enumerate(all_actions):
             if "translational" in action_obj['type']:
-                next_pos = get_new_position(current_pos, current_ori, action_obj['text'])
-                if is_move_valid(next_pos, N, temp_obstacles):
-                    found_valid_action = True
+                self._moves[i] = {ori: get_new_position((0, 0), ori, action_obj['text']) for ori in self.ROSE}
             elif "rotational" in action_obj['type']:
-                next_ori = get_new_orientation(current_ori, action_obj['text'])
-                found_valid_action = True
-        
-        if not found_valid_action: return None, None
-        current_pos, current_ori = next_pos, next_ori
-        action_sequence.append(action_obj)
-        action_text_list.append(f"{i+1}. {action_obj['text']}")
+                self._turns[i] = self.ROSE.index(get_new_orientation("North", action_obj['text']))
+        self._move_indices = sorted(self._moves)
+        self._valid_cache = {}
+        self._edge_cache = None
+        self._count_cache = OrderedDict()
+
+    def _transitions(self, pos, ori):
+        """
+        Cached ([(action index, next pos, next ori) for valid actions],
+        {occupied cell: [moves onto it]}) for one (cell, orientation).
+        """
+        key = (pos, ori)
+        cached = self._valid_cache.get(key)
+        if cached is None:
+            N = self.grid.size
+            occupied = self.grid.cell_index()
+            rose_index = self.ROSE.index(ori)
+            valid, onto_occupied = [], {}
+            for i in sorted(list(self._turns) + self._move_indices):
+                if i in self._turns:
+                    valid.append((i, pos, self.ROSE[(rose_index + self._turns[i]) % 4]))
+                    continue
+                dx, dy = self._moves[i][ori]
+                next_pos = (pos[0] + dx, pos[1] + dy)
+                if not (0 <= next_pos[0] < N and 0 <= next_pos[1] < N):
+                    continue
+                if next_pos in occupied:
+                    onto_occupied.setdefault(next_pos, []).append((i, next_pos, ori))
+                else:
+                    valid.append((i, next_pos, ori))
+            cached = self._valid_cache[key] = (valid, onto_occupied)
+        return cached
+
+    def valid_actions(self, pos, ori, home=None):
+        """
+        (action index, next pos, next ori) for every action that is valid from `pos`
+        facing `ori`; moves onto `home` (the agent's own starting cell) count as valid.
+        """
+        valid, onto_occupied = self._transitions(pos, ori)
+        back_home = onto_occupied.get(home)
+        return valid + back_home if back_home else valid
+
+    def sample_valid_sequence(self, agent, start_ori, num_actions, rng=random):
+        """
+        Draws `num_actions` actions that the agent (an object index) can perform in
+        order from its cell; every step draws uniformly from the feasible actions.
+
+        Returns:
+            list[int] | None: Action indices, or None if the agent gets boxed in
+                              (only possible when there are no rotational actions).
+        """
+        home = pos = self.grid.position(agent)
+        ori = start_ori
+        sequence = []
+        infeasible = 0 # actions a draw-and-retry sampler could have drawn and had to retry
+        for _ in range(num_actions):
+            valid = self.valid_actions(pos, ori, home)
+            infeasible += len(self.actions) - len(valid)
+            if not valid:
+                return None
+            action_index, pos, ori = rng.choice(valid)
+            sequence.append(action_index)
+        profiling.count("t3_actions.steps", num_actions)
+        profiling.count("t3_actions.infeasible_candidates", infeasible)
+        return sequence
+
+    def sample_invalid_sequence(self, agent, start_ori, num_actions, rng=random):
+        """
+        Draws a sequence that is feasible up to one step and then breaks a movement
+        rule there (leaves the grid or moves onto another object), so its expected
+        answer is "incorrect prompt". The failing step is drawn uniformly; actions
+        after it are arbitrary.
+
+        Returns:
+            list[int] | None: Action indices, or None if no step could be made to fail.
+        """
+        home = pos = self.grid.position(agent)
+        ori = start_ori
+        failing_step = rng.randrange(num_actions)
+        sequence = []
+        while len(sequence) < num_actions:
+            valid = self.valid_actions(pos, ori, home)
+            if len(sequence) >= failing_step:
+                valid_indices = {action_index for action_index, _, _ in valid}
+                invalid = [i for i in self._move_indices if i not in valid_indices]
+                if invalid:
+                    sequence.append(rng.choice(invalid))
+                    return sequence + [rng.randrange(len(self.actions)) for _ in range(num_actions - len(sequence))]
+            if not valid:
+                return None
+            action_index, pos, ori = rng.choice(valid)
+            sequence.append(action_index)
+        return None
+
+    # --- Dynamic programming over (cell, orientation, step) ---
+    def _state(self, pos, ori):
+        return (pos[1] * self.grid.size + pos[0]) * 4 + self.ROSE.index(ori)
+
+    def _edges(self):
+        """
+        Every valid transition between free states as (sources, destinations, action indices)
+        arrays sorted by destination, plus starts[t]:starts[t + 1] slicing the edges into
+        state t. Shared by all agents; moves back onto an agent's own cell come from _home_edges.
+        """
+        if self._edge_cache is not None:
+            return self._edge_cache
+        N = self.grid.size
+        cells = np.arange(N * N)
+        cell_x, cell_y = cells % N, cells // N
+        free = np.ones(N * N, dtype=bool)
+        free[self.grid.y.astype(np.int64) * N + self.grid.x] = False
+
+        sources, destinations, actions = [], [], []
+        for o, ori in enumerate(self.ROSE):
+            for i, turn in self._turns.items():
+                sources.append(cells * 4 + o)
+                destinations.append(cells * 4 + (o + turn) % 4)
+                actions.append(np.full(N * N, i))
+            for i, moves in self._moves.items():
+                dx, dy = moves[ori]
+                next_x, next_y = cell_x + dx, cell_y + dy
+                inside = (next_x >= 0) & (next_x < N) & (next_y >= 0) & (next_y < N)
+                next_cells = np.where(inside, next_y * N + next_x, 0)
+                valid = inside & free[next_cells]
+                sources.append(cells[valid] * 4 + o)
+                destinations.append(next_cells[valid] * 4 + o)
+                actions.append(np.full(int(valid.sum()), i))
+        sources = np.concatenate(sources)
+        destinations = np.concatenate(destinations)
+        actions = np.concatenate(actions)
+        order = np.argsort(destinations, kind='stable')
+        sources, destinations, actions = sources[order], destinations[order], actions[order]
+        starts = np.searchsorted(destinations, np.arange(N * N * 4 + 1))
+        self._edge_cache = (sources, destinations, actions, starts)
+        return self._edge_cache
+
+    def _home_edges(self, agent):
+        """(sources, destinations, action indices) of the moves that bring `agent` back onto its own cell."""
+        N = self.grid.size
+        home_x, home_y = self.grid.position(agent)
+        sources, destinations, actions = [], [], []
+        for o, ori in enumerate(self.ROSE):
+            for i, moves in self._moves.items():
+                dx, dy = moves[ori]
+                from_x, from_y = home_x - dx, home_y - dy
+                if 0 <= from_x < N and 0 <= from_y < N:
+                    sources.append((from_y * N + from_x) * 4 + o)
+                    destinations.append((home_y * N + home_x) * 4 + o)
+                    actions.append(i)
+        return np.array(sources, dtype=np.int64), np.array(destinations, dtype=np.int64), np.array(actions, dtype=np.int64)
+
+    def _advance(self, counts, home_edges):
+        """One DP step: counts over states -> counts one action later (sum over incoming transitions)."""
+        sources, destinations, _, _ = self._edges()
+        following = np.bincount(destinations, weights=counts[sources], minlength=len(counts))
+        home_sources, home_destinations, _ = home_edges
+        if len(home_sources):
+            following += np.bincount(home_destinations, weights=counts[home_sources], minlength=len(counts))
+        return following
+
+    def _end_directions(self, target):
+        """Relative direction index of `target` from every state (SAME_CELL on the target's cell)."""
+        N = self.grid.size
+        cells = np.arange(N * N)
+        target_x, target_y = self.grid.position(target)
+        dx_sign = np.sign(target_x - cells % N) + 1
+        dy_sign = np.sign(target_y - cells // N) + 1
+        orientation_indices = [ORIENTATION_INDEX[ori] for ori in self.ROSE]
+        return RELATIVE_LOOKUP[dx_sign[:, None], dy_sign[:, None], orientation_indices].reshape(-1)
+
+    def sequence_counts(self, agent, start_ori, num_steps):
+        """
+        [F_0, ..., F_num_steps] for `agent` starting on its cell facing `start_ori`:
+        F_k[s] is the number of valid k-action sequences that end in state s (float64).
+        Cached per (agent, start orientation) (LRU) and extended on demand.
+        """
+        key = (agent, start_ori)
+        layers = self._count_cache.get(key)
+        if layers is None:
+            first = np.zeros(self.grid.size * self.grid.size * 4)
+            first[self._state(self.grid.position(agent), start_ori)] = 1
+            layers = [first]
+        self._count_cache[key] = layers
+        self._count_cache.move_to_end(key)
+        while len(self._count_cache) > self.COUNT_CACHE_SIZE:
+            self._count_cache.popitem(last=False)
+
+        if len(layers) <= num_steps:
+            home_edges = self._home_edges(agent)
+            while len(layers) <= num_steps:
+                layers.append(self._advance(layers[-1], home_edges))
+        return layers[:num_steps + 1]
+
+    def count_end_directions(self, agent, target, start_ori, num_actions):
+        """Number of valid `num_actions`-step sequences after which `target` lies in each relative direction (array of 8)."""
+        end_counts = self.sequence_counts(agent, start_ori, num_actions)[num_actions]
+        end_directions = self._end_directions(target)
+        reachable = end_directions < 8
+        return np.bincount(end_directions[reachable], weights=end_counts[reachable], minlength=8)
+
+    def sample_sequence_for_direction(self, agent, target, start_ori, num_actions, direction_index, rng=random):
+        """
+        Draws a valid sequence after which `target` lies in RELATIVE_DIRECTIONS[direction_index],
+        uniformly among all such sequences: the end state is drawn in proportion to the
+        number of sequences reaching it, then each earlier step is drawn backwards in
+        proportion to the number of sequences reaching its source.
+
+        Returns:
+            list[int] | None: Action indices, or None if no sequence ends in that direction.
+        """
+        layers = self.sequence_counts(agent, start_ori, num_actions)
+        end_weights = np.where(self._end_directions(target) == direction_index, layers[num_actions], 0.0)
+        cumulative = np.cumsum(end_weights)
+        if cumulative[-1] <= 0:
+            return None
+        state = min(int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right')), len(cumulative) - 1)
+
+        sources, _, actions, starts = self._edges()
+        home_sources, home_destinations, home_actions = self._home_edges(agent)
+        sequence = []
+        for step in range(num_actions, 0, -1):
+            into_home = home_destinations == state
+            candidates = np.concatenate((sources[starts[state]:starts[state + 1]], home_sources[into_home]))
+            candidate_actions = np.concatenate((actions[starts[state]:starts[state + 1]], home_actions[into_home]))
+            cumulative = np.cumsum(layers[step - 1][candidates])
+            pick = min(int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right')), len(cumulative) - 1)
+            state = int(candidates[pick])
+            sequence.append(int(candidate_actions[pick]))
+        sequence.reverse()
+        return sequence
+
+    def direction_coverage(self, start_orientations, num_actions_values):
+        """
+        Analytical coverage of the 8 answers without sampling: for every sequence
+        length, sums over all (agent, start orientation, target) triples the number
+        of valid sequences ending in each direction, and counts the triples for which
+        each direction is reachable at all.
+
+        Returns:
+            dict: {num_actions: {direction: {'sequences': float, 'triples_reachable': int}}}
+        """
+        num_objects = len(self.grid)
+        end_directions = np.stack([self._end_directions(target) for target in range(num_objects)], axis=1)
+        max_steps = max(num_actions_values)
+        coverage = {k: {d: {'sequences': 0.0, 'triples_reachable': 0} for d in RELATIVE_DIRECTIONS} for k in num_actions_values}
+        for agent in range(num_objects):
+            home_edges = self._home_edges(agent)
+            others = np.arange(num_objects) != agent
+            # counts[s, o]: valid sequences of the current length from (home, start_orientations[o]) ending in state s
+            counts = np.zeros((len(end_directions), len(start_orientations)))
+            for o, ori in enumerate(start_orientations):
+                counts[self._state(self.grid.position(agent), ori), o] = 1
+            for k in range(max_steps + 1):
+                if k in coverage:
+                    for d, direction in enumerate(RELATIVE_DIRECTIONS):
+                        per_triple = counts.T @ (end_directions[:, others] == d) # (start orientations, targets)
+                        coverage[k][direction]['sequences'] += float(per_triple.sum())
+                        coverage[k][direction]['triples_reachable'] += int((per_triple > 0).sum())
+                counts = np.stack([self._advance(counts[:, o], home_edges) for o in range(counts.shape[1])], axis=1)
+        return coverage
+
+def _generate_params_for_dynamic_t3(agent, num_actions, grid: GridModel, orientations, all_actions, rng=random,
+                                    sampler: T3ActionSampler = None, invalid=False, direction_index=None):
+    """
+    Finds a scenario for the dynamic Tier 3 template (`agent` is an object index of `grid`).
+    The action sequence is drawn by `sampler` from the feasible actions only; with
+    invalid=True it deliberately breaks a movement rule (an "incorrect prompt" question),
+    and with a direction_index it ends with the target in RELATIVE_DIRECTIONS[direction_index].
+    """
+    if len(grid) < 2: return None, None
+    profiling.count("t3_params.attempts")
+    if sampler is None:
+        sampler = T3ActionSampler(grid, all_actions)
+    # Same draw as rng.choice over every object but the agent, without building that list
+    target = rng.randrange(len(grid) - 1)
+    target += target >= agent
+    agent_id, target_id = grid.names[agent], grid.names[target]
+    initial_pos, initial_ori = grid.position(agent), rng.choice(orientations)
+    
+    if invalid:
+        action_indices = sampler.sample_invalid_sequence(agent, initial_ori, num_actions, rng)
+    elif direction_index is not None:
+        action_indices = sampler.sample_sequence_for_direction(agent, target, initial_ori, num_actions, direction_index, rng)
+    else:
+        action_indices = sampler.sample_valid_sequence(agent, initial_ori, num_actions, rng)
+    if action_indices is None:
+        profiling.count("t3_params.no_sequence")
+        return None, None
+    profiling.count("t3_params.accepted")
+    action_sequence = [all_actions[i] for i in action_indices]
+    action_text_list = [f"{i+1}. {action_obj['text']}" for i, action_obj in enumerate(action_sequence)]
     
     params = {
         "[AGENT_ID]": agent_id,
         "[AGENT_X_INITIAL]": str(initial_pos[0]), "[AGENT_Y_INITIAL]": str(initial_pos[1]),
         "[AGENT_ORIENTATION_INITIAL]": initial_ori,
         "[TARGET_OBJECT_ID]": target_id,
-        "[TARGET_OBJECT_X]": str(object_positions[target_id][0]), "[TARGET_OBJECT_Y]": str(object_positions[target_id][1]),
-        "[TARGET_OBJECT_ORIENTATION]": random.choice(orientations),
+        "[TARGET_OBJECT_X]": str(grid.position(target)[0]), "[TARGET_OBJECT_Y]": str(grid.position(target)[1]),
+        "[TARGET_OBJECT_ORIENTATION]": rng.choice(orientations),
         "[ACTION_SEQUENCE_LIST_TEXT]": ",".join(action_text_list)
     }
-    key_parts = sorted([str(target_id)] + [str(act['id']) for act in action_sequence])
-    return params, key_parts
\ No newline at end of file
+    key_parts = (target, action_indices) # Order-free; see SelectionKeyEncoder.action_sequence_key
+    return params, key_parts
+
+def t3_direction_coverage(grid: GridModel, all_actions, orientations_list, num_actions_values=None):
+    """
+    Analytical Tier 3 answer coverage of a grid (see T3ActionSampler.direction_coverage),
+    by default for every sequence length the generator draws (2 to len(all_actions)).
+    """
+    if num_actions_values is None:
+        num_actions_values = range(2, len(all_actions) + 1)
+    return T3ActionSampler(grid, all_actions).direction_coverage(orientations_list, list(num_actions_values))
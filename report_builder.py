@@ -0,0 +1,265 @@
+import hashlib
+import html
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analyze_results import load_combined_results
+from result_aggregation import DIRECTION_ORDER, LEVEL_ORDER, aggregate_results
+
+# Bump when a renderer changes so every figure is redrawn on the next build.
+RENDER_VERSION = 1
+MANIFEST_FILENAME = '.report_manifest.json'
+# Untracked by default (git-ignored); the committed result_analysis.html and results/*.png
+# are only rewritten when passed explicitly as output_html and figures_dir.
+REPORT_DIR = 'reports'
+CONFUSION_LABELS = DIRECTION_ORDER[:9]  # the 8 directions plus 'incorrect-prompt'
+
+def display_label(label: str) -> str:
+    """'in-front-left' -> 'In-Front-Left'; status labels such as 'unparseable' are kept as-is."""
+    return label.title() if label in DIRECTION_ORDER[:8] else label
+
+# --- Renderers (run inside worker processes) ---
+def _annotate_bars(ax, bars, fmt="{:.1%}", fontsize=None):
+    for bar in bars:
+        ax.annotate(fmt.format(bar.get_height()), (bar.get_x() + bar.get_width() / 2., bar.get_height()),
+                    ha='center', va='center', xytext=(0, 9), textcoords='offset points', fontsize=fontsize)
+
+def _bar_chart(plt, payload):
+    fig, ax = plt.subplots(figsize=payload.get('figsize', (12, 7)))
+    colors = plt.get_cmap(payload.get('cmap', 'plasma'))(np.linspace(0.1, 0.9, max(len(payload['labels']), 1)))
+    bars = ax.bar(payload['labels'], payload['values'], color=colors)
+    _annotate_bars(ax, bars, payload.get('fmt', "{:.1%}"))
+    ax.set_title(payload['title'], fontsize=16)
+    ax.set_xlabel(payload['xlabel'], fontsize=12)
+    ax.set_ylabel('Accuracy', fontsize=12)
+    ax.set_ylim(0, 1.05)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    return fig
+
+def _bar_panels(plt, payload):
+    panels = payload['panels']
+    vertical = payload.get('vertical', False)
+    if vertical:
+        fig, axes = plt.subplots(len(panels), 1, figsize=(14, 9 * len(panels)), sharey=True, squeeze=False)
+    else:
+        fig, axes = plt.subplots(1, len(panels), figsize=(8 * len(panels), 8), sharey=True, squeeze=False)
+    fig.suptitle(payload['title'], fontsize=20)
+    for ax, panel in zip(axes.ravel(), panels):
+        colors = plt.get_cmap(payload.get('cmap', 'magma'))(np.linspace(0.1, 0.9, max(len(panel['labels']), 1)))
+        bars = ax.bar(panel['labels'], panel['values'], color=colors)
+        _annotate_bars(ax, bars, fontsize=12)
+        ax.set_title(f"Level: {panel['level']}", fontsize=18)
+        ax.set_xlabel(payload['xlabel'], fontsize=14)
+        ax.set_ylabel('Accuracy', fontsize=14)
+        ax.set_ylim(0, 1.05)
+        ax.tick_params(axis='x', rotation=45 if vertical else 90, labelsize=12)
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    return fig
+
+def _heatmap(ax, matrix, labels, cmap, annot_size):
+    import seaborn as sns
+    sns.heatmap(np.asarray(matrix), annot=True, fmt='d', cmap=cmap, cbar=False, linewidths=.5, ax=ax,
+                xticklabels=labels, yticklabels=labels, annot_kws={"size": annot_size})
+    ax.set_xlabel('Predicted Answer')
+    ax.set_ylabel('Actual Answer')
+
+def _confusion_chart(plt, payload):
+    fig, ax = plt.subplots(figsize=(14, 12))
+    _heatmap(ax, payload['matrix'], payload['labels'], payload.get('cmap', 'Blues'), 14)
+    ax.set_title(payload['title'], fontsize=18)
+    fig.tight_layout()
+    return fig
+
+def _confusion_panels(plt, payload):
+    panels = payload['panels']
+    fig, axes = plt.subplots(1, len(panels), figsize=(12 * len(panels), 10), sharey=True, squeeze=False)
+    fig.suptitle(payload['title'], fontsize=30)
+    for ax, panel in zip(axes.ravel(), panels):
+        _heatmap(ax, panel['matrix'], payload['labels'], 'YlGnBu', 16)
+        ax.set_title(f"Level: {panel['level']}", fontsize=22)
+    fig.tight_layout(rect=[0, 0, 1, 0.95])
+    return fig
+
+RENDERERS = {
+    'bar': _bar_chart,
+    'bar_panels': _bar_panels,
+    'confusion': _confusion_chart,
+    'confusion_panels': _confusion_panels,
+}
+
+def _render_figure(figure_spec):
+    """Worker entry point: draws one figure spec and saves it as PNG."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig = RENDERERS[figure_spec['kind']](plt, figure_spec['payload'])
+    fig.savefig(figure_spec['path'])
+    plt.close(fig)
+    return figure_spec['path']
+
+# --- Figure specs (pure data, hashed to decide what needs redrawing) ---
+def _series_payload(table, title, xlabel, order=None, sort=False, cmap='plasma'):
+    accuracy = table['accuracy']
+    if order is not None:
+        accuracy = accuracy.reindex([label for label in order if label in accuracy.index])
+    if sort:
+        accuracy = accuracy.sort_values(ascending=False)
+    return {'labels': [display_label(str(label)) for label in accuracy.index],
+            'values': [float(value) for value in accuracy.to_numpy()],
+            'title': title, 'xlabel': xlabel, 'cmap': cmap}
+
+def _confusion_payload(confusion, labels):
+    matrix = confusion.reindex(index=labels, columns=labels, fill_value=0)
+    return matrix.to_numpy(dtype=int).tolist()
+
+def build_figure_specs(tables: dict, output_dir: str) -> list:
+    """Describes every report figure as {'path', 'kind', 'payload'} computed from the aggregated tables."""
+    specs = []
+
+    def add(filename, kind, payload):
+        specs.append({'path': os.path.join(output_dir, filename), 'kind': kind, 'payload': payload})
+
+    levels = [level for level in LEVEL_ORDER if level in tables['axes']['level']]
+    confusion_labels = [label for label in tables['axes']['predicted_answer'] if label != 'error']
+    add('consolidated_accuracy_by_model.png', 'bar',
+        _series_payload(tables['by_model'], 'Consolidated Accuracy by Model', 'Model', sort=True))
+    add('consolidated_confusion_matrix.png', 'confusion', {
+        'matrix': _confusion_payload(tables['confusion'], confusion_labels),
+        'labels': [display_label(label) for label in confusion_labels],
+        'title': 'Consolidated Confusion Matrix (All Models & Levels)', 'cmap': 'YlGnBu'})
+    by_model_level = tables['by_model_level']
+    add('consolidated_accuracy_by_level_comparison.png', 'bar_panels', {
+        'title': 'Comparative Model Accuracy by Complexity Level', 'xlabel': 'Model', 'cmap': 'magma',
+        'panels': [dict(_series_payload(by_model_level.xs(level, level='level'), '', 'Model', sort=True), level=level)
+                   for level in levels if level in by_model_level.index.get_level_values('level')]})
+
+    by_model_direction = tables['by_model_direction']
+    by_model_level_direction = tables['by_model_level_direction']
+    for model in tables['axes']['model']:
+        model_levels = [level for level in levels if (model, level) in by_model_level.index]
+        add(f'{model}_accuracy_by_level.png', 'bar',
+            _series_payload(by_model_level.xs(model, level='model'), f'Accuracy by Complexity Level for {model}',
+                            'Complexity Level', order=LEVEL_ORDER, cmap='viridis'))
+        add(f'{model}_accuracy_by_direction.png', 'bar',
+            _series_payload(by_model_direction.xs(model, level='model'), f'Accuracy by Direction for {model}',
+                            'Ground Truth (Expected Answer)', order=DIRECTION_ORDER, cmap='coolwarm'))
+        model_confusion = tables['confusion_by_model'][model]
+        row_totals, column_totals = model_confusion.sum(axis=1), model_confusion.sum(axis=0)
+        model_labels = [label for label in tables['axes']['predicted_answer']
+                        if row_totals.get(label, 0) > 0 or column_totals.get(label, 0) > 0]
+        add(f'{model}_confusion_matrix.png', 'confusion', {
+            'matrix': _confusion_payload(model_confusion, model_labels),
+            'labels': [display_label(label) for label in model_labels],
+            'title': f'Confusion Matrix for {model}'})
+        add(f'{model}_detailed_accuracy_report.png', 'bar_panels', {
+            'title': f'Model Accuracy by Direction and Complexity for\n{model}',
+            'xlabel': 'Ground Truth (Expected Answer)', 'cmap': 'viridis_r', 'vertical': True,
+            'panels': [dict(_series_payload(by_model_level_direction.xs((model, level), level=('model', 'level')),
+                                            '', '', order=DIRECTION_ORDER), level=level)
+                       for level in model_levels]})
+        add(f'{model}_detailed_confusion_matrix.png', 'confusion_panels', {
+            'title': f'Confusion Matrix by Complexity Level for\n{model}',
+            'labels': [display_label(label) for label in CONFUSION_LABELS],
+            'panels': [{'level': level, 'matrix': _confusion_payload(tables['confusion_by_model_level'][(model, level)], CONFUSION_LABELS)}
+                       for level in model_levels]})
+    return specs
+
+def _spec_digest(figure_spec) -> str:
+    blob = json.dumps({'version': RENDER_VERSION, 'kind': figure_spec['kind'], 'payload': figure_spec['payload']}, sort_keys=True)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+def render_figures(specs: list, manifest_path: str, workers=None, force=False) -> list:
+    """
+    Renders the figures whose inputs changed since the last build, in parallel.
+
+    Args:
+        specs (list): Figure specs from build_figure_specs.
+        manifest_path (str): JSON file remembering the input digest of every rendered figure.
+        workers (int, optional): Worker processes; defaults to os.cpu_count().
+        force (bool): Redraw every figure regardless of the manifest.
+
+    Returns:
+        list: Paths of the figures that were (re)drawn.
+    """
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    digests = {spec['path']: _spec_digest(spec) for spec in specs}
+    stale = [spec for spec in specs
+             if force or manifest.get(spec['path']) != digests[spec['path']] or not os.path.exists(spec['path'])]
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rendered = list(executor.map(_render_figure, stale))
+    else:
+        rendered = []
+
+    manifest.update({spec['path']: digests[spec['path']] for spec in stale})
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    return rendered
+
+def write_html_report(tables: dict, specs: list, output_html: str, dataset_suffix: str):
+    """Writes a static HTML page with the summary tables and every report figure."""
+    base_dir = os.path.dirname(os.path.abspath(output_html))
+    sections = [f"<h1>Spatial reasoning results ({html.escape(dataset_suffix)})</h1>",
+                f"<p>Overall accuracy: {tables['overall']['accuracy'].iloc[0]:.2%} "
+                f"over {int(tables['overall']['n'].iloc[0])} prompts.</p>"]
+    for name, heading in (('by_model', 'Accuracy by model'), ('by_level', 'Accuracy by complexity level'),
+                          ('by_model_level', 'Accuracy by model and level'),
+                          ('by_template', 'Accuracy by level and template')):
+        sections.append(f"<h2>{heading}</h2>")
+        sections.append(tables[name].to_html(float_format="{:.2%}".format))
+    sections.append("<h2>Figures</h2>")
+    for spec in specs:
+        image_path = os.path.relpath(os.path.abspath(spec['path']), base_dir)
+        sections.append(f'<figure><img src="{html.escape(image_path)}" style="max-width:100%">'
+                        f'<figcaption>{html.escape(os.path.basename(spec["path"]))}</figcaption></figure>')
+    with open(output_html, 'w') as f:
+        f.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Result analysis</title></head><body>\n")
+        f.write("\n".join(sections))
+        f.write("\n</body></html>\n")
+
+def build_report(root_results_dir: str = 'results', dataset_suffix: str = '2000_10',
+                 output_html: str = os.path.join(REPORT_DIR, 'result_analysis.html'), workers=None, force=False,
+                 results_db: str = None, figures_dir: str = REPORT_DIR):
+    """
+    Headless replacement for the result_analysis notebooks.
+
+    Loads the combined results once, aggregates every table in one pass, redraws
+    only the figures in `figures_dir` whose inputs changed, and rewrites the HTML
+    report. With results_db the results are read from that results_store database
+    (one query) instead of walking `root_results_dir`.
+
+    Both outputs default to REPORT_DIR; pass output_html='result_analysis.html' and
+    figures_dir='results' to regenerate the committed report and figures.
+
+    Returns:
+        dict: The aggregated tables (see result_aggregation.aggregate_results).
+    """
+    if results_db:
+        from results_store import load_results_frame
+        combined_df = load_results_frame(results_db, dataset_suffix)
+    else:
+        combined_df = load_combined_results(root_results_dir, dataset_suffix)
+    if combined_df.empty:
+        print(f"No '{dataset_suffix}' results were found in '{results_db or root_results_dir}'.")
+        return {}
+
+    tables = aggregate_results(combined_df)
+    os.makedirs(figures_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(output_html) or '.', exist_ok=True)
+    specs = build_figure_specs(tables, figures_dir)
+    rendered = render_figures(specs, os.path.join(figures_dir, MANIFEST_FILENAME), workers=workers, force=force)
+    write_html_report(tables, specs, output_html, dataset_suffix)
+    print(f"Report written to '{output_html}': {len(rendered)} of {len(specs)} figures redrawn.")
+    return tables
+
+if __name__ == '__main__':
+    build_report()
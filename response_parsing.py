@@ -0,0 +1,29 @@
+import re
+
+# Answer parsing, kept free of pandas/numpy so llm_evaluation can score answers as
+# they arrive without importing them; analyze_results maps it over result columns.
+ANSWER_MARKER = "###answer:"
+# Single alternation shared by the scalar and batched parsers. Longer labels come
+# first so 'in-front-right' is never reported as 'in-front'.
+DIRECTION_PATTERN = re.compile(r'(in-front-right|in-front-left|behind-right|behind-left|in-front|behind|left|right)')
+
+# --- Helper function (Unchanged) ---
+def parse_llm_response(raw_response: str) -> str:
+    """Cleans the raw LLM response to extract just the spatial direction string."""
+    if not isinstance(raw_response, str) or "Error:" in raw_response:
+        return "error"
+    response_lower = raw_response.lower().strip().replace('.', '').replace(',', '')
+    answer = ANSWER_MARKER
+    if answer in response_lower:
+        answer_part = response_lower.split(answer)[1]
+        parsed_answer = answer_part.strip().replace('.', '').replace(',', '')
+        # Standardize format (e.g., 'in front left' -> 'in-front-left')
+        parsed_answer = parsed_answer.replace(' ', '-')
+        return parsed_answer if parsed_answer else "unparseable"
+    if "incorrect prompt" in response_lower:
+        # Same label as "###Answer: incorrect prompt" (packed answers are demuxed that
+        # way) and as the expected answers, which are normalised with spaces -> '-'
+        return "incorrect-prompt"
+    #response_lower = response_lower.replace('in front', 'in-front').replace('behind', 'behind-')
+    directions_found = DIRECTION_PATTERN.findall(response_lower)
+    return directions_found[0] if directions_found else "unparseable"
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+LEVEL_ORDER = ['Low', 'Medium', 'High']
+DIRECTION_ORDER = ['in-front', 'in-front-right', 'right', 'behind-right', 'behind', 'behind-left', 'left', 'in-front-left',
+                   'incorrect-prompt', 'unparseable', 'error']
+KEY_COLUMNS = ('model', 'level', 'template')
+
+def _ordered_categories(values, preferred_order):
+    """Known labels in their preferred order, followed by any others sorted."""
+    present = set(values)
+    ordered = [label for label in preferred_order if label in present]
+    return ordered + sorted(present - set(ordered), key=str)
+
+def encode_labels(expected_answers, predicted_answers):
+    """
+    Maps expected and predicted labels onto one shared integer vocabulary.
+
+    Expected labels get the lowest codes, so code `i < len(expected_labels)` means
+    the same label on both axes and the diagonal of the counts is "correct".
+
+    Returns:
+        tuple: (expected_codes, predicted_codes, expected_labels, all_labels)
+    """
+    expected = pd.Series(expected_answers, dtype=object).astype(str).to_numpy()
+    predicted = pd.Series(predicted_answers, dtype=object).astype(str).to_numpy()
+    expected_labels = _ordered_categories(expected, DIRECTION_ORDER)
+    all_labels = expected_labels + _ordered_categories(set(predicted) - set(expected_labels), DIRECTION_ORDER)
+    label_codes = {label: code for code, label in enumerate(all_labels)}
+    expected_codes = np.fromiter((label_codes[label] for label in expected), dtype=np.int64, count=len(expected))
+    predicted_codes = np.fromiter((label_codes[label] for label in predicted), dtype=np.int64, count=len(predicted))
+    return expected_codes, predicted_codes, expected_labels, all_labels
+
+def confusion_matrix(expected_answers, predicted_answers, labels=None) -> pd.DataFrame:
+    """
+    Confusion counts of expected vs predicted labels via a single np.bincount.
+
+    Args:
+        expected_answers (array-like): Ground-truth labels.
+        predicted_answers (array-like): Parsed model labels.
+        labels (list, optional): Row/column labels to report. Defaults to every label
+                                 seen on either axis; pairs outside `labels` are dropped.
+
+    Returns:
+        pd.DataFrame: Square matrix indexed 'Actual Answer' x 'Predicted Answer'.
+    """
+    expected = pd.Series(expected_answers, dtype=object).astype(str).to_numpy()
+    predicted = pd.Series(predicted_answers, dtype=object).astype(str).to_numpy()
+    if labels is None:
+        labels = _ordered_categories(set(expected) | set(predicted), DIRECTION_ORDER)
+    label_codes = {label: code for code, label in enumerate(labels)}
+    expected_codes = np.fromiter((label_codes.get(label, -1) for label in expected), dtype=np.int64, count=len(expected))
+    predicted_codes = np.fromiter((label_codes.get(label, -1) for label in predicted), dtype=np.int64, count=len(predicted))
+    keep = (expected_codes >= 0) & (predicted_codes >= 0)
+    num_labels = len(labels)
+    counts = np.bincount(expected_codes[keep] * num_labels + predicted_codes[keep], minlength=num_labels * num_labels)
+    return pd.DataFrame(counts.reshape(num_labels, num_labels),
+                        index=pd.Index(labels, name='Actual Answer'),
+                        columns=pd.Index(labels, name='Predicted Answer'))
+
+def aggregate_results(results_df: pd.DataFrame) -> dict:
+    """
+    Computes every accuracy and confusion table from one pass over the combined results.
+
+    Each row is coded as (model, level, template, expected, predicted) and counted with
+    one np.bincount; all tables below are sums over axes of that count tensor.
+
+    Args:
+        results_df (pd.DataFrame): Combined results with 'model', 'level',
+                                   'expected_answer' and 'predicted_answer' columns
+                                   and an optional 'template' column.
+
+    Returns:
+        dict: 'counts' (ndarray of shape models x levels x templates x expected x predicted),
+              'axes' (the labels of each axis), accuracy tables 'overall', 'by_model',
+              'by_level', 'by_model_level', 'by_template', 'by_direction',
+              'by_model_direction', 'by_model_level_direction', and confusion tables
+              'confusion', 'confusion_by_model', 'confusion_by_model_level'.
+    """
+    if results_df.empty:
+        return {}
+    df = results_df
+    if 'template' not in df.columns:
+        df = df.assign(template='1')
+
+    key_codes, axes = [], {}
+    for column in KEY_COLUMNS:
+        values = df[column].astype(str).to_numpy()
+        preferred = LEVEL_ORDER if column == 'level' else []
+        categories = _ordered_categories(values, preferred)
+        key_codes.append(pd.Categorical(values, categories=categories).codes.astype(np.int64))
+        axes[column] = categories
+
+    expected_codes, predicted_codes, expected_labels, all_labels = encode_labels(df['expected_answer'], df['predicted_answer'])
+    axes['expected_answer'] = expected_labels
+    axes['predicted_answer'] = all_labels
+
+    shape = tuple(len(axes[column]) for column in KEY_COLUMNS) + (len(expected_labels), len(all_labels))
+    flat_index = np.ravel_multi_index(tuple(key_codes) + (expected_codes, predicted_codes), shape)
+    counts = np.bincount(flat_index, minlength=int(np.prod(shape))).reshape(shape)
+
+    # totals/correct per (model, level, template, expected); every accuracy table is a sum of these
+    totals = counts.sum(axis=-1)
+    correct = np.einsum('...ii->...i', counts[..., :len(expected_labels)])
+    cell_axes = KEY_COLUMNS + ('expected_answer',)
+
+    def accuracy_table(keep):
+        dropped = tuple(i for i, name in enumerate(cell_axes) if name not in keep)
+        n = totals.sum(axis=dropped)
+        k = correct.sum(axis=dropped)
+        index = pd.MultiIndex.from_product([axes[name] for name in keep], names=list(keep))
+        table = pd.DataFrame({'n': n.ravel(), 'correct': k.ravel()}, index=index)
+        table = table[table['n'] > 0]
+        table['accuracy'] = table['correct'] / table['n']
+        if len(keep) == 1:
+            table.index = table.index.get_level_values(0)
+        return table
+
+    def confusion_table(matrix):
+        return pd.DataFrame(matrix, index=pd.Index(expected_labels, name='Actual Answer'),
+                            columns=pd.Index(all_labels, name='Predicted Answer'))
+
+    by_model_level_confusion = counts.sum(axis=2)
+    n_total, k_total = int(totals.sum()), int(correct.sum())
+    return {
+        'counts': counts,
+        'axes': axes,
+        'overall': pd.DataFrame({'n': [n_total], 'correct': [k_total], 'accuracy': [k_total / n_total]}),
+        'by_model': accuracy_table(('model',)),
+        'by_level': accuracy_table(('level',)),
+        'by_model_level': accuracy_table(('model', 'level')),
+        'by_template': accuracy_table(('level', 'template')),
+        'by_direction': accuracy_table(('expected_answer',)),
+        'by_model_direction': accuracy_table(('model', 'expected_answer')),
+        'by_model_level_direction': accuracy_table(('model', 'level', 'expected_answer')),
+        'confusion': confusion_table(counts.sum(axis=(0, 1, 2))),
+        'confusion_by_model': {model: confusion_table(by_model_level_confusion[m].sum(axis=0))
+                               for m, model in enumerate(axes['model'])},
+        'confusion_by_model_level': {(model, level): confusion_table(by_model_level_confusion[m, l])
+                                     for m, model in enumerate(axes['model'])
+                                     for l, level in enumerate(axes['level'])
+                                     if by_model_level_confusion[m, l].any()},
+    }
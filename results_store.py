@@ -0,0 +1,300 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+from response_parsing import parse_llm_response
+from sequential_evaluation import API_PROMPTS_PATTERN
+
+# One SQLite database for every evaluation result, replacing the walk over
+# results/<model>/<level>/evaluation_results_<suffix>.json and analysis_summary*.csv.
+# The database runs in WAL mode: readers never block the writer, and evaluator
+# processes writing at the same time wait on busy_timeout instead of failing.
+DEFAULT_RESULTS_DB = os.path.join('results', 'results.db')
+BUSY_TIMEOUT_SECONDS = 30 # how long a writer waits for another writer's transaction
+LEVEL_NUMBERS = {'low': 1, 'medium': 2, 'high': 3} # complexity level -> data_files level number
+# Dataset versions are the numeric suffixes of the data_files names ("800", "2000_10");
+# results without one are kept apart as "unversioned/<file stem>"
+DATASET_PATTERN = re.compile(r"\d+(?:_\d+)*$")
+UNVERSIONED_PREFIX = "unversioned/"
+EVALUATION_RESULTS_PATTERN = re.compile(r"^evaluation_results(?:_(.+?))?(?:_pack(\d+))?\.json$")
+ANALYSIS_SUMMARY_PATTERN = re.compile(r"^analysis_summary(.*)\.csv$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    dataset TEXT NOT NULL,
+    model TEXT NOT NULL,
+    level TEXT NOT NULL,
+    pack_size INTEGER NOT NULL DEFAULT 1,
+    prompt_id TEXT NOT NULL,
+    template TEXT,
+    provider TEXT,
+    expected_answer TEXT,
+    predicted_answer TEXT,
+    is_correct INTEGER,
+    raw_response TEXT,
+    time_taken REAL,
+    tokens_used REAL,
+    latency_s REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    http_status INTEGER,
+    temperature REAL,
+    seed INTEGER,
+    telemetry TEXT,
+    source TEXT NOT NULL,
+    inserted_at TEXT NOT NULL,
+    PRIMARY KEY (dataset, model, level, pack_size, prompt_id)
+);
+CREATE INDEX IF NOT EXISTS idx_results_model_level ON results (model, level, dataset);
+CREATE INDEX IF NOT EXISTS idx_results_template ON results (dataset, template, model);
+CREATE INDEX IF NOT EXISTS idx_results_expected ON results (dataset, expected_answer, model);
+CREATE INDEX IF NOT EXISTS idx_results_prompt ON results (dataset, level, prompt_id);
+"""
+COLUMNS = ('dataset', 'model', 'level', 'pack_size', 'prompt_id', 'template', 'provider', 'expected_answer',
+           'predicted_answer', 'is_correct', 'raw_response', 'time_taken', 'tokens_used', 'latency_s', 'prompt_tokens',
+           'completion_tokens', 'http_status', 'temperature', 'seed', 'telemetry', 'source', 'inserted_at')
+
+def connect(db_path: str = DEFAULT_RESULTS_DB) -> sqlite3.Connection:
+    """Opens (creating if needed) the results database in WAL mode."""
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL") # durable at checkpoints; a crash can only lose the last transactions
+    conn.executescript(SCHEMA)
+    return conn
+
+def dataset_from_suffix(suffix: str, file_stem: str) -> str:
+    """`suffix` when it is a dataset version, else "unversioned/<file_stem>"."""
+    return suffix if suffix and DATASET_PATTERN.match(suffix) else UNVERSIONED_PREFIX + file_stem
+
+def dataset_from_prompts_file(api_prompts_file: str) -> str:
+    """The dataset version of an API prompts file (prompts_level_<n>_<dataset>.json)."""
+    match = API_PROMPTS_PATTERN.search(os.path.basename(api_prompts_file))
+    stem = os.path.splitext(os.path.basename(api_prompts_file))[0]
+    return dataset_from_suffix(match.group(2) if match else None, stem)
+
+_labels_cache = {}
+
+def dataset_labels(dataset: str, level: str, data_dir: str = 'data_files'):
+    """
+    Expected answers and template ids of one level of a dataset, from data_files.
+
+    Returns:
+        tuple[dict, dict]: ({prompt_id: expected answer}, {prompt_id: template id});
+                           both empty when the dataset has no files there.
+    """
+    key = (dataset, level, os.path.abspath(data_dir))
+    if key not in _labels_cache:
+        answers_map, templates_map = {}, {}
+        level_number = LEVEL_NUMBERS.get(level)
+        try:
+            with open(os.path.join(data_dir, 'expected_answers', f'expected_answer_file_level_{level_number}_{dataset}.json'), 'r') as f:
+                answers_map = {str(item['prompt_id']): item['expected_answer'].lower().replace(' ', '-') for item in json.load(f)}
+            with open(os.path.join(data_dir, 'questions_dataset_final', f'generated_questions_level_{level_number}_{dataset}.json'), 'r') as f:
+                templates_map = {str(item['prompt_id']): item.get('template_id_source') for item in json.load(f)}
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        _labels_cache[key] = (answers_map, templates_map)
+    return _labels_cache[key]
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+def _insert(conn: sqlite3.Connection, rows: list, replace: bool) -> int:
+    """Inserts rows in one transaction; existing keys are replaced, or kept with replace=False."""
+    verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+    with conn:
+        cursor = conn.executemany(f"{verb} INTO results ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                                  [tuple(row.get(column) for column in COLUMNS) for row in rows])
+    return cursor.rowcount
+
+def insert_results(conn: sqlite3.Connection, results: list, dataset: str, level: str, source: str,
+                   data_dir: str = 'data_files') -> int:
+    """
+    Stores the result entries of one run_llm_evaluation run (one model, level and dataset).
+
+    Answers are parsed with parse_llm_response and scored against the dataset's
+    expected answers (is_correct is NULL when those are not in data_files). Rows
+    already stored for the same dataset, model, level, pack size and prompt_id
+    are replaced, so re-running or re-importing a run updates it in place.
+
+    Returns:
+        int: Number of rows written.
+    """
+    answers_map, templates_map = dataset_labels(dataset, level, data_dir)
+    inserted_at = _now()
+    rows = []
+    for result in results:
+        prompt_id = str(result.get('prompt_id'))
+        predicted = parse_llm_response(result.get('raw_response'))
+        expected = answers_map.get(prompt_id)
+        telemetry = result.get('telemetry') or {}
+        rows.append({
+            'dataset': dataset, 'model': result.get('model'), 'level': level,
+            'pack_size': result.get('pack_size') or 1, 'prompt_id': prompt_id,
+            'template': templates_map.get(prompt_id), 'provider': result.get('provider'),
+            'expected_answer': expected, 'predicted_answer': predicted,
+            'is_correct': None if expected is None else int(predicted == expected),
+            'raw_response': result.get('raw_response'), 'time_taken': result.get('time_taken'),
+            'tokens_used': result.get('tokens_used'), 'latency_s': telemetry.get('latency_s'),
+            'prompt_tokens': telemetry.get('prompt_tokens'), 'completion_tokens': telemetry.get('completion_tokens'),
+            'http_status': telemetry.get('http_status'), 'temperature': result.get('temperature_setting'),
+            'seed': result.get('seed_setting'), 'telemetry': json.dumps(telemetry) if telemetry else None,
+            'source': source, 'inserted_at': inserted_at,
+        })
+    return _insert(conn, rows, replace=True)
+
+def save_run(db_path: str, results: list, api_prompts_file: str, level: str, source: str) -> int:
+    """insert_results on a connection of its own, so concurrent evaluator processes can each call it."""
+    conn = connect(db_path)
+    try:
+        written = insert_results(conn, results, dataset_from_prompts_file(api_prompts_file), level, source)
+    except sqlite3.Error as e:
+        print(f"Error saving results to the database '{db_path}': {e}")
+        return 0
+    finally:
+        conn.close()
+    print(f"{written} results saved to the database '{db_path}'.")
+    return written
+
+# --- Importers for the existing files ---
+def import_results_file(conn: sqlite3.Connection, results_filepath: str, data_dir: str = 'data_files') -> int:
+    """Imports a results/<model>/<level>/evaluation_results[_<dataset>][_pack<K>].json file."""
+    filename = os.path.basename(results_filepath)
+    match = EVALUATION_RESULTS_PATTERN.match(filename)
+    level = os.path.basename(os.path.dirname(results_filepath))
+    if not match or level not in LEVEL_NUMBERS:
+        print(f"Warning: Skipping '{results_filepath}', it is not a results/<model>/<level>/evaluation_results*.json file.")
+        return 0
+    try:
+        with open(results_filepath, 'r') as f:
+            results = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not load '{results_filepath}'. {e}")
+        return 0
+    model = os.path.basename(os.path.dirname(os.path.dirname(results_filepath)))
+    pack_size = int(match.group(2)) if match.group(2) else 1
+    results = [{'model': model, 'pack_size': pack_size, **result} for result in results]
+    return insert_results(conn, results, dataset_from_suffix(match.group(1), os.path.splitext(filename)[0]), level, results_filepath, data_dir)
+
+def import_analysis_summary(conn: sqlite3.Connection, summary_filepath: str, data_dir: str = 'data_files') -> int:
+    """
+    Imports a results/<model>/<level>/analysis_summary*.csv file.
+
+    Summaries only hold the answers parsed when they were written, so their rows
+    never replace a row already stored (import the evaluation_results files first).
+    """
+    filename = os.path.basename(summary_filepath)
+    match = ANALYSIS_SUMMARY_PATTERN.match(filename)
+    level = os.path.basename(os.path.dirname(summary_filepath))
+    if not match or level not in LEVEL_NUMBERS:
+        print(f"Warning: Skipping '{summary_filepath}', it is not a results/<model>/<level>/analysis_summary*.csv file.")
+        return 0
+    suffix = match.group(1)[1:] if match.group(1).startswith('_') else None # "analysis_summary0.csv" has no version
+    dataset = dataset_from_suffix(suffix, os.path.splitext(filename)[0])
+    _, templates_map = dataset_labels(dataset, level, data_dir)
+    model = os.path.basename(os.path.dirname(os.path.dirname(summary_filepath)))
+    inserted_at = _now()
+    rows = []
+    with open(summary_filepath, 'r', newline='') as f:
+        for record in csv.DictReader(f):
+            prompt_id = str(record.get('prompt_id'))
+            rows.append({
+                'dataset': dataset, 'model': record.get('model') or model, 'level': level, 'pack_size': 1,
+                'prompt_id': prompt_id, 'template': templates_map.get(prompt_id),
+                'expected_answer': record.get('expected_answer'), 'predicted_answer': record.get('predicted_answer'),
+                'is_correct': _number(record.get('is_correct'), int), 'time_taken': _number(record.get('time_taken')),
+                'tokens_used': _number(record.get('tokens_used')), 'temperature': _number(record.get('temperature')),
+                'seed': _number(record.get('seed'), int), 'source': summary_filepath, 'inserted_at': inserted_at,
+            })
+    return _insert(conn, rows, replace=False)
+
+def _number(value, kind=float):
+    try:
+        return kind(float(value))
+    except (TypeError, ValueError):
+        return None
+
+def import_results_tree(conn: sqlite3.Connection, root_results_dir: str = 'results', data_dir: str = 'data_files',
+                        include_summaries: bool = True) -> dict:
+    """
+    Imports every evaluation_results*.json under `root_results_dir`, then (with
+    include_summaries) every analysis_summary*.csv, whose rows only fill gaps.
+
+    Returns:
+        dict: {'files': files imported, 'rows': rows written}.
+    """
+    results_files, summary_files = [], []
+    for subdir, dirs, files in os.walk(root_results_dir):
+        for filename in sorted(files):
+            if EVALUATION_RESULTS_PATTERN.match(filename):
+                results_files.append(os.path.join(subdir, filename))
+            elif include_summaries and ANALYSIS_SUMMARY_PATTERN.match(filename):
+                summary_files.append(os.path.join(subdir, filename))
+    rows = sum(import_results_file(conn, path, data_dir) for path in sorted(results_files))
+    rows += sum(import_analysis_summary(conn, path, data_dir) for path in sorted(summary_files))
+    return {'files': len(results_files) + len(summary_files), 'rows': rows}
+
+# --- Queries ---
+def query(conn: sqlite3.Connection, sql: str, params=()) -> list:
+    """Rows of a SQL query as dicts."""
+    return [dict(row) for row in conn.execute(sql, params)]
+
+def accuracy_by(conn: sqlite3.Connection, dataset: str, group_by=('model', 'level'), pack_size: int = 1) -> list:
+    """
+    Prompts, scored prompts, accuracy and mean tokens per group of one dataset, as a
+    single GROUP BY. Accuracy is over the scored prompts (None if none could be scored).
+    """
+    columns = ", ".join(column for column in group_by if column in COLUMNS)
+    return query(conn, f"SELECT {columns}, COUNT(*) AS prompts, COUNT(is_correct) AS scored, AVG(is_correct) AS accuracy, "
+                       f"AVG(tokens_used) AS tokens_used FROM results WHERE dataset = ? AND pack_size = ? "
+                       f"GROUP BY {columns} ORDER BY {columns}", (dataset, pack_size))
+
+def load_results_frame(db_path: str = DEFAULT_RESULTS_DB, dataset_suffix: str = '2000_10', pack_size: int = 1):
+    """
+    The database counterpart of analyze_results.load_combined_results: the same
+    columns (levels title-cased, unknown expected answers as 'not_found' and
+    templates as 'unknown'), read with one query instead of a directory walk.
+    """
+    import pandas as pd
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(
+            "SELECT model, level, COALESCE(template, 'unknown') AS template, prompt_id, "
+            "COALESCE(expected_answer, 'not_found') AS expected_answer, predicted_answer, "
+            "COALESCE(is_correct, 0) AS is_correct, time_taken, tokens_used, pack_size "
+            "FROM results WHERE dataset = ? AND pack_size = ? ORDER BY model, level, rowid",
+            conn, params=(dataset_suffix, pack_size)).assign(level=lambda df: df['level'].str.title())
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    # python results_store.py import [--results-dir results]   -> (re)build the database from the files
+    # python results_store.py summary --dataset 2000_10          -> accuracy per model and level
+    parser = argparse.ArgumentParser(description="SQLite store of the evaluation results.")
+    parser.add_argument('command', choices=['import', 'summary'])
+    parser.add_argument('--db', default=DEFAULT_RESULTS_DB)
+    parser.add_argument('--results-dir', default='results')
+    parser.add_argument('--data-dir', default='data_files')
+    parser.add_argument('--no-summaries', action='store_true', help="Skip the analysis_summary*.csv files.")
+    parser.add_argument('--dataset', default='2000_10')
+    parser.add_argument('--group-by', default='model,level')
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == 'import':
+        counts = import_results_tree(conn, args.results_dir, args.data_dir, include_summaries=not args.no_summaries)
+        print(f"Imported {counts['rows']} rows from {counts['files']} files into '{args.db}'.")
+        for row in query(conn, "SELECT dataset, COUNT(*) AS prompts, COUNT(DISTINCT model) AS models FROM results GROUP BY dataset"):
+            print(f"  {row['dataset']:<40} {row['prompts']:>7} results, {row['models']} models")
+    else:
+        group_by = args.group_by.split(',')
+        for row in accuracy_by(conn, args.dataset, group_by):
+            accuracy = "not scored" if row['accuracy'] is None else f"{row['accuracy']:.2%}"
+            print("  " + " ".join(f"{str(row[column]):<20}" for column in group_by) + f" {row['prompts']:>6} prompts  {accuracy}")
+    conn.close()
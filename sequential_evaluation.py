@@ -0,0 +1,118 @@
+import json
+import os
+import random
+import re
+
+# prompts_level_<n>_<dataset suffix>.json
+API_PROMPTS_PATTERN = re.compile(r"prompts_level_(\d+)_(.+)\.json$")
+
+def load_prompt_labels(api_prompts_file: str, data_dir: str = 'data_files'):
+    """
+    Expected answers and template ids for the prompts of an API prompts file, read
+    from the expected_answers/ and questions_dataset_final/ files of the same dataset.
+
+    Returns:
+        tuple[dict, dict] | None: ({prompt_id: expected answer normalised as in
+                                  analyze_results}, {prompt_id: template id}), or
+                                  None if the files cannot be found or read.
+    """
+    match = API_PROMPTS_PATTERN.search(os.path.basename(api_prompts_file))
+    if not match:
+        print(f"Error: Cannot tell the level and dataset of '{api_prompts_file}' (expected prompts_level_<n>_<suffix>.json).")
+        return None
+    level_number, dataset_suffix = match.groups()
+    try:
+        with open(os.path.join(data_dir, 'expected_answers', f'expected_answer_file_level_{level_number}_{dataset_suffix}.json'), 'r') as f:
+            expected_answers = json.load(f)
+        with open(os.path.join(data_dir, 'questions_dataset_final', f'generated_questions_level_{level_number}_{dataset_suffix}.json'), 'r') as f:
+            questions = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"Error: Could not load the expected answers for '{api_prompts_file}'. {e}")
+        return None
+    answers_map = {item['prompt_id']: item['expected_answer'].lower().replace(' ', '-') for item in expected_answers}
+    templates_map = {item['prompt_id']: item.get('template_id_source') for item in questions}
+    return answers_map, templates_map
+
+def stratified_order(prompt_ids: list, strata: dict, seed: int = 0) -> list:
+    """
+    Random order in which every prefix is close to proportionally stratified.
+
+    Prompts are shuffled within their stratum; the i-th of a stratum of size n is
+    placed at (i + u) / n with u uniform in [0, 1), and prompts are sorted by that
+    position. After m prompts each stratum has contributed about m * n / total, so
+    the running accuracy is an unbiased estimate at any stopping point.
+
+    Args:
+        prompt_ids (list): Prompts to order.
+        strata (dict): {prompt_id: stratum key}, e.g. (template id, expected answer).
+        seed (int): Seed of the shuffle.
+
+    Returns:
+        list: The prompt_ids in evaluation order.
+    """
+    rng = random.Random(seed)
+    by_stratum = {}
+    for prompt_id in prompt_ids:
+        by_stratum.setdefault(strata.get(prompt_id), []).append(prompt_id)
+    positions = []
+    for stratum_key in sorted(by_stratum, key=repr):
+        members = by_stratum[stratum_key]
+        rng.shuffle(members)
+        positions.extend(((i + rng.random()) / len(members), prompt_id) for i, prompt_id in enumerate(members))
+    positions.sort(key=lambda position: position[0])
+    return [prompt_id for _, prompt_id in positions]
+
+class SequentialAccuracy:
+    """
+    Running accuracy with a Wilson interval, for stopping an evaluation early.
+
+    The interval is recomputed after every answer; stopping as soon as it is narrow
+    enough makes its coverage slightly lower than the nominal level, which is fine
+    for screening but not for final numbers.
+    """
+    def __init__(self, target_width: float, confidence: float = 0.95, min_answers: int = 100):
+        self.target_width = target_width
+        self.confidence = confidence
+        self.min_answers = min_answers
+        self.answers = 0
+        self.correct = 0
+        self.errors = 0
+
+    def update(self, is_correct: bool):
+        self.answers += 1
+        self.correct += int(is_correct)
+
+    def record_error(self):
+        """A failed request ("Error: ..."): counted apart and kept out of the accuracy."""
+        self.errors += 1
+
+    def interval(self):
+        """(low, high) Wilson bounds, (None, None) before the first answer."""
+        if not self.answers:
+            return None, None
+        from confidence_intervals import wilson_interval # numpy/pandas, only needed once early stopping is on
+        low, high = wilson_interval(self.correct, self.answers, self.confidence)
+        return float(low), float(high)
+
+    def should_stop(self) -> bool:
+        if self.answers < self.min_answers:
+            return False
+        low, high = self.interval()
+        return high - low <= self.target_width
+
+    def summary(self, prompts_available: int) -> dict:
+        low, high = self.interval()
+        return {
+            'prompts_available': prompts_available,
+            'prompts_used': self.answers,
+            'correct': self.correct,
+            'errors': self.errors,
+            'accuracy': self.correct / self.answers if self.answers else None,
+            'ci_low': low,
+            'ci_high': high,
+            'ci_width': high - low if self.answers else None,
+            'target_ci_width': self.target_width,
+            'confidence': self.confidence,
+            'min_answers': self.min_answers,
+            'stopped_early': self.answers + self.errors < prompts_available,
+        }
@@ -0,0 +1,130 @@
+import json
+import math
+
+# Per-request fields recorded by llm_evaluation. Timings are seconds, token counts
+# integers; None means the backend does not expose that number.
+TELEMETRY_FIELDS = ('queue_wait_s', 'connect_s', 'ttfb_s', 'latency_s', 'timeout_s', 'load_s', 'inference_s',
+                    'prompt_tokens', 'completion_tokens', 'cached_tokens', 'reasoning_tokens', 'total_tokens',
+                    'retries', 'http_status', 'hedged', 'hedge_won', 'hedge_extra_tokens')
+
+def empty_telemetry() -> dict:
+    """A telemetry record with every field present and unset."""
+    record = dict.fromkeys(TELEMETRY_FIELDS)
+    record['retries'] = 0
+    record['hedged'] = False
+    record['hedge_extra_tokens'] = 0
+    return record
+
+def percentile(values, q: float):
+    """Linear-interpolated percentile (q in 0-100) of a list of numbers; None if empty."""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    rank = (len(values) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+def _distribution(values) -> dict:
+    return {'p50': percentile(values, 50), 'p95': percentile(values, 95), 'p99': percentile(values, 99)}
+
+def _request_records(results: list) -> list:
+    """
+    Telemetry of each request; the results of one packed request (same 'pack_id') count
+    once, and answers fanned out to duplicate prompts ('deduplicated_from') not at all.
+    """
+    records, seen_packs = [], set()
+    for result in results:
+        if result.get('deduplicated_from'):
+            continue
+        pack_id = result.get('pack_id')
+        if pack_id is not None:
+            if pack_id in seen_packs:
+                continue
+            seen_packs.add(pack_id)
+        records.append(result.get('telemetry') or {})
+    return records
+
+def summarize_telemetry(results: list) -> dict:
+    """
+    Per-provider latency percentiles and token throughput for one evaluation run.
+
+    Args:
+        results (list): Result entries written by run_llm_evaluation, each with a
+                        'provider' and a 'telemetry' record. Results of a packed
+                        request share one record and are counted as one request;
+                        answers copied to duplicate prompts are counted only
+                        under 'deduplicated_questions'.
+
+    Returns:
+        dict: {provider: {'requests', 'questions', 'errors', 'retries', 'latency_s', 'ttfb_s',
+               'queue_wait_s', 'tokens', 'completion_tokens_per_s', 'hedge_rate', 'hedge_extra_cost', ...}}
+              hedge_extra_cost is the tokens of losing hedged duplicates as a share of
+              the tokens of the answers used.
+    """
+    by_provider = {}
+    for result in results:
+        by_provider.setdefault(result.get('provider', 'unknown'), []).append(result)
+
+    summary = {}
+    for provider, provider_results in sorted(by_provider.items()):
+        records = _request_records(provider_results)
+        latencies = [r.get('latency_s') for r in records]
+        completion = [r.get('completion_tokens') or 0 for r in records]
+        busy_time = sum(r.get('latency_s') or 0 for r in records)
+        per_request_rate = [r['completion_tokens'] / r['latency_s'] for r in records
+                            if r.get('completion_tokens') and r.get('latency_s')]
+        hedged = sum(1 for r in records if r.get('hedged'))
+        extra_tokens = sum(r.get('hedge_extra_tokens') or 0 for r in records)
+        used_tokens = sum(r.get('total_tokens') or 0 for r in records)
+        summary[provider] = {
+            'requests': len(records),
+            'questions': len(provider_results),
+            'deduplicated_questions': sum(1 for result in provider_results if result.get('deduplicated_from')),
+            'errors': sum(1 for result in provider_results if str(result.get('raw_response', '')).startswith('Error:')),
+            'retries': sum(r.get('retries') or 0 for r in records),
+            'latency_s': _distribution(latencies),
+            'ttfb_s': _distribution([r.get('ttfb_s') for r in records]),
+            'queue_wait_s': _distribution([r.get('queue_wait_s') for r in records]),
+            'load_s': _distribution([r.get('load_s') for r in records]),
+            'inference_s': _distribution([r.get('inference_s') for r in records]),
+            'tokens': {field: sum(r.get(field) or 0 for r in records)
+                       for field in ('prompt_tokens', 'completion_tokens', 'cached_tokens', 'reasoning_tokens', 'total_tokens')},
+            'completion_tokens_per_s': sum(completion) / busy_time if busy_time else None,
+            'completion_tokens_per_s_per_request': _distribution(per_request_rate),
+            'timeout_s': _distribution([r.get('timeout_s') for r in records]),
+            'hedged_requests': hedged,
+            'hedge_rate': hedged / len(records) if records else None,
+            'hedge_wins': sum(1 for r in records if r.get('hedge_won')),
+            'hedge_extra_tokens': extra_tokens,
+            'hedge_extra_cost': extra_tokens / used_tokens if used_tokens else None,
+        }
+    return summary
+
+def write_telemetry_summary(results: list, summary_filepath: str, run_info: dict = None) -> dict:
+    """
+    Summarizes a run with summarize_telemetry, prints it and saves it as JSON;
+    run-level facts (e.g. the model warm-up) go under "run".
+    """
+    summary = summarize_telemetry(results)
+    for provider, stats in summary.items():
+        latency = stats['latency_s']
+        rate = stats['completion_tokens_per_s']
+        print(f"  [{provider}] {stats['requests']} requests, {stats['errors']} errors, {stats['retries']} retries | "
+              f"latency p50/p95/p99: {_fmt(latency['p50'])}/{_fmt(latency['p95'])}/{_fmt(latency['p99'])} s | "
+              f"completion tokens/s: {_fmt(rate)}")
+        if stats['hedged_requests']:
+            print(f"  [{provider}] hedged {stats['hedged_requests']} requests ({stats['hedge_rate']:.1%}), "
+                  f"{stats['hedge_wins']} won by the duplicate, extra tokens {stats['hedge_extra_tokens']} "
+                  f"({_fmt(100 * stats['hedge_extra_cost'] if stats['hedge_extra_cost'] is not None else None)}% of used)")
+    if run_info:
+        summary['run'] = run_info
+    try:
+        with open(summary_filepath, 'w') as f:
+            json.dump(summary, f, indent=4)
+        print(f"Telemetry summary saved to '{summary_filepath}'.")
+    except IOError as e:
+        print(f"Error saving telemetry summary: {e}")
+    return summary
+
+def _fmt(value):
+    return "n/a" if value is None else f"{value:.2f}"